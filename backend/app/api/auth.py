@@ -1,5 +1,8 @@
 from fastapi import APIRouter, HTTPException, Request
-from ..services.auth_service import AuthService
+from ..services.auth_service import AuthService, get_service_registry
+from ..core.config import settings
+from ..services.content_index import get_content_index
+from ..services.drive_index import get_drive_index
 import logging
 import os
 
@@ -29,6 +32,15 @@ async def auth_callback(code: str, state: str = None):
     try:
         success = auth_service.handle_callback(code)
         if success:
+            # Drop clients built with the old token, and anything indexed
+            # from what may have been another account, then crawl again
+            get_service_registry().reset()
+            drive_index = get_drive_index()
+            drive_index.reset()
+            drive_index.start_background_sync()
+            # On first run nothing started the content index at startup
+            if settings.content_index_enabled:
+                get_content_index().start_background_sync()
             return {"status": "success", "message": "Authentication successful"}
         else:
             raise HTTPException(status_code=400, detail="Authentication failed")
@@ -1,10 +1,28 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import json
+import logging
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from ..services.llm_service import LLMService
+from starlette.background import BackgroundTask
+from ..core.executors import ExecutorOverloaded, io_executor
+from ..core.scheduler import DeadlineExceeded, inference_scheduler
+from ..services.chat_sessions import ChatSession, UnknownSession, get_session_store
+from ..services.llm_service import GroundedPrompt
+from ..services.model_manager import Lease, ModelNotReady, UnknownModel, model_manager
+from ..services.drive_service import MEDIA_URL_PREFIX
 from ..services.prompt_handler import CallToolResult
+from ..services.response_cache import response_cache
 
 router = APIRouter()
-llm_service = LLMService()
+logger = logging.getLogger(__name__)
+llm_service = model_manager.service
+
+# How often a queued chat request checks whether its client is still there
+DISCONNECT_POLL_SECONDS = 0.5
+# Suggested client back-off while the model is loading
+MODEL_LOADING_RETRY_AFTER = "5"
 
 class ChatRequest(BaseModel):
     prompt: str = Field(
@@ -12,6 +30,16 @@ class ChatRequest(BaseModel):
         description="The text prompt to send to the LLaMA model",
         example="What is the capital of France?"
     )
+    model: Optional[str] = Field(
+        default=None,
+        description="Model to answer with; by default short chat goes to the chat model, if configured, and the rest to the default model",
+        example="default"
+    )
+    session_id: Optional[str] = Field(
+        default=None,
+        description="Conversation from POST /api/chat/sessions to continue; omit for a one-off prompt",
+        example="3f2b8c1e9d4a4b7f8e6a5c2d1b0f9e8a"
+    )
 
 class ChatResponse(BaseModel):
     type: str = Field(
@@ -21,10 +49,33 @@ class ChatResponse(BaseModel):
     )
     message: str = Field(
         ...,
-        description="The AI's response to the prompt or base64 image data",
+        description="The AI's response to the prompt, or for images the /api/media URL to fetch it from",
         example="The capital of France is Paris."
     )
 
+async def _cancel_on_disconnect(http_request: Request, coro):
+    """Await coro, cancelling it if the client disconnects first."""
+    task = asyncio.ensure_future(coro)
+    while not task.done():
+        await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+        if not task.done() and await http_request.is_disconnected():
+            logger.info("Client disconnected, cancelling chat request")
+            task.cancel()
+    return await task
+
+def _requested_model(request: ChatRequest, session: Optional[ChatSession]) -> Optional[str]:
+    """The model asked for, or else the one the session's state was built with."""
+    return request.model or (session.model if session else None)
+
+def _is_image(response) -> bool:
+    """Check if the response is an image reference or base64 image data."""
+    return isinstance(response, str) and (
+        response.startswith(MEDIA_URL_PREFIX) or
+        response.startswith('iVBORw0KGgo') or  # PNG
+        response.startswith('/9j/') or          # JPEG
+        response.startswith('R0lGODlh')         # GIF
+    )
+
 @router.post(
     "/chat",
     response_model=ChatResponse,
@@ -56,10 +107,30 @@ class ChatResponse(BaseModel):
                     }
                 }
             }
+        },
+        503: {
+            "description": "Server is at capacity, or the model is still loading",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "The inference queue is full. Please try again shortly."
+                    }
+                }
+            }
+        },
+        504: {
+            "description": "Request waited in the inference queue past its deadline",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Request timed out waiting for the model."
+                    }
+                }
+            }
         }
     }
 )
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """
     Process a chat request with LLaMA.
     
@@ -70,20 +141,203 @@ async def chat(request: ChatRequest):
         ChatResponse: The AI's response to the prompt
         
     Raises:
-        HTTPException: If there's an error processing the request
+        HTTPException: If there's an error processing the request, 400 for an
+            unknown model, 404 for an unknown session, 503 if the tool or
+            inference queue is full or the model is still loading, or 504 if
+            the request waited too long for the model
     """
     try:
-        response = llm_service.generate_response(request.prompt)
+        session = get_session_store().get(request.session_id) if request.session_id else None
+        # Tool intents run on the I/O pool; only chat fallbacks touch the model
+        response = await io_executor.run(llm_service.run_tools, request.prompt)
+        if response is None or isinstance(response, GroundedPrompt):
+            # PDF queries come back as retrieved context for the model to answer from
+            chat_prompt = response if response is not None else request.prompt
+            lease = model_manager.acquire_for(chat_prompt, _requested_model(request, session))
+            # The job keeps the model until it finishes, even if the client
+            # disconnects and this request is cancelled first
+            response = await _cancel_on_disconnect(
+                http_request, inference_scheduler.run(
+                    llm_service.generate_chat, chat_prompt, lease.model, session, on_done=lease.transfer()
+                )
+            )
         
-        # Check if the response is a base64 image
-        if isinstance(response, str) and (
-            response.startswith('iVBORw0KGgo') or  # PNG
-            response.startswith('/9j/') or          # JPEG
-            response.startswith('R0lGODlh')         # GIF
-        ):
+        # Check if the response is an image
+        if _is_image(response):
             return ChatResponse(type="image", message=response)
             
         # For all other responses
         return ChatResponse(type="chat", message=str(response))
+    except UnknownModel as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UnknownSession as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ModelNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": MODEL_LOADING_RETRY_AFTER})
+    except ExecutorOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _event(event_type: str, message: str) -> str:
+    return json.dumps({"type": event_type, "message": message}) + "\n"
+
+async def _stream_events(prompt: str, tool_response, lease: Optional[Lease],
+                         session: Optional[ChatSession] = None):
+    """Yield NDJSON lines for a streamed chat response."""
+    try:
+        if isinstance(tool_response, str):
+            yield _event("image" if _is_image(tool_response) else "token", tool_response)
+        else:
+            chat_prompt = tool_response if tool_response is not None else prompt
+            # Starlette cancels this generator when the client disconnects,
+            # which drops the job from the scheduler; the lease is released
+            # once the job has stopped using the model
+            async for piece in inference_scheduler.stream(
+                    llm_service.stream_chat, chat_prompt, lease.model, session, on_done=lease.transfer()):
+                yield _event("token", piece)
+        yield _event("done", "")
+    except Exception as e:
+        logger.error(f"Error streaming response: {str(e)}", exc_info=True)
+        yield _event("error", str(e))
+
+@router.post(
+    "/chat/stream",
+    summary="Stream a chat response from LLaMA",
+    description="""
+    Send a prompt and receive the response as newline-delimited JSON events.
+    
+    Each line is an object with a `type` and a `message`:
+    - `token`: the next piece of cleaned response text
+    - `image`: the /api/media URL of an image from a Drive image request
+    - `done`: the response is complete
+    - `error`: generation failed; `message` holds the error
+    
+    Tool intents (Drive, email, weather) produce a single `token` event and
+    work while the model is still loading.
+    """,
+    responses={
+        200: {
+            "description": "Stream of response events",
+            "content": {
+                "application/x-ndjson": {
+                    "example": '{"type": "token", "message": "The capital"}\n'
+                               '{"type": "token", "message": " of France is Paris."}\n'
+                               '{"type": "done", "message": ""}\n'
+                }
+            }
+        },
+        400: {
+            "description": "Unknown model"
+        },
+        404: {
+            "description": "Unknown session"
+        },
+        503: {
+            "description": "Server is at capacity, or the model is still loading"
+        }
+    }
+)
+async def chat_stream(request: ChatRequest):
+    """
+    Stream a chat response token by token.
+    
+    Args:
+        request (ChatRequest): The chat request containing the prompt
+        
+    Returns:
+        StreamingResponse: NDJSON events as the response is generated
+        
+    Raises:
+        HTTPException: 400 for an unknown model, 404 for an unknown session,
+            or 503 if the tool or inference queue is full or the model is
+            still loading
+    """
+    try:
+        session = get_session_store().get(request.session_id) if request.session_id else None
+        tool_response = await io_executor.run(llm_service.run_tools, request.prompt)
+    except UnknownSession as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ExecutorOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if isinstance(tool_response, str):
+        return StreamingResponse(_stream_events(request.prompt, tool_response, None), media_type="application/x-ndjson")
+    if inference_scheduler.saturated:
+        raise HTTPException(status_code=503, detail="The inference queue is full. Please try again shortly.")
+    try:
+        lease = model_manager.acquire_for(
+            tool_response if tool_response is not None else request.prompt, _requested_model(request, session)
+        )
+    except UnknownModel as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ModelNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": MODEL_LOADING_RETRY_AFTER})
+    # Releases the lease if the client left before the stream started;
+    # otherwise the scheduler job has taken it over
+    return StreamingResponse(
+        _stream_events(request.prompt, tool_response, lease, session),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(lease.release)
+    )
+
+@router.post("/chat/sessions", status_code=201, summary="Start a conversation")
+async def create_session():
+    """
+    Start a server-side conversation.
+
+    Pass the returned session_id with /chat or /chat/stream requests to
+    continue it. Tool intents are answered as usual but aren't added to the
+    conversation.
+    """
+    store = get_session_store()
+    return store.describe(store.create())
+
+@router.get("/chat/sessions/stats")
+async def session_stats():
+    """Session count and the memory and disk used by their model states."""
+    return get_session_store().stats()
+
+@router.get("/chat/sessions/{session_id}", summary="Get a conversation")
+async def get_session(session_id: str):
+    """
+    The conversation's turns, its summary of earlier turns, and where its model state is.
+
+    Raises:
+        HTTPException: 404 if there is no such session
+    """
+    store = get_session_store()
+    try:
+        return store.describe(store.get(session_id))
+    except UnknownSession as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.delete("/chat/sessions/{session_id}", status_code=204, summary="End a conversation")
+async def delete_session(session_id: str):
+    """
+    Delete a conversation and its saved state.
+
+    Raises:
+        HTTPException: 404 if there is no such session
+    """
+    try:
+        get_session_store().delete(session_id)
+    except UnknownSession as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/inference/stats")
+async def inference_stats():
+    """Inference queue length, wait times and request outcomes."""
+    return inference_scheduler.stats()
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Response cache size and hit/miss counters."""
+    return response_cache.stats()
+
+@router.delete("/cache")
+async def clear_cache(intent: Optional[str] = None):
+    """Invalidate cached responses, optionally only for one intent type."""
+    removed = response_cache.invalidate([intent] if intent else None)
+    return {"removed": removed}
@@ -0,0 +1,99 @@
+import logging
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from ..core.http_client import http_client
+from ..services.gmail_service import send_bulk_async
+from ..services.outbox import get_outbox
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+MAX_BULK_MESSAGES = 500
+
+class EmailMessage(BaseModel):
+    to: List[str] = Field(..., description="Recipient addresses", example=["alice@example.com"])
+    subject: str = Field(..., example="Team update")
+    body: str = Field(..., example="The release is out.")
+    mime_type: str = Field(default="text/plain", example="text/plain")
+
+class OutboxMessage(BaseModel):
+    id: str
+    to: List[str]
+    subject: str
+    status: str = Field(..., description="queued, sending, sent or failed", example="sent")
+    attempts: int
+    gmail_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float
+    sent_at: Optional[float] = None
+
+class BulkEmailRequest(BaseModel):
+    messages: List[EmailMessage] = Field(..., description="Messages to send; each can have several recipients")
+
+class MessageStatus(BaseModel):
+    index: int
+    to: List[str]
+    success: bool
+    messageId: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int
+
+class BulkEmailResponse(BaseModel):
+    sent: int
+    failed: int
+    results: List[MessageStatus]
+
+@router.post("/email/bulk", response_model=BulkEmailResponse, summary="Send many emails")
+async def send_bulk(request: BulkEmailRequest):
+    """
+    Send many emails through Gmail batch requests.
+
+    Args:
+        request (BulkEmailRequest): The messages to send
+
+    Returns:
+        BulkEmailResponse: Counts and the status of every message, in request order
+
+    Raises:
+        HTTPException: 400 if there are no messages or too many
+    """
+    if not request.messages or len(request.messages) > MAX_BULK_MESSAGES:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {MAX_BULK_MESSAGES} messages.")
+    statuses = await http_client.run_async(send_bulk_async([message.dict() for message in request.messages]))
+    sent = sum(status["success"] for status in statuses)
+    return BulkEmailResponse(sent=sent, failed=len(statuses) - sent, results=statuses)
+
+@router.get("/email/outbox", summary="List queued and sent emails")
+async def list_outbox(status: Optional[str] = None, limit: int = 50):
+    """
+    List recent outbox messages, newest first.
+
+    Args:
+        status (str): Only messages with this status (queued, sending, sent or failed)
+        limit (int): Maximum number of messages to return
+
+    Returns:
+        dict: Counts per status and the matching messages
+    """
+    outbox = get_outbox()
+    return {"counts": outbox.stats(), "messages": outbox.list(status=status, limit=min(limit, 500))}
+
+@router.get("/email/outbox/{message_id}", response_model=OutboxMessage, summary="Get an email's delivery status")
+async def get_outbox_message(message_id: str):
+    """
+    Get the delivery status of a queued email.
+
+    Args:
+        message_id (str): The id returned when the email was queued
+
+    Returns:
+        OutboxMessage: The message's status, attempts and Gmail id once sent
+
+    Raises:
+        HTTPException: 404 if there is no such message
+    """
+    message = get_outbox().get(message_id)
+    if message is None:
+        raise HTTPException(status_code=404, detail="Message not found")
+    return message
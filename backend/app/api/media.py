@@ -0,0 +1,124 @@
+import logging
+import re
+from typing import Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from googleapiclient.errors import HttpError
+from ..core.executors import ExecutorOverloaded, io_executor
+from ..services.drive_service import FileTooLargeError, get_file_metadata, iter_media
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+def _etag(metadata: dict) -> str:
+    # md5Checksum changes with the content; modifiedTime is the fallback
+    tag = metadata.get("md5Checksum") or f"{metadata['id']}-{metadata.get('modifiedTime', '')}"
+    return f'"{tag}"'
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single 'bytes=' range into inclusive offsets; None if unsatisfiable."""
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    start, end = match.group(1), match.group(2)
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            return None
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return None
+    return start, end
+
+@router.get(
+    "/media/{file_id}",
+    summary="Stream a Drive image",
+    description="""
+    Stream the raw bytes of an image from Google Drive.
+    
+    Responses carry the file's Content-Type and an ETag for conditional
+    requests, and single byte ranges are supported for partial downloads.
+    """,
+    responses={
+        200: {"description": "The image bytes"},
+        206: {"description": "The requested byte range"},
+        304: {"description": "The cached copy is still current"},
+        413: {"description": "The file is over the download size limit"},
+        415: {"description": "The file is not an image"},
+        416: {"description": "The requested range cannot be satisfied"},
+    }
+)
+async def get_media(file_id: str, request: Request):
+    """
+    Serve a Drive image by file id.
+    
+    Args:
+        file_id (str): The Drive file id
+        request (Request): Used for the If-None-Match and Range headers
+        
+    Returns:
+        StreamingResponse: The image bytes, or the requested range of them
+        
+    Raises:
+        HTTPException: If the file is missing, not an image or too large
+    """
+    try:
+        metadata = await io_executor.run(get_file_metadata, file_id)
+    except ExecutorOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except HttpError as e:
+        status = e.resp.status if e.resp.status in (403, 404) else 502
+        raise HTTPException(status_code=status, detail=f"Could not fetch file '{file_id}' from Drive")
+
+    mime_type = metadata.get("mimeType", "application/octet-stream")
+    if not mime_type.startswith("image/"):
+        raise HTTPException(status_code=415, detail=f"'{metadata.get('name', file_id)}' is not an image")
+
+    etag = _etag(metadata)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        # Revalidate with the ETag instead of serving a stale copy
+        "Cache-Control": "private, no-cache",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    size = int(metadata.get("size", 0))
+    byte_range = None
+    status_code = 200
+    range_header = request.headers.get("range")
+    if range_header:
+        byte_range = _parse_range(range_header, size)
+        if byte_range is None:
+            raise HTTPException(status_code=416, detail="Requested range not satisfiable",
+                                headers={"Content-Range": f"bytes */{size}"})
+        status_code = 206
+        headers["Content-Range"] = f"bytes {byte_range[0]}-{byte_range[1]}/{size}"
+        headers["Content-Length"] = str(byte_range[1] - byte_range[0] + 1)
+    else:
+        headers["Content-Length"] = str(size)
+
+    chunks = iter_media(file_id, file_name=metadata.get("name", file_id), byte_range=byte_range)
+    try:
+        # Pull the first chunk here so size-cap and Drive errors become proper
+        # status codes instead of a truncated 200 response
+        first_chunk = await io_executor.run(next, chunks, b"")
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ExecutorOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except HttpError:
+        raise HTTPException(status_code=502, detail=f"Could not download file '{file_id}' from Drive")
+
+    def body():
+        if first_chunk:
+            yield first_chunk
+        yield from chunks
+
+    return StreamingResponse(body(), status_code=status_code, media_type=mime_type, headers=headers)
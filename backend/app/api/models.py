@@ -0,0 +1,53 @@
+import logging
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from ..services.model_manager import ModelNotReady, UnknownModel, model_manager
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+class SwapRequest(BaseModel):
+    path: str = Field(..., description="GGUF file to load in place of the model's current one",
+                      example="models/llama-2-7b-chat.Q5_K_M.gguf")
+
+@router.get("/models", summary="List the model pool")
+async def list_models():
+    """Load state, memory use and in-flight requests of every configured model."""
+    status = model_manager.status()
+    return {key: status[key] for key in ("models", "used_bytes", "budget_bytes", "draining")}
+
+@router.post("/models/{name}/load", status_code=202, summary="Load a model")
+async def load_model(name: str):
+    """
+    Start loading a model in the background.
+
+    Raises:
+        HTTPException: 404 if no model has that name
+    """
+    try:
+        model_manager.start(name)
+    except UnknownModel as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return model_manager.status()["models"][name]
+
+@router.post("/models/{name}/swap", status_code=202, summary="Hot-swap a model's file")
+async def swap_model(name: str, request: SwapRequest):
+    """
+    Replace a model with another GGUF file without downtime.
+
+    The current model keeps answering while the new file loads; requests
+    that started on it finish there before it is unloaded.
+
+    Raises:
+        HTTPException: 404 if no model has that name, 400 if the file doesn't
+            exist, or 409 if the model is already loading
+    """
+    try:
+        model_manager.swap(name, request.path)
+    except UnknownModel as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ModelNotReady as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return model_manager.status()["models"][name]
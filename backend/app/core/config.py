@@ -1,4 +1,6 @@
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
+from typing import Dict, Optional
 from functools import lru_cache
 
 class Settings(BaseSettings):
@@ -14,6 +16,138 @@ class Settings(BaseSettings):
     GOOGLE_CLIENT_SECRET: str = ""
     GOOGLE_REDIRECT_URI: str = "http://localhost:8000/api/auth/callback"
     
+    # Executors: blocking work is kept off the event loop in bounded pools;
+    # requests beyond workers + queue size are rejected with a 503
+    tool_io_workers: int = 8
+    tool_io_queue_size: int = 32
+    
+    # Inference scheduler: FIFO queue in front of the model
+    inference_queue_size: int = 8
+    inference_timeout_seconds: float = 60.0  # Max time a request may wait in the queue
+    
+    # Model loading happens in the background; without preload it starts on
+    # the first chat request. Prefetch reads the file into the page cache up
+    # front (reported as load progress); mlock keeps it from being paged out
+    model_preload: bool = True
+    model_prefetch: bool = True
+    model_use_mmap: bool = True
+    model_use_mlock: bool = False
+    
+    # llama.cpp runtime profile. Thread counts of 0 come from the profile
+    # written by `python -m benchmarks.tune_runtime`, or else the physical
+    # cores within this process's affinity mask and cgroup CPU quota
+    llm_threads: int = 0
+    llm_batch_threads: int = 0
+    llm_batch_size: int = 512
+    llm_context_size: int = 2048
+    llm_kv_cache_type: str = "f16"  # f32, f16, q8_0 or q4_0
+    llm_max_tokens_chat: int = 256
+    llm_max_tokens_pdf: int = 384
+    llm_profile_path: str = ""  # Empty means backend/data/runtime_profile.json
+    
+    # Model pool. MODEL_PATH is the "default" model; LLM_MODELS adds named
+    # ones as JSON, e.g. {"small": "models/tinyllama-1.1b-chat.Q4_K_M.gguf"}.
+    # Chat prompts of up to LLM_CHAT_MODEL_MAX_WORDS words go to
+    # LLM_CHAT_MODEL when it is set. Loaded models are kept within
+    # LLM_POOL_MAX_BYTES of model files (0 = no limit) by unloading the
+    # least recently used idle ones
+    llm_models: Dict[str, str] = {}
+    llm_chat_model: str = ""
+    llm_chat_model_max_words: int = 48
+    llm_pool_max_bytes: int = 0
+    
+    # Speculative decoding for the default model: "prompt_lookup" drafts
+    # tokens from n-grams already in the prompt, "draft" from a small GGUF
+    # model with the same vocabulary (LLM_DRAFT_MODEL_PATH). The model checks
+    # LLM_DRAFT_TOKENS drafted tokens per forward pass
+    llm_speculative: str = "off"  # off, prompt_lookup or draft
+    llm_draft_model_path: str = ""
+    llm_draft_tokens: int = 8
+    llm_draft_ngram_size: int = 2
+    
+    # Evaluate the system prompt once at startup and reuse its KV cache
+    prefix_cache_enabled: bool = True
+    
+    # Conversation sessions; empty dir means backend/data/sessions. Each
+    # session keeps its llama.cpp state so a turn only evaluates its new
+    # tokens. States over CHAT_SESSION_MAX_BYTES in memory move to disk, least
+    # recently used first, and disk states over CHAT_SESSION_DISK_MAX_BYTES
+    # are dropped (the transcript is re-evaluated instead). When the context
+    # fills, the oldest turns are dropped ("window") or summarised ("summary")
+    chat_session_dir: str = ""
+    chat_session_max_bytes: int = 1024 * 1024 * 1024
+    chat_session_disk_max_bytes: int = 8 * 1024 * 1024 * 1024
+    chat_session_ttl_seconds: float = 86400.0  # Idle sessions are deleted after this
+    chat_session_truncation: str = "summary"  # window or summary
+    chat_session_summary_tokens: int = 128
+    
+    # Response cache: TTLs in seconds per intent; 0 disables, None never expires
+    response_cache_max_bytes: int = 64 * 1024 * 1024
+    response_cache_weather_ttl: Optional[float] = 600.0
+    response_cache_drive_ttl: Optional[float] = None  # Kept until invalidated
+    response_cache_chat_ttl: Optional[float] = 0.0  # Sampling at temperature 0.7 is non-deterministic
+    
+    # Local Drive metadata index (SQLite); empty path means backend/data/drive_index.db
+    drive_index_path: str = ""
+    drive_index_sync_interval: float = 30.0  # Seconds between Changes API polls
+    
+    # Drive downloads are streamed in chunks and refused above the size cap
+    drive_download_chunk_size: int = 4 * 1024 * 1024
+    drive_download_max_bytes: int = 100 * 1024 * 1024
+    
+    # Extracted PDF text cache; empty dir means backend/data/pdf_text
+    pdf_text_cache_dir: str = ""
+    pdf_text_cache_max_bytes: int = 512 * 1024 * 1024
+    
+    # PDF text extraction; 0 workers means one per CPU core, 1 disables the process pool
+    pdf_extract_workers: int = 0
+    pdf_parallel_min_pages: int = 32  # Smaller PDFs aren't worth the process round trip
+    pdf_page_timeout_seconds: float = 10.0
+    
+    # PDF question answering; empty index dir means backend/data/pdf_index
+    pdf_index_dir: str = ""
+    pdf_index_max_bytes: int = 256 * 1024 * 1024
+    pdf_chunk_words: int = 200
+    pdf_chunk_overlap_words: int = 40
+    pdf_retrieval_top_k: int = 8
+    pdf_embedding_model_path: str = ""  # GGUF embedding model; empty means BM25 only
+    
+    # Local full-text index of Drive documents for search; empty path means backend/data/content_index.db
+    content_index_enabled: bool = False  # Downloads the text of every document, so opt-in
+    content_index_path: str = ""
+    content_index_sync_interval: float = 300.0
+    content_index_search_limit: int = 10
+    
+    # Weather lookups; empty geocode cache path means backend/data/geocode.db
+    weather_geocode_cache_path: str = ""
+    weather_forecast_ttl: float = 300.0
+    weather_coordinate_precision: int = 2  # Decimal places; 2 is roughly 1 km
+    weather_timeout_seconds: float = 10.0  # Deadline for a whole weather answer
+    weather_max_locations: int = 10  # Cities answered per prompt
+    
+    # Gmail sends retry transient failures with jittered exponential backoff
+    gmail_max_retries: int = 4
+    gmail_retry_base_delay: float = 1.0
+    gmail_retry_max_delay: float = 30.0
+    gmail_blocking_retry_seconds: float = 10.0  # Retry time cap for sends a caller waits on in a thread
+    
+    # Outgoing email queue; empty path means backend/data/outbox.db
+    outbox_enabled: bool = True
+    outbox_path: str = ""
+    outbox_send_rate: float = 2.0  # Messages per second; a send costs 100 of Gmail's 250 quota units/s
+    outbox_daily_limit: int = 500  # Recipients per rolling 24 hours (consumer Gmail's sending limit)
+    
+    # Shared async HTTP client for outbound API calls
+    http_max_connections: int = 32
+    http_max_connections_per_host: int = 8
+    http_keepalive_seconds: float = 60.0
+    
+    @field_validator("llm_speculative")
+    @classmethod
+    def normalize_speculative_mode(cls, value: str) -> str:
+        """Compare modes in one case everywhere, e.g. LLM_SPECULATIVE=Draft."""
+        return value.strip().lower()
+    
     class Config:
         env_file = ".env"
         case_sensitive = False  # This allows for case-insensitive matching
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+class ExecutorOverloaded(Exception):
+    """Raised when an executor's queue is full and the work is rejected."""
+
+class BoundedExecutor:
+    """
+    Thread pool with a cap on queued work.
+
+    At most max_workers jobs run at once and at most max_queue more may wait;
+    anything beyond that is rejected with ExecutorOverloaded instead of piling
+    up behind a slow job.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def _acquire(self):
+        if not self._slots.acquire(blocking=False):
+            logger.warning(f"{self.name} executor overloaded, rejecting work")
+            raise ExecutorOverloaded(f"The {self.name} queue is full. Please try again shortly.")
+        with self._lock:
+            self._in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of jobs running or waiting in this executor."""
+        return self._in_flight
+
+    @property
+    def saturated(self) -> bool:
+        """True when new work would currently be rejected."""
+        return self._in_flight >= self.max_workers + self.max_queue
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking callable in the pool and await its result."""
+        self._acquire()
+        try:
+            future = self._pool.submit(partial(fn, *args, **kwargs))
+        except Exception:
+            self._release()
+            raise
+        # Release when the job itself finishes, not when the caller stops
+        # waiting, so a cancelled request can't free a slot that's still busy
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+# Network-bound tool calls; model access goes through the inference scheduler
+io_executor = BoundedExecutor(
+    "tool-io", settings.tool_io_workers, settings.tool_io_queue_size
+)
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Dict, Optional
+from urllib.parse import urlsplit
+import httpx
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+class AsyncHttpClient:
+    """
+    Shared, pooled async HTTP client on its own event loop thread.
+
+    Connections are kept alive and reused (over HTTP/2 when the h2 package is
+    installed), and each host gets at most max_per_host requests in flight.
+    Blocking code, such as tool handlers on the I/O pool, hands coroutines to
+    the loop with run(); async code on the loop awaits request() directly.
+    """
+
+    def __init__(self, max_connections: int, max_per_host: int, keepalive_expiry: float):
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.keepalive_expiry = keepalive_expiry
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="http-client", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Only called on the loop thread, so no lock is needed
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+            )
+        return self._client
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request through the pool, waiting for a per-host slot first."""
+        host = urlsplit(url).netloc
+        limit = self._host_limits.setdefault(host, asyncio.Semaphore(self.max_per_host))
+        async with limit:
+            return await self._get_client().request(method, url, **kwargs)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the client's loop from another thread and wait for it."""
+        future = asyncio.run_coroutine_threadsafe(coro, self._start())
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    async def run_async(self, coro: Awaitable[Any]) -> Any:
+        """Await a coroutine on the client's loop from a different event loop."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._start()))
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result(5)
+            self._client = None
+        loop.call_soon_threadsafe(loop.stop)
+
+http_client = AsyncHttpClient(
+    max_connections=settings.http_max_connections,
+    max_per_host=settings.http_max_connections_per_host,
+    keepalive_expiry=settings.http_keepalive_seconds,
+)
@@ -0,0 +1,60 @@
+import re
+from typing import Dict, FrozenSet, Iterable, Set
+
+def _trie_pattern(node: Dict) -> str:
+    """Regex for a character trie, preferring the longest phrase at each position."""
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char != ""]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if "" in node:
+        # A phrase ends here; a longer one may continue from it
+        return "(?:" + body + ")?"
+    return body
+
+def _straddles(phrase: str, other: str) -> bool:
+    """Whether other can start inside phrase (after its first character) and run past its end."""
+    return any(other.startswith(phrase[start:]) and len(other) > len(phrase) - start for start in range(1, len(phrase)))
+
+class PhraseMatcher:
+    """
+    Finds which of a fixed set of phrases occur in a text, in one pass.
+
+    The phrases are compiled into a single trie-shaped regex, so one findall
+    scans the text and reports the longest phrase at each match position.
+    Matches don't overlap, so a phrase that starts inside a reported one can
+    be skipped: if it lies wholly inside, it is implied by the reported
+    phrase; if it runs past the end, it is one of the few phrases (worked out
+    when the matcher is built) that get an explicit substring test. The
+    result equals testing `phrase in text` for every phrase, which is what an
+    Aho-Corasick scan computes, with the scanning done by the regex engine.
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        phrases = set(phrases)
+        trie: Dict = {}
+        for phrase in phrases:
+            node = trie
+            for char in phrase:
+                node = node.setdefault(char, {})
+            node[""] = True
+        self._pattern = re.compile(_trie_pattern(trie))
+        # Phrases that occur inside each phrase, itself included
+        self._contained: Dict[str, FrozenSet[str]] = {
+            phrase: frozenset(other for other in phrases if other in phrase) for phrase in phrases
+        }
+        # Phrases a match of each phrase could hide from the scan
+        self._straddling: Dict[str, FrozenSet[str]] = {
+            phrase: frozenset(other for other in phrases if _straddles(phrase, other)) for phrase in phrases
+        }
+
+    def find(self, text: str) -> Set[str]:
+        found: Set[str] = set()
+        unchecked: Set[str] = set()
+        for phrase in self._pattern.findall(text):
+            found |= self._contained[phrase]
+            unchecked |= self._straddling[phrase]
+        for phrase in unchecked - found:
+            if phrase in text:
+                found |= self._contained[phrase]
+        return found
@@ -0,0 +1,137 @@
+import json
+import logging
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Set
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# ggml tensor types llama.cpp accepts for the K and V caches
+KV_CACHE_TYPES = {"f32": 0, "f16": 1, "q4_0": 2, "q8_0": 8}
+
+def _allowed_cpus() -> Set[int]:
+    """CPUs this process may run on (its affinity mask)."""
+    try:
+        return os.sched_getaffinity(0)
+    except AttributeError:
+        return set(range(os.cpu_count() or 1))
+
+def _cgroup_cpu_limit() -> Optional[float]:
+    """CPU quota from cgroup v2 cpu.max or v1 cfs_quota_us, in CPUs; None if unlimited."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+def _physical_cores(cpus: Set[int]) -> int:
+    """Number of distinct physical cores among cpus, counting hyperthread siblings once."""
+    cores = set()
+    for cpu in cpus:
+        try:
+            with open(f"/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list") as f:
+                cores.add(f.read().strip())
+        except OSError:
+            cores.add(str(cpu))
+    return len(cores) or 1
+
+def cpu_budget() -> Dict[str, int]:
+    """
+    Logical and physical CPUs actually available to this process.
+
+    Both are capped by the cgroup CPU quota, since a container limited to
+    two CPUs gains nothing from more threads than that.
+    """
+    cpus = _allowed_cpus()
+    logical, physical = len(cpus), _physical_cores(cpus)
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cap = max(1, math.ceil(limit))
+        logical, physical = min(logical, cap), min(physical, cap)
+    return {"logical": logical, "physical": physical}
+
+def profile_path() -> str:
+    return settings.llm_profile_path or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "runtime_profile.json"
+    )
+
+def load_tuned_profile() -> Dict[str, Any]:
+    """The profile written by the auto-tuner, or {} if there isn't one."""
+    try:
+        with open(profile_path()) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable runtime profile {profile_path()}: {str(e)}")
+        return {}
+
+def save_tuned_profile(profile: Dict[str, Any]):
+    path = profile_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+
+@dataclass
+class RuntimeProfile:
+    """llama.cpp load parameters and per-intent generation lengths."""
+    n_threads: int
+    n_threads_batch: int
+    n_batch: int
+    n_ctx: int
+    use_mmap: bool
+    use_mlock: bool
+    kv_cache_type: str
+    max_tokens: Dict[str, int] = field(default_factory=dict)
+
+    def llama_kwargs(self) -> Dict[str, Any]:
+        kwargs = {
+            "n_threads": self.n_threads,
+            "n_threads_batch": self.n_threads_batch,
+            "n_batch": self.n_batch,
+            "n_ctx": self.n_ctx,
+            "use_mmap": self.use_mmap,
+            "use_mlock": self.use_mlock,
+        }
+        if self.kv_cache_type != "f16":
+            kwargs["type_k"] = kwargs["type_v"] = KV_CACHE_TYPES[self.kv_cache_type]
+        return kwargs
+
+    def max_tokens_for(self, intent: str) -> int:
+        return self.max_tokens.get(intent, self.max_tokens["chat"])
+
+def get_runtime_profile() -> RuntimeProfile:
+    """
+    Resolve the runtime profile.
+
+    Explicit settings win; thread counts left at 0 come from the tuned
+    profile if there is one, and otherwise default to the physical cores
+    available (decoding is memory-bound, so hyperthreads only add contention).
+    """
+    tuned = load_tuned_profile()
+    budget = cpu_budget()
+    kv_cache_type = settings.llm_kv_cache_type.lower()
+    if kv_cache_type not in KV_CACHE_TYPES:
+        raise ValueError(f"Unknown KV cache type {settings.llm_kv_cache_type}; use one of {', '.join(KV_CACHE_TYPES)}")
+    n_threads = settings.llm_threads or tuned.get("n_threads") or budget["physical"]
+    return RuntimeProfile(
+        n_threads=n_threads,
+        n_threads_batch=settings.llm_batch_threads or tuned.get("n_threads_batch") or n_threads,
+        n_batch=settings.llm_batch_size,
+        n_ctx=settings.llm_context_size,
+        use_mmap=settings.model_use_mmap,
+        use_mlock=settings.model_use_mlock,
+        kv_cache_type=kv_cache_type,
+        max_tokens={"chat": settings.llm_max_tokens_chat, "query_pdf": settings.llm_max_tokens_pdf},
+    )
@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, Optional
+from .config import settings
+from .executors import ExecutorOverloaded
+
+logger = logging.getLogger(__name__)
+
+class DeadlineExceeded(Exception):
+    """Raised when a request waited in the queue past its deadline."""
+
+@dataclass
+class InferenceJob:
+    fn: Callable[..., Any]
+    args: tuple
+    kwargs: Dict[str, Any]
+    deadline: float
+    enqueued_at: float = field(default_factory=time.monotonic)
+    future: Future = field(default_factory=Future)
+    cancelled: threading.Event = field(default_factory=threading.Event)
+
+class InferenceScheduler:
+    """
+    FIFO scheduler that owns all access to the llama.cpp model.
+
+    A single worker thread runs jobs strictly in arrival order, so concurrent
+    requests never race on the model. Jobs that are cancelled (the client
+    disconnected) or whose deadline passed while queued are dropped without
+    touching the model.
+
+    run() and stream() take an optional on_done callback, called once the
+    job can no longer touch the model: when it finishes, is dropped or is
+    rejected. Callers release per-request resources there rather than when
+    they stop waiting, since a job that has started keeps running after its
+    caller is cancelled.
+    """
+
+    def __init__(self, max_queue: int, timeout: float):
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._queue: Deque[InferenceJob] = deque()
+        self._cond = threading.Condition()
+        self._running: Optional[InferenceJob] = None
+        self._stopped = False
+        self._wait_times: Deque[float] = deque(maxlen=256)
+        self._counters = {
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "expired": 0,
+            "cancelled": 0,
+        }
+        self._worker = threading.Thread(target=self._work, name="inference-scheduler", daemon=True)
+        self._worker.start()
+
+    def _submit(self, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any], timeout: Optional[float],
+                cancelled: Optional[threading.Event] = None,
+                on_done: Optional[Callable[[], None]] = None) -> InferenceJob:
+        job = InferenceJob(
+            fn=fn,
+            args=args,
+            kwargs=kwargs,
+            deadline=time.monotonic() + (timeout if timeout is not None else self.timeout),
+            cancelled=cancelled or threading.Event(),
+        )
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self._counters["rejected"] += 1
+                logger.warning("Inference queue full, rejecting request")
+                if on_done is not None:
+                    on_done()
+                raise ExecutorOverloaded("The inference queue is full. Please try again shortly.")
+            if on_done is not None:
+                job.future.add_done_callback(lambda _: on_done())
+            self._queue.append(job)
+            self._cond.notify()
+        return job
+
+    def _next_job(self) -> Optional[InferenceJob]:
+        with self._cond:
+            while not self._queue and not self._stopped:
+                self._cond.wait()
+            if self._stopped:
+                return None
+            job = self._queue.popleft()
+            self._running = job
+            return job
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                self._run_job(job)
+            finally:
+                with self._cond:
+                    self._running = None
+
+    def _run_job(self, job: InferenceJob):
+        # Future.cancel() succeeds while the job is still pending, which is
+        # how an awaiting request that went away removes its queued job
+        if job.cancelled.is_set() or not job.future.set_running_or_notify_cancel():
+            # Resolve the future so its done callbacks run
+            job.future.cancel()
+            self._count("cancelled")
+            return
+
+        started = time.monotonic()
+        if started > job.deadline:
+            self._count("expired")
+            job.future.set_exception(DeadlineExceeded("Request timed out waiting for the model."))
+            return
+
+        with self._cond:
+            self._wait_times.append(started - job.enqueued_at)
+        try:
+            result = job.fn(*job.args, **job.kwargs)
+        except Exception as e:
+            self._count("failed")
+            job.future.set_exception(e)
+        else:
+            self._count("completed")
+            job.future.set_result(result)
+
+    def _count(self, name: str):
+        with self._cond:
+            self._counters[name] += 1
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None,
+                  on_done: Optional[Callable[[], None]] = None, **kwargs) -> Any:
+        """Queue a blocking model call and await its result."""
+        job = self._submit(fn, args, kwargs, timeout, on_done=on_done)
+        try:
+            return await asyncio.wrap_future(job.future)
+        except asyncio.CancelledError:
+            job.cancelled.set()
+            raise
+
+    async def stream(self, fn: Callable[..., Iterator[Any]], *args, timeout: Optional[float] = None,
+                     on_done: Optional[Callable[[], None]] = None, **kwargs) -> AsyncIterator[Any]:
+        """
+        Queue a blocking generator and yield its items as they are produced.
+
+        The generator keeps the model for its whole run. If the consumer stops
+        early, the job is cancelled and the generator is abandoned at the next
+        item, freeing the model for the next request.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        cancelled = threading.Event()
+
+        def produce():
+            try:
+                for item in fn(*args, **kwargs):
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        def forward_failure(future: Future):
+            # Queue-level failures such as an expired deadline surface
+            # through the job's future rather than from the generator
+            if not future.cancelled() and future.exception() is not None:
+                loop.call_soon_threadsafe(queue.put_nowait, future.exception())
+
+        job = self._submit(produce, (), {}, timeout, cancelled, on_done)
+        job.future.add_done_callback(forward_failure)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            job.cancelled.set()
+            job.future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue length, wait-time and outcome counters for monitoring."""
+        with self._cond:
+            waits = list(self._wait_times)
+            running = self._running is not None
+            oldest = (time.monotonic() - self._queue[0].enqueued_at) if self._queue else 0.0
+            stats = {
+                "queue_length": len(self._queue),
+                "max_queue": self.max_queue,
+                "running": running,
+                "oldest_wait_seconds": round(oldest, 3),
+                **self._counters,
+            }
+        if waits:
+            ordered = sorted(waits)
+            stats["wait_seconds"] = {
+                "avg": round(sum(ordered) / len(ordered), 3),
+                "p50": round(ordered[len(ordered) // 2], 3),
+                "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                "max": round(ordered[-1], 3),
+            }
+        else:
+            stats["wait_seconds"] = {"avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        return stats
+
+    @property
+    def saturated(self) -> bool:
+        """True when new work would currently be rejected."""
+        with self._cond:
+            return len(self._queue) >= self.max_queue
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            for job in self._queue:
+                job.future.cancel()
+            self._queue.clear()
+            self._cond.notify_all()
+
+inference_scheduler = InferenceScheduler(
+    settings.inference_queue_size, settings.inference_timeout_seconds
+)
@@ -1,9 +1,19 @@
 import os
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from .api import chat, auth
+from .api import chat, auth, email, media, models
 from .core.config import settings
+from .core.executors import io_executor
+from .core.http_client import http_client
+from .core.scheduler import inference_scheduler
+from .services.auth_service import get_service_registry
+from .services.content_index import get_content_index
+from .services.drive_index import get_drive_index
+from .services.model_manager import model_manager
+from .services.outbox import get_outbox
+from .services.pdf_extraction import shutdown_pool
 
 load_dotenv()
 app = FastAPI(
@@ -32,6 +42,9 @@ app.add_middleware(
 # Include routers
 app.include_router(chat.router, prefix="/api", tags=["Chat"])
 app.include_router(auth.router, prefix="/api", tags=["Auth"])
+app.include_router(media.router, prefix="/api", tags=["Media"])
+app.include_router(email.router, prefix="/api", tags=["Email"])
+app.include_router(models.router, prefix="/api", tags=["Models"])
 
 @app.get("/")
 async def root():
@@ -45,5 +58,44 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
-    """Health check endpoint to verify API status."""
+    """Liveness check: the API is up, whether or not the model has loaded."""
     return {"status": "healthy"}
+
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness check: 200 once the default model is loaded, otherwise 503 with load progress."""
+    status = model_manager.status()
+    return JSONResponse(status_code=200 if model_manager.ready else 503, content=status)
+
+@app.on_event("startup")
+async def start_model_load():
+    """Load the models in the background so the API can serve tool requests meanwhile."""
+    if settings.model_preload:
+        model_manager.preload()
+
+@app.on_event("startup")
+async def start_drive_index():
+    """Crawl Drive metadata (and document text, if enabled) in the background if we are already authenticated."""
+    if get_service_registry().auth_service.is_authenticated():
+        get_drive_index().start_background_sync()
+        if settings.content_index_enabled:
+            get_content_index().start_background_sync()
+
+@app.on_event("startup")
+async def start_outbox():
+    """Start delivering queued emails."""
+    if settings.outbox_enabled:
+        get_outbox().start()
+
+@app.on_event("shutdown")
+async def shutdown_executors():
+    """Stop the inference scheduler, tool I/O pool, HTTP client, PDF extraction workers and background workers."""
+    inference_scheduler.shutdown()
+    io_executor.shutdown()
+    http_client.close()
+    shutdown_pool()
+    get_drive_index().stop()
+    if settings.content_index_enabled:
+        get_content_index().stop()
+    if settings.outbox_enabled:
+        get_outbox().stop()
@@ -1,10 +1,13 @@
 import os
 import json
+import threading
 from pathlib import Path
 from typing import Dict, Optional
+import httplib2
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request as GoogleRequest
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
 import logging
 from fastapi import HTTPException
@@ -219,4 +222,95 @@ def get_google_credentials():
         return credentials
     except Exception as e:
         logger.error(f"Error getting Google credentials: {str(e)}")
-        return None 
\ No newline at end of file
+        return None
+
+class ServiceRegistry:
+    """
+    Process-wide cache of authenticated Google API clients.
+
+    Credentials are read from the token file once and refreshed in memory;
+    the token file is only rewritten when the access token actually changes.
+    Built clients are reused across calls. httplib2 connections are not
+    thread-safe, so each worker thread gets its own client per API, which
+    keeps its HTTP connection alive between calls.
+    """
+
+    def __init__(self, auth_service: AuthService):
+        self.auth_service = auth_service
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._credentials: Optional[Credentials] = None
+        self._persisted_token: Optional[str] = None
+        self._generation = 0
+
+    def _get_credentials(self) -> Credentials:
+        """Return valid credentials, loading or refreshing them if needed."""
+        with self._lock:
+            if self._credentials is None:
+                self._credentials = self.auth_service.get_credentials()
+                if not self._credentials:
+                    raise ValueError("Not authenticated")
+                self._persisted_token = self._credentials.token
+
+            credentials = self._credentials
+            if credentials.expired and credentials.refresh_token:
+                try:
+                    credentials.refresh(GoogleRequest())
+                    logger.info("Credentials refreshed successfully")
+                except Exception as e:
+                    logger.error(f"Failed to refresh credentials: {str(e)}")
+                    raise ValueError("Authentication expired. Please re-authenticate.")
+
+            # AuthorizedHttp may also refresh on its own after a 401, so
+            # compare against what is on disk rather than tracking refreshes
+            if credentials.token != self._persisted_token:
+                self.auth_service._save_credentials(credentials)
+                self._persisted_token = credentials.token
+            return credentials
+
+    def get_service(self, api: str, version: str):
+        """Get the calling thread's client for an API, building it on first use."""
+        credentials = self._get_credentials()
+        services = getattr(self._local, "services", None)
+        if services is None or self._local.generation != self._generation:
+            services = self._local.services = {}
+            self._local.generation = self._generation
+
+        key = (api, version)
+        if key not in services:
+            http = AuthorizedHttp(credentials, http=httplib2.Http())
+            # The discovery file cache only works with oauth2client<4.0.0
+            services[key] = build(api, version, http=http, cache_discovery=False)
+            logger.info(f"Built {api} {version} client for {threading.current_thread().name}")
+        return services[key]
+
+    @property
+    def generation(self) -> int:
+        """Incremented on every reset, so callers can tell when cached data belongs to old credentials."""
+        return self._generation
+
+    def new_http(self) -> AuthorizedHttp:
+        """A dedicated authorized connection, for requests consumed outside the building thread."""
+        return AuthorizedHttp(self._get_credentials(), http=httplib2.Http())
+
+    def reset(self):
+        """Forget cached credentials and clients, e.g. after re-authentication."""
+        with self._lock:
+            self._credentials = None
+            self._persisted_token = None
+            self._generation += 1
+
+_registry: Optional[ServiceRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_service_registry() -> ServiceRegistry:
+    """Get the shared service registry for the backend's token file."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+            _registry = ServiceRegistry(AuthService(
+                credentials_path=os.path.join(base_dir, "credentials.json"),
+                token_path=os.path.join(base_dir, "token.json")
+            ))
+        return _registry
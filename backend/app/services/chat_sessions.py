@@ -0,0 +1,285 @@
+import json
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SESSION_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+class UnknownSession(Exception):
+    """Raised when a request names a session that doesn't exist or has expired."""
+
+@dataclass
+class Turn:
+    user: str
+    assistant: str
+
+@dataclass
+class ChatSession:
+    """A conversation: its transcript and the model state after its last reply."""
+    id: str
+    created_at: float
+    last_used: float
+    # Pool model the conversation is pinned to, so its state stays usable
+    model: Optional[str] = None
+    turns: List[Turn] = field(default_factory=list)
+    # What was said in turns removed to fit the context window
+    summary: str = ""
+    # llama.cpp state and the model file it was saved from; state is None
+    # while it is on disk or if there is none
+    state: Any = None
+    state_model_path: Optional[str] = None
+    state_bytes: int = 0
+
+class SessionStore:
+    """
+    Conversation sessions with their llama.cpp states.
+
+    Transcripts are written to disk after every change, so sessions survive a
+    restart. States stay in memory within max_bytes; beyond that the least
+    recently used are pickled to disk, and disk states beyond disk_max_bytes
+    are deleted, least recently used first. A session whose state is gone
+    re-evaluates its transcript on its next turn. Sessions idle for longer
+    than ttl are deleted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, disk_max_bytes: int, ttl: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._sessions: Dict[str, ChatSession] = {}
+        # Last use of every session, loaded or not, and sizes of states on disk
+        self._last_used: Dict[str, float] = {}
+        self._disk_states: Dict[str, int] = {}
+        for name in os.listdir(directory):
+            session_id, ext = os.path.splitext(name)
+            if not SESSION_ID_PATTERN.match(session_id):
+                continue
+            path = os.path.join(directory, name)
+            if ext == ".json":
+                self._last_used[session_id] = os.path.getmtime(path)
+            elif ext == ".state":
+                self._disk_states[session_id] = os.path.getsize(path)
+        for session_id in set(self._disk_states) - set(self._last_used):
+            self._remove(session_id)
+
+    def _path(self, session_id: str, ext: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.{ext}")
+
+    def _write_transcript(self, session: ChatSession):
+        data = {
+            "id": session.id,
+            "created_at": session.created_at,
+            "model": session.model,
+            "turns": [asdict(turn) for turn in session.turns],
+            "summary": session.summary,
+            "state_model_path": session.state_model_path,
+        }
+        path = self._path(session.id, "json")
+        # Write to a temp file first so a crash never leaves a partial transcript
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _read_transcript(self, session_id: str) -> ChatSession:
+        try:
+            with open(self._path(session_id, "json"), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            raise UnknownSession(f"Unknown session {session_id}")
+        return ChatSession(
+            id=session_id,
+            created_at=data["created_at"],
+            last_used=self._last_used[session_id],
+            model=data["model"],
+            turns=[Turn(**turn) for turn in data["turns"]],
+            summary=data["summary"],
+            state_model_path=data["state_model_path"],
+        )
+
+    def _remove(self, session_id: str):
+        self._sessions.pop(session_id, None)
+        self._last_used.pop(session_id, None)
+        self._disk_states.pop(session_id, None)
+        for ext in ("json", "state"):
+            try:
+                os.remove(self._path(session_id, ext))
+            except FileNotFoundError:
+                pass
+
+    def _drop_disk_state(self, session_id: str):
+        if self._disk_states.pop(session_id, None) is not None:
+            try:
+                os.remove(self._path(session_id, "state"))
+            except FileNotFoundError:
+                pass
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for session_id in [sid for sid, used in self._last_used.items() if used < cutoff]:
+            logger.info(f"Deleting idle chat session {session_id}")
+            self._remove(session_id)
+
+    def create(self) -> ChatSession:
+        now = time.time()
+        session = ChatSession(uuid.uuid4().hex, now, now)
+        with self._lock:
+            self._expire()
+            self._sessions[session.id] = session
+            self._last_used[session.id] = now
+            self._write_transcript(session)
+        return session
+
+    def get(self, session_id: str) -> ChatSession:
+        """Look up a session, reading its transcript from disk if it isn't loaded."""
+        with self._lock:
+            self._expire()
+            if not SESSION_ID_PATTERN.match(session_id) or session_id not in self._last_used:
+                raise UnknownSession(f"Unknown session {session_id}")
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = self._read_transcript(session_id)
+            session.last_used = self._last_used[session_id] = time.time()
+            return session
+
+    def delete(self, session_id: str):
+        with self._lock:
+            if session_id not in self._last_used:
+                raise UnknownSession(f"Unknown session {session_id}")
+            self._remove(session_id)
+
+    def add_turn(self, session: ChatSession, user: str, assistant: str, model: str):
+        """Append a turn, pinning the session to the model that answered its first one."""
+        with self._lock:
+            # Deleted while the reply was generated; don't write it back
+            if session.id not in self._last_used:
+                return
+            session.turns.append(Turn(user, assistant))
+            session.model = session.model or model
+            self._write_transcript(session)
+
+    def truncate(self, session: ChatSession, drop: int, summary: str):
+        """Remove the oldest drop turns and replace the summary."""
+        with self._lock:
+            if session.id not in self._last_used:
+                return
+            session.turns = session.turns[drop:]
+            session.summary = summary
+            self._write_transcript(session)
+
+    def put_state(self, session: ChatSession, state: Any, model_path: str, size: int):
+        """Keep the model state after a reply, moving other states to disk if over budget."""
+        with self._lock:
+            if session.id not in self._last_used:
+                return
+            self._drop_disk_state(session.id)
+            session.state, session.state_bytes = state, size
+            if session.state_model_path != model_path:
+                session.state_model_path = model_path
+                self._write_transcript(session)
+            self._spill(keep=session.id)
+
+    def get_state(self, session: ChatSession, model_path: str) -> Optional[Any]:
+        """The session's state for model_path, read back from disk if it was spilled."""
+        with self._lock:
+            if session.state_model_path != model_path:
+                return None
+            if session.state is None and session.id in self._disk_states:
+                path = self._path(session.id, "state")
+                try:
+                    with open(path, "rb") as f:
+                        session.state = pickle.load(f)
+                except (OSError, pickle.UnpicklingError, EOFError) as e:
+                    logger.warning(f"Dropping unreadable state of session {session.id}: {str(e)}")
+                self._drop_disk_state(session.id)
+                self._spill(keep=session.id)
+            return session.state
+
+    def drop_state(self, session: ChatSession):
+        """Forget a state that turned out not to fit the model."""
+        with self._lock:
+            session.state = None
+            self._drop_disk_state(session.id)
+
+    def _spill(self, keep: str):
+        """Move states to disk until memory is within budget, then trim disk states."""
+        in_memory = [session for session in self._sessions.values() if session.state is not None]
+        used = sum(session.state_bytes for session in in_memory)
+        for session in sorted(in_memory, key=lambda session: session.last_used):
+            if used <= self.max_bytes:
+                break
+            if session.id == keep:
+                continue
+            path = self._path(session.id, "state")
+            try:
+                with open(f"{path}.tmp", "wb") as f:
+                    pickle.dump(session.state, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(f"{path}.tmp", path)
+                self._disk_states[session.id] = os.path.getsize(path)
+            except OSError as e:
+                logger.warning(f"Couldn't move state of session {session.id} to disk: {str(e)}")
+            session.state = None
+            used -= session.state_bytes
+
+        on_disk = sorted(self._disk_states, key=lambda session_id: self._last_used.get(session_id, 0))
+        while on_disk and sum(self._disk_states.values()) > self.disk_max_bytes:
+            self._drop_disk_state(on_disk.pop(0))
+
+    def describe(self, session: ChatSession) -> Dict[str, Any]:
+        with self._lock:
+            if session.state is not None:
+                state = "memory"
+            elif session.id in self._disk_states:
+                state = "disk"
+            else:
+                state = None
+            return {
+                "session_id": session.id,
+                "model": session.model,
+                "turns": [asdict(turn) for turn in session.turns],
+                "summary": session.summary,
+                "state": state,
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_memory = [session for session in self._sessions.values() if session.state is not None]
+            return {
+                "sessions": len(self._last_used),
+                "states_in_memory": len(in_memory),
+                "memory_bytes": sum(session.state_bytes for session in in_memory),
+                "max_bytes": self.max_bytes,
+                "states_on_disk": len(self._disk_states),
+                "disk_bytes": sum(self._disk_states.values()),
+                "disk_max_bytes": self.disk_max_bytes,
+            }
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+def get_session_store() -> SessionStore:
+    """Get the shared conversation session store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            directory = settings.chat_session_dir or os.path.join(
+                os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "sessions"
+            )
+            _store = SessionStore(
+                directory,
+                settings.chat_session_max_bytes,
+                settings.chat_session_disk_max_bytes,
+                settings.chat_session_ttl_seconds
+            )
+        return _store
@@ -0,0 +1,204 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import List, Optional
+from ..core.config import settings
+from .drive_index import get_drive_index
+from .response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+# File types whose text read_resource can produce
+INDEXED_MIME_TYPES = (
+    "application/vnd.google-apps.document",
+    "application/vnd.google-apps.spreadsheet",
+    "application/vnd.google-apps.presentation",
+    "application/json",
+    "application/pdf",
+)
+INDEXED_MIME_PREFIXES = ("text/",)
+
+TERM_PATTERN = re.compile(r'\w+')
+SNIPPET_TOKENS = 16
+# Matches in a file's name count for more than matches in its body
+NAME_WEIGHT = 5.0
+BODY_WEIGHT = 1.0
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS content USING fts5(
+    file_id UNINDEXED,
+    name,
+    body,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS indexed (
+    file_id TEXT PRIMARY KEY,
+    version TEXT,
+    mime_type TEXT NOT NULL,
+    error TEXT
+);
+"""
+
+@dataclass
+class ContentMatch:
+    file_id: str
+    name: str
+    mime_type: str
+    snippet: str
+    score: float
+
+def to_match_query(query: str, any_term: bool = False) -> Optional[str]:
+    """Turn free text into an FTS5 query of quoted terms, so user input can't inject syntax."""
+    terms = TERM_PATTERN.findall(query)
+    if not terms:
+        return None
+    return (" OR " if any_term else " ").join(f'"{term}"' for term in terms)
+
+class ContentIndex:
+    """
+    Local full-text index (SQLite FTS5) over the text of Drive documents.
+
+    Files to index come from the Drive metadata index. Each pass compares
+    their modified times with what was indexed and only fetches text for
+    new or changed files, so after the first build an update costs as much
+    as the number of changes. Searches never touch the network.
+    """
+
+    def __init__(self, db_path: str, sync_interval: float):
+        self.db_path = db_path
+        self.sync_interval = sync_interval
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        """Whether any file has been indexed yet."""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM indexed LIMIT 1").fetchone() is not None
+
+    def _indexed_versions(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT file_id, version FROM indexed").fetchall()
+        return {row["file_id"]: row["version"] for row in rows}
+
+    def _store(self, file: dict, text: str, error: Optional[str] = None):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM content WHERE file_id = ?", (file["id"],))
+            if text:
+                self._conn.execute(
+                    "INSERT INTO content (file_id, name, body) VALUES (?, ?, ?)",
+                    (file["id"], file["name"], text)
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO indexed (file_id, version, mime_type, error) VALUES (?, ?, ?, ?)",
+                (file["id"], file["modified_time"], file["mime_type"], error)
+            )
+
+    def _delete(self, file_ids: List[str]):
+        with self._lock, self._conn:
+            for file_id in file_ids:
+                self._conn.execute("DELETE FROM content WHERE file_id = ?", (file_id,))
+                self._conn.execute("DELETE FROM indexed WHERE file_id = ?", (file_id,))
+
+    def _fetch_text(self, file: dict) -> str:
+        from .drive_service import read_resource
+        return "\n".join(content.text for content in read_resource(f"gdrive:///{file['id']}"))
+
+    def update(self) -> int:
+        """Index new and changed files and drop removed ones; returns the number of changes."""
+        drive_index = get_drive_index()
+        drive_index.sync()
+        files = drive_index.file_versions(INDEXED_MIME_TYPES, INDEXED_MIME_PREFIXES)
+        indexed = self._indexed_versions()
+
+        removed = [file_id for file_id in indexed if file_id not in files]
+        self._delete(removed)
+        changed = [file for file_id, file in files.items() if indexed.get(file_id, "") != file["modified_time"]]
+        for file in changed:
+            if self._stop.is_set():
+                break
+            try:
+                self._store(file, self._fetch_text(file))
+            except Exception as e:
+                # Recorded with its version so it isn't retried until the file changes
+                logger.warning(f"Could not index '{file['name']}': {str(e)}")
+                self._store(file, "", error=str(e))
+
+        count = len(removed) + len(changed)
+        if count:
+            response_cache.invalidate(["search_files"])
+            logger.info(f"Content index: {len(changed)} files indexed, {len(removed)} removed")
+        return count
+
+    def start_background_sync(self):
+        """Build the index, then keep applying changes, in a background thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    self.update()
+                except Exception as e:
+                    logger.error(f"Content index update failed: {str(e)}")
+                self._stop.wait(self.sync_interval)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="content-index-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def search(self, query: str, limit: int = 10) -> List[ContentMatch]:
+        """Rank files by BM25 over name and text; all terms must match, else any term."""
+        for any_term in (False, True):
+            match_query = to_match_query(query, any_term=any_term)
+            if match_query is None:
+                return []
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT c.file_id, c.name, i.mime_type, "
+                    f"snippet(content, 2, '**', '**', '...', {SNIPPET_TOKENS}) AS snippet, "
+                    f"bm25(content, 0.0, {NAME_WEIGHT}, {BODY_WEIGHT}) AS rank "
+                    f"FROM content c JOIN indexed i ON i.file_id = c.file_id "
+                    f"WHERE content MATCH ? ORDER BY rank LIMIT ?",
+                    (match_query, limit)
+                ).fetchall()
+            if rows:
+                # FTS5's bm25() is lower-is-better; flip it so higher scores rank first
+                return [
+                    ContentMatch(file_id=row["file_id"], name=row["name"], mime_type=row["mime_type"],
+                                 snippet=" ".join(row["snippet"].split()), score=-row["rank"])
+                    for row in rows
+                ]
+        return []
+
+    def stats(self) -> dict:
+        with self._lock:
+            files, errors = self._conn.execute(
+                "SELECT COUNT(*), COUNT(error) FROM indexed"
+            ).fetchone()
+        return {"files": files, "errors": errors}
+
+_index: Optional[ContentIndex] = None
+_index_lock = threading.Lock()
+
+def get_content_index() -> ContentIndex:
+    """Get the shared Drive full-text index."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            db_path = settings.content_index_path or os.path.join(
+                os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "content_index.db"
+            )
+            _index = ContentIndex(db_path, settings.content_index_sync_interval)
+        return _index
@@ -0,0 +1,349 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from mcp.types import Resource
+from googleapiclient.errors import HttpError
+from ..core.config import settings
+from .name_index import NameEntry, NameIndex, NameMatch
+from .response_cache import DRIVE_INTENTS, response_cache
+
+logger = logging.getLogger(__name__)
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+FILE_FIELDS = "id, name, mimeType, parents, modifiedTime, trashed"
+# Longest wait between retries while syncing keeps failing
+SYNC_MAX_BACKOFF_SECONDS = 600.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    mime_type TEXT NOT NULL,
+    parents TEXT NOT NULL DEFAULT '[]',
+    modified_time TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_files_name ON files(name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_files_mime_type ON files(mime_type);
+CREATE TABLE IF NOT EXISTS parents (
+    file_id TEXT NOT NULL,
+    parent_id TEXT NOT NULL,
+    PRIMARY KEY (file_id, parent_id)
+);
+CREATE INDEX IF NOT EXISTS idx_parents_parent ON parents(parent_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+class DriveIndexNotReady(Exception):
+    """Raised by lookups before the first full crawl has finished."""
+
+def _to_resource(row: sqlite3.Row) -> Resource:
+    return Resource(uri=f"gdrive:///{row['id']}", mimeType=row["mime_type"], name=row["name"])
+
+class DriveIndex:
+    """
+    Local SQLite copy of Drive file metadata.
+
+    The first sync crawls every non-trashed file; later syncs apply only what
+    changed since the stored Changes API page token. Syncs run on a
+    background thread every sync_interval, backing off while they fail.
+    Lookups only read the local database, so they don't depend on Drive size
+    or the network, and keep answering from the last synced state when Drive
+    can't be reached. Until the first crawl has finished they raise
+    DriveIndexNotReady rather than answer from an empty index.
+    """
+
+    def __init__(self, db_path: str, sync_interval: float):
+        self.db_path = db_path
+        self.sync_interval = sync_interval
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._last_sync = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        # Bumped by reset() so a sync started before it doesn't write the
+        # previous account's files afterwards
+        self._epoch = 0
+        # Bumped on every write so the in-memory name index knows to rebuild
+        self._generation = 0
+        self._name_index: Optional[NameIndex] = None
+        self._name_index_generation = -1
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _upsert(self, files: Iterable[Dict]):
+        for file in files:
+            parents = file.get("parents", [])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (id, name, mime_type, parents, modified_time) VALUES (?, ?, ?, ?, ?)",
+                (file["id"], file["name"], file["mimeType"], json.dumps(parents), file.get("modifiedTime"))
+            )
+            self._conn.execute("DELETE FROM parents WHERE file_id = ?", (file["id"],))
+            self._conn.executemany(
+                "INSERT INTO parents (file_id, parent_id) VALUES (?, ?)",
+                [(file["id"], parent) for parent in parents]
+            )
+
+    def _delete(self, file_ids: Iterable[str]):
+        for file_id in file_ids:
+            self._conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+            self._conn.execute("DELETE FROM parents WHERE file_id = ?", (file_id,))
+
+    @property
+    def ready(self) -> bool:
+        """Whether a full crawl has completed, i.e. there is a page token to sync changes from."""
+        return self._get_meta("page_token") is not None
+
+    def reset(self):
+        """Forget all indexed files and the change token, e.g. after signing in to another account."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files")
+            self._conn.execute("DELETE FROM parents")
+            self._conn.execute("DELETE FROM meta")
+            self._epoch += 1
+            self._generation += 1
+        self._last_sync = 0.0
+        response_cache.invalidate(DRIVE_INTENTS)
+        # Crawl the new account now rather than at the end of the current wait
+        self._wake.set()
+        logger.info("Cleared the Drive index")
+
+    def full_sync(self, service):
+        """Crawl all files and record the page token to sync changes from."""
+        logger.info("Starting full Drive index crawl...")
+        epoch = self._epoch
+        start_token = service.changes().getStartPageToken().execute()["startPageToken"]
+        files = []
+        cursor = None
+        while True:
+            results = service.files().list(
+                pageSize=1000,
+                fields=f"nextPageToken, files({FILE_FIELDS})",
+                pageToken=cursor,
+                q="trashed=false"
+            ).execute()
+            files.extend(results.get("files", []))
+            cursor = results.get("nextPageToken")
+            if not cursor:
+                break
+
+        with self._lock, self._conn:
+            if self._epoch != epoch:
+                logger.info("Drive index was reset during the crawl; discarding it")
+                return
+            self._conn.execute("DELETE FROM files")
+            self._conn.execute("DELETE FROM parents")
+            self._upsert(files)
+            self._set_meta("page_token", start_token)
+            self._generation += 1
+        response_cache.invalidate(DRIVE_INTENTS)
+        logger.info(f"Indexed {len(files)} Drive files")
+
+    def incremental_sync(self, service, page_token: str) -> int:
+        """Apply changes since page_token; returns the number of changes."""
+        epoch = self._epoch
+        changed, removed = [], []
+        while page_token:
+            results = service.changes().list(
+                pageToken=page_token,
+                pageSize=1000,
+                includeRemoved=True,
+                fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}))"
+            ).execute()
+            for change in results.get("changes", []):
+                file = change.get("file")
+                if change.get("removed") or not file or file.get("trashed"):
+                    removed.append(change["fileId"])
+                else:
+                    changed.append(file)
+            if "newStartPageToken" in results:
+                new_token = results["newStartPageToken"]
+                break
+            page_token = results.get("nextPageToken")
+        else:
+            return 0
+
+        with self._lock, self._conn:
+            if self._epoch != epoch:
+                return 0
+            self._delete(removed)
+            self._upsert(changed)
+            self._set_meta("page_token", new_token)
+            if changed or removed:
+                self._generation += 1
+        count = len(changed) + len(removed)
+        if count:
+            response_cache.invalidate(DRIVE_INTENTS)
+            logger.info(f"Applied {count} Drive changes to the index")
+        return count
+
+    def sync(self, force: bool = False):
+        """Bring the index up to date if it is older than the sync interval."""
+        with self._sync_lock:
+            if not force and time.monotonic() - self._last_sync < self.sync_interval:
+                return
+            from .drive_service import get_drive_service
+            service = get_drive_service()
+            page_token = self._get_meta("page_token")
+            try:
+                if page_token:
+                    self.incremental_sync(service, page_token)
+                else:
+                    self.full_sync(service)
+            except HttpError as e:
+                # An expired page token means we have to start over
+                if page_token and e.resp.status in (400, 404, 410):
+                    logger.warning("Drive change token rejected, re-crawling")
+                    self.full_sync(service)
+                else:
+                    raise
+            self._last_sync = time.monotonic()
+
+    def start_background_sync(self):
+        """Crawl, then keep applying changes every sync_interval, in a background thread."""
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+
+            def run():
+                failures = 0
+                while not self._stop.is_set():
+                    # Cleared before syncing so a reset() from here on isn't missed
+                    self._wake.clear()
+                    try:
+                        self.sync(force=True)
+                        failures, delay = 0, self.sync_interval
+                    except Exception as e:
+                        failures += 1
+                        delay = min(self.sync_interval * 2 ** failures, SYNC_MAX_BACKOFF_SECONDS)
+                        logger.warning(f"Drive index sync failed, retrying in {delay:.0f}s: {str(e)}")
+                    self._wake.wait(delay)
+
+            self._stop.clear()
+            self._thread = threading.Thread(target=run, name="drive-index-sync", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def check_ready(self):
+        """Raise DriveIndexNotReady until the first full crawl has finished."""
+        if not self.ready:
+            raise DriveIndexNotReady("Your Drive index is still syncing. Please try again shortly.")
+
+    def _query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        self.check_ready()
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def list_folders(self) -> List[Resource]:
+        rows = self._query(
+            "SELECT * FROM files WHERE mime_type = ? ORDER BY name COLLATE NOCASE",
+            (FOLDER_MIME_TYPE,)
+        )
+        return [_to_resource(row) for row in rows]
+
+    def find_folders(self, name: str) -> List[Resource]:
+        rows = self._query(
+            "SELECT * FROM files WHERE mime_type = ? AND name = ? COLLATE NOCASE",
+            (FOLDER_MIME_TYPE, name)
+        )
+        return [_to_resource(row) for row in rows]
+
+    def list_files_in_folder(self, folder_name: str) -> Optional[List[Resource]]:
+        """Files directly inside folders with this name; None if no such folder."""
+        folders = self.find_folders(folder_name)
+        if not folders:
+            return None
+        folder_ids = [str(folder.uri).split("/")[-1] for folder in folders]
+        placeholders = ", ".join("?" for _ in folder_ids)
+        rows = self._query(
+            f"SELECT DISTINCT f.* FROM files f JOIN parents p ON p.file_id = f.id "
+            f"WHERE p.parent_id IN ({placeholders}) AND f.mime_type != ? ORDER BY f.name COLLATE NOCASE",
+            (*folder_ids, FOLDER_MIME_TYPE)
+        )
+        return [_to_resource(row) for row in rows]
+
+    def name_index(self) -> NameIndex:
+        """In-memory name index over the current metadata, rebuilt after changes."""
+        self.check_ready()
+        with self._lock:
+            if self._name_index is None or self._name_index_generation != self._generation:
+                rows = self._conn.execute("SELECT id, name, mime_type FROM files").fetchall()
+                self._name_index = NameIndex(
+                    NameEntry(file_id=row["id"], name=row["name"], mime_type=row["mime_type"]) for row in rows
+                )
+                self._name_index_generation = self._generation
+            return self._name_index
+
+    def resolve_name(self, name: str, mime_prefix: Optional[str] = None) -> Optional[Resource]:
+        """Best match for a human file name, optionally restricted to a MIME type prefix."""
+        match = self.name_index().resolve(name, mime_prefix=mime_prefix)
+        if match is None:
+            return None
+        return Resource(uri=f"gdrive:///{match.entry.file_id}", mimeType=match.entry.mime_type, name=match.entry.name)
+
+    def search_names(self, name: str, mime_prefix: Optional[str] = None, limit: int = 5) -> List[NameMatch]:
+        return self.name_index().search(name, mime_prefix=mime_prefix, limit=limit)
+
+    def list_by_mime_prefix(self, mime_prefix: str, limit: int = 50) -> List[Resource]:
+        rows = self._query(
+            "SELECT * FROM files WHERE mime_type LIKE ? ORDER BY modified_time DESC LIMIT ?",
+            (f"{mime_prefix}%", limit)
+        )
+        return [_to_resource(row) for row in rows]
+
+    def file_versions(self, mime_types: Iterable[str], mime_prefixes: Iterable[str] = ()) -> Dict[str, Dict]:
+        """id -> metadata for files with one of these types or type prefixes, without syncing first."""
+        mime_types, mime_prefixes = list(mime_types), list(mime_prefixes)
+        conditions = [f"mime_type IN ({', '.join('?' for _ in mime_types)})"] if mime_types else []
+        conditions += ["mime_type LIKE ?" for _ in mime_prefixes]
+        if not conditions:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, name, mime_type, modified_time FROM files WHERE {' OR '.join(conditions)}",
+                (*mime_types, *(f"{prefix}%" for prefix in mime_prefixes))
+            ).fetchall()
+        return {row["id"]: dict(row) for row in rows}
+
+    def get_file(self, file_id: str) -> Optional[Dict]:
+        """Locally known metadata for a file id, without syncing first."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, name, mime_type, modified_time FROM files WHERE id = ?", (file_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+_index: Optional[DriveIndex] = None
+_index_lock = threading.Lock()
+
+def get_drive_index() -> DriveIndex:
+    """Get the shared Drive metadata index."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            db_path = settings.drive_index_path or os.path.join(
+                os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "drive_index.db"
+            )
+            _index = DriveIndex(db_path, settings.drive_index_sync_interval)
+        return _index
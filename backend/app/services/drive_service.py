@@ -7,29 +7,140 @@ from mcp.types import (
 )
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseDownload
 from PyPDF2 import PdfReader
-from .auth_service import AuthService
+from .auth_service import get_service_registry
+from .content_index import get_content_index
+from .drive_index import get_drive_index
+from .pdf_extraction import extract_pdf_file_text
+from .text_cache import get_text_cache
+from ..core.config import settings
 import base64
+import codecs
 import io
+import logging
 import re
 import os
-from typing import List
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
 
+logger = logging.getLogger(__name__)
 mcp = FastMCP("gdrive-mcp-server", version="0.1.0")
 
+# URL prefix chat responses use to reference images served by /api/media
+MEDIA_URL_PREFIX = "/api/media/"
+
+def media_url(file_id: str) -> str:
+    return f"{MEDIA_URL_PREFIX}{file_id}"
+
 def get_drive_service():
-    # Get the path to the credentials file
-    credentials_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "credentials.json")
-    token_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "token.json")
-    
-    # Initialize auth service
-    auth_service = AuthService(credentials_path=credentials_path, token_path=token_path)
-    
-    # Get drive service
-    return auth_service.get_drive_service()
-
-def extract_text_from_pdf(binary_data: bytes) -> str:
-    pdf_reader = PdfReader(io.BytesIO(binary_data))
+    # Reuse the shared, already authenticated Drive client
+    return get_service_registry().get_service('drive', 'v3')
+
+class FileTooLargeError(Exception):
+    """Raised when a Drive file exceeds the configured download size cap."""
+
+def _size_error(file_name: str, size: int, max_bytes: int) -> FileTooLargeError:
+    return FileTooLargeError(
+        f"'{file_name}' is {size / (1024 * 1024):.1f} MB, which is over the "
+        f"{max_bytes / (1024 * 1024):.0f} MB download limit."
+    )
+
+def _iter_byte_range(request, start: int, end: int, chunk_size: int) -> Iterator[bytes]:
+    """Fetch bytes start..end (inclusive) of a media request in chunk-sized ranges."""
+    position = start
+    while position <= end:
+        stop = min(position + chunk_size - 1, end)
+        resp, content = request.http.request(request.uri, "GET", headers={"range": f"bytes={position}-{stop}"})
+        if resp.status not in (200, 206):
+            raise HttpError(resp, content, uri=request.uri)
+        if not content:
+            break
+        yield content
+        position += len(content)
+
+def iter_media(file_id: str, export_mime: Optional[str] = None, file_name: str = "file",
+               chunk_size: Optional[int] = None, max_bytes: Optional[int] = None,
+               byte_range: Optional[Tuple[int, int]] = None) -> Iterator[bytes]:
+    """
+    Download a Drive file as a stream of chunks.
+
+    Google Docs types are exported as export_mime. Only one chunk is held in
+    memory at a time, and the download stops with FileTooLargeError as soon
+    as the file is known to exceed max_bytes. byte_range limits the download
+    to an inclusive (start, end) slice of a binary file. The request gets its
+    own connection, so the iterator can be consumed from any thread.
+    """
+    chunk_size = chunk_size or settings.drive_download_chunk_size
+    max_bytes = max_bytes or settings.drive_download_max_bytes
+
+    service = get_drive_service()
+    if export_mime:
+        request = service.files().export_media(fileId=file_id, mimeType=export_mime)
+    else:
+        request = service.files().get_media(fileId=file_id)
+    request.http = get_service_registry().new_http()
+
+    if byte_range is not None:
+        start, end = byte_range
+        if end - start + 1 > max_bytes:
+            raise _size_error(file_name, end - start + 1, max_bytes)
+        yield from _iter_byte_range(request, start, end, chunk_size)
+        return
+
+    buffer = io.BytesIO()
+    downloader = MediaIoBaseDownload(buffer, request, chunksize=chunk_size)
+    received = 0
+    done = False
+    while not done:
+        status, done = downloader.next_chunk()
+        if status and status.total_size and status.total_size > max_bytes:
+            raise _size_error(file_name, status.total_size, max_bytes)
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        received += len(chunk)
+        if received > max_bytes:
+            raise _size_error(file_name, received, max_bytes)
+        if chunk:
+            yield chunk
+
+@contextmanager
+def download_to_file(chunks: Iterator[bytes], suffix: str = "") -> Iterator[str]:
+    """Write chunks to a named temp file and yield its path; the file is removed afterwards."""
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        yield path
+    finally:
+        os.remove(path)
+
+def decode_text(chunks: Iterator[bytes]) -> str:
+    """Decode UTF-8 chunks without splitting multi-byte characters."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parts = [decoder.decode(chunk) for chunk in chunks]
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
+
+def encode_base64(chunks: Iterator[bytes]) -> str:
+    """Base64-encode chunks incrementally, carrying partial 3-byte groups over."""
+    parts = []
+    leftover = b""
+    for chunk in chunks:
+        data = leftover + chunk
+        cut = len(data) - len(data) % 3
+        parts.append(base64.b64encode(data[:cut]).decode("ascii"))
+        leftover = data[cut:]
+    parts.append(base64.b64encode(leftover).decode("ascii"))
+    return "".join(parts)
+
+def extract_text_from_pdf(binary_data) -> str:
+    """Extract text from PDF bytes or a seekable binary stream."""
+    stream = io.BytesIO(binary_data) if isinstance(binary_data, (bytes, bytearray)) else binary_data
+    pdf_reader = PdfReader(stream)
     text = "\n".join(page.extract_text() or "" for page in pdf_reader.pages)
     return text
 
@@ -56,15 +167,42 @@ def list_resources(cursor: str = None) -> List[Resource]:
         print(f"Drive API error: {e}")
         return []
 
+def get_file_metadata(file_id: str) -> dict:
+    """Fetch the metadata needed to serve a file's bytes."""
+    return get_drive_service().files().get(
+        fileId=file_id, fields="id, name, mimeType, size, md5Checksum, modifiedTime"
+    ).execute()
+
+def _cached_pdf_text(file_id: str) -> Optional[str]:
+    """Extracted text for a PDF whose indexed version is already cached."""
+    try:
+        indexed = get_drive_index().get_file(file_id)
+    except Exception as e:
+        logger.warning(f"Drive index unavailable: {str(e)}")
+        return None
+    if not indexed or indexed["mime_type"] != "application/pdf":
+        return None
+    return get_text_cache().get(file_id, indexed["modified_time"])
+
 @mcp.tool()
 def read_resource(uri: str) -> List[TextContent]:
-    service = get_drive_service()
     file_id = uri.replace("gdrive:///", "")
 
-    file = service.files().get(fileId=file_id, fields="mimeType, name").execute()
+    # Repeat reads of an unchanged PDF skip Drive entirely
+    cached_text = _cached_pdf_text(file_id)
+    if cached_text is not None:
+        return [TextContent(type="text", uri=uri, mimeType="text/plain", text=cached_text)]
+
+    service = get_drive_service()
+    file = service.files().get(fileId=file_id, fields="mimeType, name, size, modifiedTime").execute()
     mime_type = file.get("mimeType", "application/octet-stream")
     file_name = file.get("name", "file")
 
+    # Refuse oversized files before downloading anything
+    max_bytes = settings.drive_download_max_bytes
+    if int(file.get("size", 0)) > max_bytes:
+        raise _size_error(file_name, int(file["size"]), max_bytes)
+
     if mime_type.startswith("application/vnd.google-apps"):
         export_types = {
             "application/vnd.google-apps.document": "text/markdown",
@@ -73,18 +211,25 @@ def read_resource(uri: str) -> List[TextContent]:
             "application/vnd.google-apps.drawing": "image/png",
         }
         export_mime = export_types.get(mime_type, "text/plain")
-        res = service.files().export(fileId=file_id, mimeType=export_mime).execute()
-        return [TextContent(type="text", uri=uri, mimeType=export_mime, text=res.decode("utf-8"))]
-
-    res = service.files().get_media(fileId=file_id).execute()
+        chunks = iter_media(file_id, export_mime=export_mime, file_name=file_name)
+        if export_mime.startswith("image/"):
+            return [TextContent(type="text", uri=uri, mimeType=export_mime, text=encode_base64(chunks))]
+        return [TextContent(type="text", uri=uri, mimeType=export_mime, text=decode_text(chunks))]
 
     if mime_type.startswith("text/") or mime_type == "application/json":
-        return [TextContent(type="text", uri=uri, mimeType=mime_type, text=res.decode("utf-8"))]
+        text = decode_text(iter_media(file_id, file_name=file_name))
+        return [TextContent(type="text", uri=uri, mimeType=mime_type, text=text)]
     elif mime_type == "application/pdf":
-        text = extract_text_from_pdf(res)
+        text_cache = get_text_cache()
+        text = text_cache.get(file_id, file.get("modifiedTime"))
+        if text is None:
+            # Extraction workers open the PDF by path, so it goes to disk first
+            with download_to_file(iter_media(file_id, file_name=file_name), suffix=".pdf") as pdf_path:
+                text = extract_pdf_file_text(pdf_path)
+            text_cache.put(file_id, file.get("modifiedTime"), text)
         return [TextContent(type="text", uri=uri, mimeType="text/plain", text=text)]
     elif mime_type.startswith("image/"):
-        encoded = base64.b64encode(res).decode("utf-8")
+        encoded = encode_base64(iter_media(file_id, file_name=file_name))
         return [TextContent(type="text", uri=uri, mimeType=mime_type, text=encoded)]
     else:
         return [TextContent(type="text", uri=uri, mimeType=mime_type, text="[Binary content not supported]")]
@@ -107,6 +252,14 @@ def list_tools() -> List[Tool]:
 
 @mcp.tool()
 def search(query: str) -> CallToolResult:
+    # Answer from the local full-text index once it has been built
+    if settings.content_index_enabled:
+        content_index = get_content_index()
+        if content_index.ready:
+            matches = content_index.search(query, limit=settings.content_index_search_limit)
+            lines = [f"{m.name} ({m.mime_type})\n  {m.snippet}" for m in matches]
+            return CallToolResult(content=[TextContent(type="text", text=f"Found {len(matches)} files:\n" + "\n".join(lines), uri=None, mimeType=None)], isError=False)
+
     escaped_query = re.sub(r"([\\'])", r"\\\\\\1", query)
     formatted_query = f"fullText contains '{escaped_query}'"
 
@@ -1,83 +1,128 @@
 from mcp.server.fastmcp import FastMCP
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+import asyncio
 import base64
+import json
+import logging
+import random
+import socket
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import List
-from .auth_service import AuthService
-import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+from .auth_service import get_service_registry
+from ..core.config import settings
+from ..core.http_client import http_client
+from ..core.singleflight import SingleFlight
 import os
 
+logger = logging.getLogger(__name__)
+
 # Create an MCP server
 mcp = FastMCP("Gmail Service")
 
+# HTTP statuses worth retrying; 403 only with a rate limit reason
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+# Gmail allows up to 100 calls per batch but recommends no more than 50
+BATCH_SIZE = 50
+
 def get_gmail_service():
-    """Initialize and return Gmail service with OAuth2 credentials."""
-    # Get the path to the credentials file
-    credentials_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "credentials.json")
-    token_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "token.json")
-    
-    # Initialize auth service
-    auth_service = AuthService(credentials_path=credentials_path, token_path=token_path)
-    
-    # Get Gmail service
-    return auth_service.get_gmail_service()
+    """Return the shared Gmail client with OAuth2 credentials."""
+    return get_service_registry().get_service('gmail', 'v1')
 
-@mcp.tool()
-def send_email(to: List[str], subject: str, body: str, mime_type: str = "text/plain") -> dict:
-    """Send an email using Gmail API."""
-    try:
-        print("\n=== Starting Email Send Process ===")
-        service = get_gmail_service()
-        
-        # Create message
-        message = MIMEText(body)
-        message['to'] = ", ".join(to)
-        message['subject'] = subject
-        
-        # Get the authenticated user's email
-        profile = service.users().getProfile(userId='me').execute()
-        user_email = profile.get('emailAddress')
-        message['from'] = user_email
-        
-        print(f"\nEmail Details:")
-        print(f"From: {user_email}")
-        print(f"To: {to}")
-        print(f"Subject: {subject}")
-
-        # Encode the message
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-
-        # Send the message with retry logic
-        max_retries = 3
-        for attempt in range(max_retries):
+_sender: Dict[str, Any] = {"generation": None, "email": None}
+_sender_lock = threading.Lock()
+_profile_lookup = SingleFlight()
+
+def get_sender_address() -> str:
+    """The authenticated user's address, fetched once per set of credentials."""
+    registry = get_service_registry()
+    with _sender_lock:
+        if _sender["generation"] == registry.generation and _sender["email"]:
+            return _sender["email"]
+
+    def fetch():
+        email = get_gmail_service().users().getProfile(userId='me').execute().get('emailAddress')
+        with _sender_lock:
+            _sender.update(generation=registry.generation, email=email)
+        return email
+
+    return _profile_lookup.do(registry.generation, fetch)
+
+def compose_message(to: Union[str, List[str]], subject: str, body: str, mime_type: str = "text/plain",
+                    sender: Optional[str] = None) -> str:
+    """Build the base64url-encoded RFC 2822 message the Gmail API expects."""
+    subtype = mime_type.split("/", 1)[1] if "/" in mime_type else "plain"
+    message = MIMEText(body, subtype)
+    message['to'] = to if isinstance(to, str) else ", ".join(to)
+    message['subject'] = subject
+    if sender:
+        message['from'] = sender
+    return base64.urlsafe_b64encode(message.as_bytes()).decode()
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an error is transient: rate limits, server errors and network failures."""
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        if status in RETRYABLE_STATUSES:
+            return True
+        if status == 403:
             try:
-                if attempt > 0:
-                    time.sleep(2)  # Wait before retry
-                
-                sent_message = service.users().messages().send(
-                    userId='me',
-                    body={'raw': raw_message}
-                ).execute()
-                
-                return {
-                    "success": True,
-                    "message": "Email sent successfully",
-                    "details": {
-                        "to": to,
-                        "subject": subject,
-                        "messageId": sent_message.get('id')
-                    }
-                }
-            except HttpError as error:
-                if attempt == max_retries - 1:
-                    raise error
-                print(f"Attempt {attempt + 1} failed, retrying...")
-                continue
+                reasons = {e.get("reason") for e in json.loads(error.content)["error"].get("errors", [])}
+            except (ValueError, KeyError, TypeError, AttributeError):
+                return False
+            return bool(reasons & RATE_LIMIT_REASONS)
+        return False
+    return isinstance(error, (socket.timeout, ConnectionError, TimeoutError))
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(settings.gmail_retry_max_delay, settings.gmail_retry_base_delay * 2 ** attempt))
+
+def _execute_send(raw_message: str) -> Dict[str, Any]:
+    return get_gmail_service().users().messages().send(userId='me', body={'raw': raw_message}).execute()
+
+async def send_raw_async(raw_message: str, retry_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Send an encoded message, retrying transient failures.
+
+    The blocking API call runs in a worker thread and the wait between
+    attempts is an asyncio sleep, so no thread is held while backing off.
+    If retry_seconds is given, no retry starts after that many seconds.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    for attempt in range(settings.gmail_max_retries + 1):
+        try:
+            return await asyncio.to_thread(_execute_send, raw_message)
+        except Exception as error:
+            if attempt == settings.gmail_max_retries or not is_retryable(error):
+                raise
+            delay = backoff_delay(attempt)
+            if retry_seconds is not None and loop.time() - started + delay > retry_seconds:
+                raise
+            logger.warning(f"Gmail send attempt {attempt + 1} failed ({error}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
 
+async def send_email_async(to: List[str], subject: str, body: str, mime_type: str = "text/plain",
+                           retry_seconds: Optional[float] = None) -> dict:
+    try:
+        sender = await asyncio.to_thread(get_sender_address)
+        logger.info(f"Sending email from {sender} to {to}: {subject}")
+        sent_message = await send_raw_async(compose_message(to, subject, body, mime_type, sender), retry_seconds)
+        return {
+            "success": True,
+            "message": "Email sent successfully",
+            "details": {
+                "to": to,
+                "subject": subject,
+                "messageId": sent_message.get('id')
+            }
+        }
     except Exception as e:
-        print(f"\nError sending email: {str(e)}")
+        logger.error(f"Error sending email: {str(e)}")
         return {
             "success": False,
             "message": f"Failed to send email: {str(e)}",
@@ -88,5 +133,88 @@ def send_email(to: List[str], subject: str, body: str, mime_type: str = "text/pl
             }
         }
 
+@mcp.tool()
+def send_email(to: List[str], subject: str, body: str, mime_type: str = "text/plain") -> dict:
+    """Send an email using Gmail API."""
+    # The caller's thread waits for the whole send, retries included, so cap
+    # the time spent retrying; queue through the outbox to avoid waiting at all
+    return http_client.run(send_email_async(to, subject, body, mime_type, settings.gmail_blocking_retry_seconds))
+
+def send_batch(raw_messages: List[str]) -> List[Tuple[Optional[Dict[str, Any]], Optional[Exception]]]:
+    """Send up to BATCH_SIZE messages in one batch HTTP request; returns (response, error) per message."""
+    results: List[Tuple[Optional[Dict[str, Any]], Optional[Exception]]] = [(None, None)] * len(raw_messages)
+
+    def callback(request_id, response, exception):
+        results[int(request_id)] = (response, exception)
+
+    service = get_gmail_service()
+    batch = service.new_batch_http_request(callback=callback)
+    for index, raw_message in enumerate(raw_messages):
+        batch.add(service.users().messages().send(userId='me', body={'raw': raw_message}), request_id=str(index))
+    batch.execute()
+    return results
+
+async def send_bulk_async(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Send many messages with Gmail batch requests.
+
+    messages are dicts with to, subject, body and optionally mime_type.
+    Messages are sent BATCH_SIZE per HTTP request; those that fail with a
+    transient error are retried together in later rounds with backoff.
+    Returns one status dict per message, in input order.
+    """
+    statuses: List[Dict[str, Any]] = [
+        {"index": index, "to": message.get("to"), "success": False, "messageId": None, "error": None, "attempts": 0}
+        for index, message in enumerate(messages)
+    ]
+    try:
+        sender = await asyncio.to_thread(get_sender_address)
+    except Exception as e:
+        for status in statuses:
+            status["error"] = f"Could not load sender profile: {str(e)}"
+        return statuses
+
+    pending: List[Tuple[int, str]] = []
+    for index, message in enumerate(messages):
+        try:
+            pending.append((index, compose_message(
+                message["to"], message["subject"], message["body"], message.get("mime_type", "text/plain"), sender
+            )))
+        except (KeyError, TypeError) as e:
+            statuses[index]["error"] = f"Invalid message: {str(e)}"
+
+    for attempt in range(settings.gmail_max_retries + 1):
+        retry: List[Tuple[int, str]] = []
+        for start in range(0, len(pending), BATCH_SIZE):
+            chunk = pending[start:start + BATCH_SIZE]
+            try:
+                results = await asyncio.to_thread(send_batch, [raw for _, raw in chunk])
+            except Exception as e:
+                # The batch request itself failed; every message in it shares the error
+                results = [(None, e)] * len(chunk)
+            for (index, raw), (response, error) in zip(chunk, results):
+                statuses[index]["attempts"] += 1
+                if error is None:
+                    statuses[index].update(success=True, messageId=(response or {}).get("id"), error=None)
+                else:
+                    statuses[index]["error"] = str(error)
+                    if is_retryable(error):
+                        retry.append((index, raw))
+        if not retry or attempt == settings.gmail_max_retries:
+            break
+        delay = backoff_delay(attempt)
+        logger.warning(f"Retrying {len(retry)} of {len(messages)} bulk messages in {delay:.1f}s")
+        await asyncio.sleep(delay)
+        pending = retry
+
+    sent = sum(status["success"] for status in statuses)
+    logger.info(f"Bulk send finished: {sent} of {len(messages)} messages sent")
+    return statuses
+
+@mcp.tool()
+def send_bulk_email(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Send many emails through Gmail batch requests and report per-message status."""
+    return http_client.run(send_bulk_async(messages))
+
 if __name__ == "__main__":
-    mcp.run() 
\ No newline at end of file
+    mcp.run()
@@ -1,45 +1,169 @@
 import re
+import inspect
 import logging
 import os
 from pathlib import Path
-import multiprocessing
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, List, Optional, Tuple, Union
+import numpy as np
 from llama_cpp import Llama
+from .chat_sessions import ChatSession, get_session_store
 from .prompt_handler import PromptHandler
+from .response_cache import response_cache
+from .speculative import draft_model_bytes, make_draft_model
+from ..core.config import settings
+from ..core.runtime_profile import get_runtime_profile
 
 logger = logging.getLogger(__name__)
 
+# Patterns scrubbed from raw model output, applied in this order
+INST_PATTERN = re.compile(r'\[/INST\]')
+ROLE_PATTERN = re.compile(r'User:|Assistant:')
+BRACKET_PATTERN = re.compile(r'\[.*?\]')
+ROLE_LABELS = ("User:", "Assistant:")
+
+# Instructions wrapped around retrieved document passages
+GROUNDED_HEADER = (
+    "Answer the question using only the excerpts below. "
+    "If they don't contain the answer, say that the document doesn't cover it.\n\n"
+)
+GROUNDED_FOOTER = "\n\nQuestion: {question}"
+# Tokens kept free for separators and tokenizer differences
+CONTEXT_MARGIN_TOKENS = 32
+
+# Session summaries: appended to the system prompt, and the request that writes them
+SUMMARY_HEADER = "\n\nSummary of the conversation so far: "
+SUMMARY_REQUEST = (
+    "Summarise this conversation in a few sentences, keeping the names, facts "
+    "and decisions later questions may refer to:\n\n{transcript}"
+)
+
+# Read size when pulling the model file into the page cache
+PREFETCH_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+def clean_model_output(text: str) -> str:
+    """Remove instruction tokens, role labels and bracketed placeholders."""
+    cleaned = text.strip()
+    cleaned = INST_PATTERN.sub('', cleaned)
+    cleaned = ROLE_PATTERN.sub('', cleaned)
+    cleaned = BRACKET_PATTERN.sub('', cleaned)
+    return cleaned.strip()
+
+
+@dataclass
+class GroundedPrompt:
+    """A tool result the model still has to answer: a question and ranked passages."""
+    question: str
+    passages: List[str]
+
+
+@dataclass
+class LoadedModel:
+    """A llama.cpp model together with its cached prompt prefix."""
+    name: str
+    path: str
+    llama: Llama
+    size_bytes: int
+    prefix_tokens: List[int] = field(default_factory=list)
+    prefix_state: Any = None
+
+
+class StreamingOutputCleaner:
+    """
+    Applies clean_model_output incrementally to a stream of token pieces.
+
+    Text that could still turn into something we scrub (an unclosed '[' or a
+    partial role label) is held back until the next piece disambiguates it,
+    so every emitted delta is a prefix of the fully cleaned output.
+    """
+
+    def __init__(self):
+        self._raw = ""
+        self._emitted = ""
+        self._diverged = False
+
+    def _safe_length(self) -> int:
+        """Length of the raw buffer that can be cleaned without look-ahead."""
+        safe = len(self._raw)
+
+        # Brackets pair up within a line, the first open one with the next
+        # ']'. So any '[' on the current line after the last complete
+        # [placeholder] may still be closed, taking everything after it with
+        # it; hold back from the first such '['
+        # [/INST] and role labels are removed before brackets are matched, so
+        # the scan runs with them blanked out, keeping offsets
+        blank = lambda match: "\0" * len(match.group())
+        scanned = ROLE_PATTERN.sub(blank, INST_PATTERN.sub(blank, self._raw))
+        start = scanned.rfind('\n') + 1
+        for match in BRACKET_PATTERN.finditer(scanned, start):
+            start = match.end()
+        open_idx = scanned.find('[', start)
+        if open_idx != -1:
+            safe = open_idx
+
+        # A trailing partial role label ("Us", "Assist") may still complete
+        for label in ROLE_LABELS:
+            for size in range(len(label) - 1, 0, -1):
+                if self._raw[:safe].endswith(label[:size]):
+                    safe = min(safe, len(self._raw[:safe]) - size)
+                    break
+        return safe
+
+    def _emit(self, cleaned: str) -> str:
+        if self._diverged:
+            return ""
+        if not cleaned.startswith(self._emitted):
+            # Sent text can't be taken back; hold everything else until
+            # finish() sends what differs from the final output
+            logger.warning("Streamed output diverged from the cleaned text; holding the rest back")
+            self._diverged = True
+            return ""
+        delta = cleaned[len(self._emitted):]
+        self._emitted = cleaned
+        return delta
+
+    def feed(self, piece: str) -> str:
+        """Add a decoded piece and return the newly cleaned text, if any."""
+        self._raw += piece
+        # clean_model_output strips, so trailing whitespace is held back too
+        return self._emit(clean_model_output(self._raw[:self._safe_length()]))
+
+    def finish(self) -> str:
+        """Flush whatever was held back once generation is complete."""
+        cleaned = clean_model_output(self._raw)
+        if not self._diverged:
+            return self._emit(cleaned)
+        sent = len(os.path.commonprefix([self._emitted, cleaned]))
+        self._emitted = cleaned
+        return cleaned[sent:]
+
+    @property
+    def text(self) -> str:
+        """The cleaned output so far; after finish(), all of it."""
+        return self._emitted
+
+
 class LLMService:
     # Pre-compile regex patterns for efficiency
     EMAIL_PATTERN = re.compile(r"send an email to ([^\s]+) about ([^:]+): (.+)")
+
+    # Sampling parameters for the chat fallback; max_tokens comes from the
+    # runtime profile per intent
+    GENERATION_PARAMS = {
+        "temperature": 0.7,
+        "top_p": 0.95,
+        "repeat_penalty": 1.1,
+        "stop": ["User:", "\n\n"],
+    }
     
     def __init__(self):
         # Initialize the prompt handler
         self.prompt_handler = PromptHandler()
         
-        # Path to the GGUF model
-        self.model_path = os.getenv("MODEL_PATH", "models/llama-2-7b-chat.gguf")
-        if not Path(self.model_path).exists():
-            raise FileNotFoundError(
-                f"Model not found at {self.model_path}. "
-                "Please make sure the model file exists in the models directory."
-            )
-            
-        # Use all available CPU cores for n_threads
-        n_threads = multiprocessing.cpu_count()
-        logger.info(f"Detected {n_threads} CPU cores for Llama model.")
-        
-        # Load model using llama.cpp
-        logger.info(f"Loading model from {self.model_path}...")
-        try:
-            self.model = Llama(
-                model_path=self.model_path,
-                n_ctx=2048,  # Context window
-                n_threads=n_threads
-            )
-            logger.info("Model loaded successfully!")
-        except Exception as e:
-            logger.error(f"Failed to load model: {str(e)}")
-            raise
+        # Models are loaded separately by load_model() and passed to each
+        # generation call, so tool intents don't depend on any of them
+        self.profile = get_runtime_profile()
         
         # System prompt for command instructions
         self.system_prompt = """You are a helpful AI assistant. Your responses should be natural and conversational, just like ChatGPT.
@@ -71,47 +195,343 @@ Assistant: I'm doing well, thank you for asking! How can I assist you today?
 User: What's the weather like?
 Assistant: I don't have access to real-time weather information, but I'd be happy to help you with other tasks!"""
 
-    def generate_response(self, prompt: str) -> str:
-        try:
-            # Use the prompt handler to process the prompt
-            result = self.prompt_handler.handle_prompt(prompt)
+    def _prefetch(self, path: str, progress: Callable[[str, float], None]):
+        """
+        Read the model file once so its pages are in the OS cache.
+
+        llama.cpp memory-maps the file and would fault the pages in on first
+        use anyway; reading them up front moves that I/O into the load, where
+        it can be reported as progress.
+        """
+        total = os.path.getsize(path)
+        buffer = bytearray(PREFETCH_CHUNK_BYTES)
+        done = 0
+        with open(path, "rb", buffering=0) as f:
+            while True:
+                read = f.readinto(buffer)
+                if not read:
+                    break
+                done += read
+                progress("reading", done / total)
+
+    def load_model(self, name: str, path: str,
+                   progress: Optional[Callable[[str, float], None]] = None,
+                   speculative: bool = False) -> LoadedModel:
+        """
+        Load a GGUF model and warm its prefix cache.
+
+        progress(stage, fraction) is called as loading advances through the
+        reading, initializing and warming stages. With speculative, the model
+        decodes with the drafter configured by LLM_SPECULATIVE.
+        """
+        progress = progress or (lambda stage, fraction: None)
+        if not Path(path).exists():
+            raise FileNotFoundError(
+                f"Model not found at {path}. "
+                "Please make sure the model file exists in the models directory."
+            )
+        if settings.model_prefetch:
+            self._prefetch(path, progress)
             
-            # If the prompt handler returned a result, use it
-            if result is not None:
-                # Check if it's an error response
-                if hasattr(result, 'isError') and result.isError:
-                    return result.content[0].text
-                    
-                # Check if it's an image response
-                if result.content and len(result.content) > 0:
-                    content = result.content[0]
-                    if content.mimeType and content.mimeType.startswith('image/'):
-                        # For image responses, return the base64 data directly
-                        return content.text
-                    else:
-                        # For text responses
-                        return content.text
-                
-            # If no specific intent was matched or there was an error,
-            # fall back to the LLM for general conversation
-            formatted_prompt = f"[INST] {self.system_prompt}\n\nUser: {prompt} [/INST]"
-            logger.info("Generating natural language response...")
-            output = self.model(
-                formatted_prompt,
-                max_tokens=256,
-                temperature=0.7,
-                top_p=0.95,
-                repeat_penalty=1.1,
-                stop=["User:", "\n\n"]
+        # Threads, context and cache settings come from the runtime profile
+        self.profile = get_runtime_profile()
+        llama_kwargs = self.profile.llama_kwargs()
+        if "type_k" in llama_kwargs and "type_k" not in inspect.signature(Llama.__init__).parameters:
+            logger.warning(
+                f"This llama-cpp-python can't set the KV cache type; "
+                f"ignoring {self.profile.kv_cache_type} and using f16"
             )
-            response = output["choices"][0]["text"]
-            cleaned_output = response.strip()
-            cleaned_output = re.sub(r'\[/INST\]', '', cleaned_output)
-            cleaned_output = re.sub(r'User:|Assistant:', '', cleaned_output)
-            cleaned_output = re.sub(r'\[.*?\]', '', cleaned_output)
-            cleaned_output = cleaned_output.strip()
+            llama_kwargs.pop("type_k")
+            llama_kwargs.pop("type_v")
+        logger.info(f"Llama runtime profile: {llama_kwargs}")
+        size = os.path.getsize(path)
+        if speculative:
+            llama_kwargs["draft_model"] = make_draft_model(self.profile)
+            size += draft_model_bytes()
+        
+        # Load model using llama.cpp
+        logger.info(f"Loading model {name} from {path}...")
+        progress("initializing", 0.0)
+        try:
+            model = LoadedModel(name, path, Llama(model_path=path, **llama_kwargs), size)
+            logger.info("Model loaded successfully!")
+        except Exception as e:
+            logger.error(f"Failed to load model: {str(e)}")
+            raise
+        
+        # The caller only publishes the model once the prefix is cached, so
+        # the first request never races the warm-up
+        if settings.prefix_cache_enabled:
+            progress("warming", 0.0)
+            self.warm_prefix_cache(model)
+        return model
+
+    def run_tools(self, prompt: str) -> Union[str, GroundedPrompt, None]:
+        """
+        Run the prompt through the intent handler.
+
+        Returns the final response text, a GroundedPrompt for the LLM to
+        answer, or None to fall back to the LLM with the prompt itself.
+        """
+        intent = self.prompt_handler.classify_intent(prompt)
+        intent_type = intent.type.value
+        cached = response_cache.get(prompt, intent_type)
+        if cached is not None:
+            return cached
+
+        result = self.prompt_handler.handle_intent(intent)
+
+        # If the prompt handler returned a result, use it
+        if result is not None:
+            # Check if it's an error response
+            if hasattr(result, 'isError') and result.isError:
+                return result.content[0].text
+
+            # PDF queries return passages for the model to answer from
+            if intent_type == "query_pdf":
+                question = intent.entities.get("query") or prompt
+                return GroundedPrompt(question, [c.text for c in result.content])
+
+            # Check if it's an image response
+            if result.content and len(result.content) > 0:
+                content = result.content[0]
+                # Image responses carry the base64 data directly; either way
+                # the text is the response
+                response_cache.put(prompt, intent_type, content.text)
+                return content.text
+        return None
+
+    @property
+    def prompt_prefix(self) -> str:
+        """The part of every chat prompt that comes before the user's text."""
+        return f"[INST] {self.system_prompt}\n\nUser:"
+
+    def _format_prompt(self, prompt: str) -> str:
+        return f"{self.prompt_prefix} {prompt} [/INST]"
+
+    def build_grounded_prompt(self, question: str, passages: List[str], model: LoadedModel) -> str:
+        """
+        Wrap ranked passages and the question in answering instructions.
+
+        Passages are taken best first while they fit in the model's context
+        window left after the system prompt, the instructions and the reply.
+        """
+        frame = GROUNDED_HEADER + GROUNDED_FOOTER.format(question=question)
+        budget = (
+            model.llama.n_ctx()
+            - self.profile.max_tokens_for("query_pdf")
+            - len(model.llama.tokenize(self._format_prompt(frame).encode("utf-8")))
+            - CONTEXT_MARGIN_TOKENS
+        )
+        excerpts = []
+        for passage in passages:
+            excerpt = f"Excerpt {len(excerpts) + 1}:\n{passage}\n\n"
+            size = len(model.llama.tokenize(excerpt.encode("utf-8"), add_bos=False))
+            if size > budget:
+                continue
+            excerpts.append(excerpt)
+            budget -= size
+        logger.info(f"Answering from {len(excerpts)} of {len(passages)} retrieved passages")
+        return GROUNDED_HEADER + "".join(excerpts).rstrip() + GROUNDED_FOOTER.format(question=question)
+
+    def warm_prefix_cache(self, model: LoadedModel):
+        """Evaluate the prompt prefix once and snapshot the KV cache."""
+        logger.info(f"Evaluating system prompt prefix for {model.name}...")
+        model.prefix_tokens = model.llama.tokenize(self.prompt_prefix.encode("utf-8"))
+        model.llama.reset()
+        model.llama.eval(model.prefix_tokens)
+        model.prefix_state = model.llama.save_state()
+        logger.info(f"Cached {len(model.prefix_tokens)} prefix tokens")
+
+    def _restore_prefix(self, model: LoadedModel):
+        """
+        Make sure the model's KV cache starts with the evaluated prefix.
+
+        llama.cpp only re-evaluates tokens after the longest common prefix with
+        what is already in the cache, so once the prefix is in place each
+        request only pays for its own tokens. The snapshot is reloaded only if
+        something else has overwritten the start of the cache.
+        """
+        if model.prefix_state is None:
+            return
+        n_prefix = len(model.prefix_tokens)
+        cached = list(model.llama.input_ids[:min(model.llama.n_tokens, n_prefix)])
+        if cached != model.prefix_tokens:
+            model.llama.load_state(model.prefix_state)
+
+    def _format_conversation(self, session: ChatSession, prompt: str, drop: int = 0) -> str:
+        """The session's transcript after its first drop turns, ending with the new prompt."""
+        system = self.system_prompt + (SUMMARY_HEADER + session.summary if session.summary else "")
+        text = f"[INST] {system}\n\nUser:"
+        for turn in session.turns[drop:]:
+            text += f" {turn.user} [/INST] {turn.assistant} [INST] User:"
+        return f"{text} {prompt} [/INST]"
+
+    def _count_tokens(self, model: LoadedModel, text: str) -> int:
+        return len(model.llama.tokenize(text.encode("utf-8")))
+
+    def _summarize(self, model: LoadedModel, summary: str, turns: list) -> str:
+        """Fold turns into the running summary with one short generation."""
+        transcript = "\n".join(f"User: {turn.user}\nAssistant: {turn.assistant}" for turn in turns)
+        if summary:
+            transcript = f"Earlier: {summary}\n{transcript}"
+        # Keep the most recent part if the transcript alone overflows the context
+        room = (
+            model.llama.n_ctx()
+            - settings.chat_session_summary_tokens
+            - self._count_tokens(model, self._format_prompt(SUMMARY_REQUEST.format(transcript="")))
+            - CONTEXT_MARGIN_TOKENS
+        )
+        tokens = model.llama.tokenize(transcript.encode("utf-8"), add_bos=False)
+        if len(tokens) > room:
+            transcript = model.llama.detokenize(tokens[-room:]).decode("utf-8", errors="ignore")
+        self._restore_prefix(model)
+        output = model.llama(
+            self._format_prompt(SUMMARY_REQUEST.format(transcript=transcript)),
+            **{**self.GENERATION_PARAMS, "max_tokens": settings.chat_session_summary_tokens}
+        )
+        return clean_model_output(output["choices"][0]["text"])
+
+    def _fit_conversation(self, session: ChatSession, prompt: str, model: LoadedModel,
+                          max_tokens: int) -> Tuple[str, bool]:
+        """
+        Format the conversation, shortening it if the reply wouldn't fit the context.
+
+        The oldest turns are removed until the rest takes at most half the
+        room, so the start of the transcript, and with it the cached state,
+        only changes every few turns rather than on every one. Removed turns
+        are folded into the session summary when CHAT_SESSION_TRUNCATION is
+        "summary" and dropped otherwise. Returns the text and whether the
+        transcript was shortened.
+        """
+        room = model.llama.n_ctx() - max_tokens - CONTEXT_MARGIN_TOKENS
+        text = self._format_conversation(session, prompt)
+        if not session.turns or self._count_tokens(model, text) <= room:
+            return text, False
+        drop = 1
+        while drop < len(session.turns) and self._count_tokens(model, self._format_conversation(session, prompt, drop)) > room // 2:
+            drop += 1
+        summary = session.summary
+        if settings.chat_session_truncation == "summary":
+            summary = self._summarize(model, summary, session.turns[:drop])
+        get_session_store().truncate(session, drop, summary)
+        logger.info(f"Session {session.id} filled the context; {settings.chat_session_truncation} truncation removed {drop} turns")
+        return self._format_conversation(session, prompt), True
+
+    def _start_turn(self, prompt: str, model: LoadedModel, session: Optional[ChatSession],
+                    max_tokens: int) -> str:
+        """
+        The text to complete, with the model's KV cache primed for it.
+
+        A session's saved state is loaded back unless the model still holds
+        it, so llama.cpp's prefix match only evaluates the new turn.
+        """
+        if session is None:
+            self._restore_prefix(model)
+            return self._format_prompt(prompt)
+        text, truncated = self._fit_conversation(session, prompt, model, max_tokens)
+        state = None if truncated else get_session_store().get_state(session, model.path)
+        if state is None:
+            self._restore_prefix(model)
+            return text
+        llama = model.llama
+        if llama.n_tokens != state.n_tokens or not np.array_equal(
+                llama.input_ids[:state.n_tokens], state.input_ids[:state.n_tokens]):
+            try:
+                llama.load_state(state)
+            except Exception as e:
+                logger.warning(f"Discarding state of session {session.id}: {str(e)}")
+                get_session_store().drop_state(session)
+                self._restore_prefix(model)
+        return text
+
+    def _finish_turn(self, session: ChatSession, prompt: str, reply: str, model: LoadedModel,
+                     grounded: bool = False):
+        """
+        Record the turn and keep the model state for the next one.
+
+        A grounded turn is recorded as just the question, without its
+        passages, so the state it leaves behind doesn't match the transcript
+        and is dropped; the next turn re-evaluates the conversation once.
+        """
+        store = get_session_store()
+        store.add_turn(session, prompt, reply, model.name)
+        if grounded:
+            store.drop_state(session)
+            return
+        state = model.llama.save_state()
+        size = len(state.llama_state) + state.scores.nbytes + state.input_ids.nbytes
+        store.put_state(session, state, model.path, size)
+
+    def _prepare(self, prompt: Union[str, GroundedPrompt], model: LoadedModel) -> Tuple[str, dict]:
+        """The text to generate from and the sampling parameters, sized by intent."""
+        if isinstance(prompt, GroundedPrompt):
+            text, intent = self.build_grounded_prompt(prompt.question, prompt.passages, model), "query_pdf"
+        else:
+            text, intent = prompt, "chat"
+        return text, {**self.GENERATION_PARAMS, "max_tokens": self.profile.max_tokens_for(intent)}
+
+    def generate_chat(self, prompt: Union[str, GroundedPrompt], model: LoadedModel,
+                      session: Optional[ChatSession] = None) -> str:
+        """
+        Generate a conversational reply with the given model, skipping tool intents.
+
+        A GroundedPrompt is answered from its passages with the longer
+        query_pdf reply length. With a session, the reply continues that
+        conversation and is added to it.
+        """
+        try:
+            grounded = isinstance(prompt, GroundedPrompt)
+            question = prompt.question if grounded else prompt
+            prompt, params = self._prepare(prompt, model)
+            # Replies are cached per model file, so a swap or another pool
+            # model doesn't serve a different model's answer
+            if session is None:
+                cached = response_cache.get(prompt, "chat", model.path)
+                if cached is not None:
+                    return cached
+            logger.info(f"Generating natural language response with {model.name}...")
+            output = model.llama(self._start_turn(prompt, model, session, params["max_tokens"]), **params)
+            cleaned_output = clean_model_output(output["choices"][0]["text"])
             logger.info("Response generated successfully")
+            if session is None:
+                response_cache.put(prompt, "chat", cleaned_output, model.path)
+            else:
+                self._finish_turn(session, question, cleaned_output, model, grounded)
             return cleaned_output
         except Exception as e:
             logger.error(f"Error generating response: {str(e)}", exc_info=True)
-            return f"An error occurred: {str(e)}"
\ No newline at end of file
+            return f"An error occurred: {str(e)}"
+
+    def stream_chat(self, prompt: Union[str, GroundedPrompt], model: LoadedModel,
+                    session: Optional[ChatSession] = None) -> Iterator[str]:
+        """
+        Stream a conversational reply as cleaned text deltas.
+
+        Pieces are yielded as llama.cpp decodes tokens, so the first one
+        arrives after prompt evaluation rather than after the full generation.
+        A session's turn is only recorded if the stream runs to the end.
+        """
+        grounded = isinstance(prompt, GroundedPrompt)
+        question = prompt.question if grounded else prompt
+        prompt, params = self._prepare(prompt, model)
+        if session is None:
+            cached = response_cache.get(prompt, "chat", model.path)
+            if cached is not None:
+                yield cached
+                return
+        logger.info(f"Streaming natural language response with {model.name}...")
+        cleaner = StreamingOutputCleaner()
+        text = self._start_turn(prompt, model, session, params["max_tokens"])
+        for chunk in model.llama(text, stream=True, **params):
+            delta = cleaner.feed(chunk["choices"][0]["text"])
+            if delta:
+                yield delta
+        tail = cleaner.finish()
+        if tail:
+            yield tail
+        if session is None:
+            response_cache.put(prompt, "chat", cleaner.text, model.path)
+        else:
+            self._finish_turn(session, question, cleaner.text, model, grounded)
+        logger.info("Streamed response completed")
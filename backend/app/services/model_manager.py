@@ -0,0 +1,299 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Union
+from ..core.config import settings
+from .llm_service import GroundedPrompt, LLMService, LoadedModel
+from .speculative import draft_model_bytes
+
+logger = logging.getLogger(__name__)
+
+IDLE, LOADING, READY, FAILED = "idle", "loading", "ready", "failed"
+DEFAULT_MODEL = "default"
+
+class ModelNotReady(Exception):
+    """Raised when a request needs a model that hasn't finished loading."""
+
+class UnknownModel(Exception):
+    """Raised when a request names a model that isn't configured."""
+
+@dataclass
+class ModelSlot:
+    """A configured model: its file, load state and, once loaded, the model itself."""
+    name: str
+    path: str
+    state: str = IDLE
+    stage: Optional[str] = None
+    progress: float = 0.0
+    error: Optional[str] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    model: Optional[LoadedModel] = None
+    last_used: float = 0.0
+    # File being loaded to replace the current model, during a hot swap
+    swapping_to: Optional[str] = None
+
+class Lease:
+    """
+    A model checked out for one request.
+
+    While any lease on a model is open it is neither evicted nor, after a
+    hot swap, unloaded. release() is idempotent.
+    """
+
+    def __init__(self, manager: "ModelManager", model: LoadedModel):
+        self.model = model
+        self._manager = manager
+        self._lock = threading.Lock()
+        self._released = False
+        self._transferred = False
+
+    def transfer(self) -> Callable[[], None]:
+        """
+        Hand the lease to work that can outlive the request, such as a job
+        on the inference scheduler. release() becomes a no-op; the returned
+        callable releases the lease once that work is done.
+        """
+        self._transferred = True
+        return self._release_now
+
+    def release(self):
+        if not self._transferred:
+            self._release_now()
+
+    def _release_now(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._manager._release(self.model)
+
+    def __enter__(self) -> LoadedModel:
+        return self.model
+
+    def __exit__(self, *exc):
+        self.release()
+
+class ModelManager:
+    """
+    Pool of GGUF models loaded in the background within a RAM budget.
+
+    MODEL_PATH is the "default" model; LLM_MODELS adds named ones. Models
+    load on background threads, so the API starts at once and serves tool
+    intents while they load; a request for a model that isn't loaded starts
+    its load and gets ModelNotReady. Loading a model that would exceed
+    LLM_POOL_MAX_BYTES first unloads the least recently used models that have
+    no requests in flight.
+
+    swap() replaces a model's file without downtime: the old model keeps
+    serving while the new one loads, new requests go to the new one once it
+    is ready, and the old one is dropped when its last request finishes.
+    """
+
+    def __init__(self):
+        self.service = LLMService()
+        self._lock = threading.Lock()
+        paths = {DEFAULT_MODEL: settings.model_path, **settings.llm_models}
+        self._slots: Dict[str, ModelSlot] = {name: ModelSlot(name, path) for name, path in paths.items()}
+        # Open leases per loaded model, models replaced by a swap that are
+        # waiting for theirs to finish, and bytes reserved by loads under way
+        self._in_flight: Dict[int, int] = {}
+        self._retired: Dict[int, LoadedModel] = {}
+        self._reserved: Dict[str, int] = {}
+
+    def _slot(self, name: str) -> ModelSlot:
+        slot = self._slots.get(name)
+        if slot is None:
+            raise UnknownModel(f"Unknown model '{name}'. Available: {', '.join(self._slots)}")
+        return slot
+
+    def start(self, name: str = DEFAULT_MODEL):
+        """Begin loading a model in the background, unless it is loading or loaded."""
+        with self._lock:
+            slot = self._slot(name)
+            if slot.state in (LOADING, READY):
+                return
+            slot.state, slot.stage, slot.progress, slot.error = LOADING, None, 0.0, None
+            slot.started_at, slot.finished_at = time.time(), None
+        threading.Thread(target=self._load, args=(slot, slot.path), name=f"model-loader-{name}", daemon=True).start()
+
+    def preload(self):
+        """Load the default model, and the chat model if one is configured."""
+        self.start(DEFAULT_MODEL)
+        if settings.llm_chat_model:
+            self.start(settings.llm_chat_model)
+
+    def swap(self, name: str, path: str):
+        """Load path in the background and switch name over to it once ready."""
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model not found at {path}")
+        with self._lock:
+            slot = self._slot(name)
+            if slot.state == LOADING or slot.swapping_to:
+                raise ModelNotReady(f"Model '{name}' is already loading")
+            serving = slot.state == READY
+            if serving:
+                slot.swapping_to, slot.stage, slot.progress, slot.error = path, None, 0.0, None
+                slot.started_at, slot.finished_at = time.time(), None
+            else:
+                # Nothing to keep serving; this is an ordinary load
+                slot.path, slot.state = path, IDLE
+        if not serving:
+            self.start(name)
+            return
+        logger.info(f"Hot-swapping model {name} to {path}")
+        threading.Thread(target=self._load, args=(slot, path), name=f"model-swap-{name}", daemon=True).start()
+
+    def _report(self, slot: ModelSlot, stage: str, fraction: float):
+        with self._lock:
+            slot.stage, slot.progress = stage, fraction
+
+    def _used_bytes(self) -> int:
+        loaded = sum(slot.model.size_bytes for slot in self._slots.values() if slot.model is not None)
+        return (loaded + sum(model.size_bytes for model in self._retired.values())
+                + sum(self._reserved.values()))
+
+    def _make_room(self, needed: int, keep: str) -> bool:
+        """Unload idle models, least recently used first, until needed bytes fit the budget."""
+        budget = settings.llm_pool_max_bytes
+        if not budget:
+            return True
+        candidates = sorted(
+            (slot for slot in self._slots.values()
+             if slot.name != keep and slot.model is not None and not self._in_flight.get(id(slot.model))),
+            key=lambda slot: slot.last_used
+        )
+        # Don't unload anything if even unloading everything idle wouldn't do
+        if self._used_bytes() - sum(slot.model.size_bytes for slot in candidates) + needed > budget:
+            return False
+        while self._used_bytes() + needed > budget and candidates:
+            slot = candidates.pop(0)
+            logger.info(f"Unloading model {slot.name} to make room")
+            slot.model, slot.state, slot.stage, slot.progress = None, IDLE, None, 0.0
+        return self._used_bytes() + needed <= budget
+
+    def _load(self, slot: ModelSlot, path: str):
+        try:
+            # The default model also carries the speculative decoding drafter
+            speculative = slot.name == DEFAULT_MODEL
+            size = os.path.getsize(path) + (draft_model_bytes() if speculative else 0)
+            with self._lock:
+                if not self._make_room(size, keep=slot.name):
+                    raise RuntimeError(f"Model {slot.name} doesn't fit in LLM_POOL_MAX_BYTES with the models in use")
+                self._reserved[slot.name] = size
+            model = self.service.load_model(
+                slot.name, path, lambda stage, fraction: self._report(slot, stage, fraction), speculative
+            )
+        except Exception as e:
+            logger.error(f"Model {slot.name} failed to load: {str(e)}", exc_info=True)
+            with self._lock:
+                self._reserved.pop(slot.name, None)
+                slot.error, slot.finished_at = str(e), time.time()
+                if slot.swapping_to:
+                    # The old model keeps serving
+                    slot.swapping_to = None
+                else:
+                    slot.state = FAILED
+            return
+
+        with self._lock:
+            self._reserved.pop(slot.name, None)
+            old = slot.model
+            slot.model, slot.path, slot.swapping_to = model, path, None
+            slot.state, slot.stage, slot.progress, slot.finished_at = READY, None, 1.0, time.time()
+            if old is not None:
+                if self._in_flight.get(id(old)):
+                    self._retired[id(old)] = old
+                    logger.info(f"Swapped {slot.name} to {path}; draining requests on the old model")
+                else:
+                    logger.info(f"Swapped {slot.name} to {path}")
+        logger.info(f"Model {slot.name} ready after {slot.finished_at - slot.started_at:.1f}s")
+
+    def route(self, prompt: Union[str, GroundedPrompt], requested: Optional[str] = None) -> str:
+        """
+        Pick the model for a prompt.
+
+        An explicitly requested model wins. Otherwise short chat prompts go to
+        LLM_CHAT_MODEL, if configured, and everything else, including answers
+        from document passages, to the default model.
+        """
+        if requested:
+            self._slot(requested)
+            return requested
+        if (settings.llm_chat_model and isinstance(prompt, str)
+                and len(prompt.split()) <= settings.llm_chat_model_max_words):
+            return settings.llm_chat_model
+        return DEFAULT_MODEL
+
+    def acquire(self, name: str) -> Lease:
+        """Check out a loaded model, starting its load and raising ModelNotReady if it isn't loaded."""
+        with self._lock:
+            slot = self._slot(name)
+            if slot.state == READY:
+                slot.last_used = time.time()
+                self._in_flight[id(slot.model)] = self._in_flight.get(id(slot.model), 0) + 1
+                return Lease(self, slot.model)
+            state, error = slot.state, slot.error
+        if state == FAILED:
+            raise ModelNotReady(f"Model '{name}' failed to load: {error}")
+        self.start(name)
+        raise ModelNotReady(f"Model '{name}' is still loading. Please try again shortly.")
+
+    def acquire_for(self, prompt: Union[str, GroundedPrompt], requested: Optional[str] = None) -> Lease:
+        """
+        Check out the model routed to for prompt.
+
+        If the routed model isn't loaded and none was requested explicitly, the
+        request falls back to the default model rather than waiting.
+        """
+        name = self.route(prompt, requested)
+        try:
+            return self.acquire(name)
+        except ModelNotReady:
+            if requested or name == DEFAULT_MODEL:
+                raise
+            return self.acquire(DEFAULT_MODEL)
+
+    def _release(self, model: LoadedModel):
+        with self._lock:
+            remaining = self._in_flight.get(id(model), 0) - 1
+            if remaining > 0:
+                self._in_flight[id(model)] = remaining
+                return
+            self._in_flight.pop(id(model), None)
+            if self._retired.pop(id(model), None) is not None:
+                logger.info(f"Unloaded old {model.name} model {model.path} after draining")
+
+    @property
+    def ready(self) -> bool:
+        return self._slots[DEFAULT_MODEL].state == READY
+
+    def _slot_status(self, slot: ModelSlot) -> Dict[str, Any]:
+        end = slot.finished_at or time.time()
+        return {
+            "status": slot.state,
+            "path": slot.path,
+            "stage": slot.stage,
+            "progress": round(slot.progress, 3),
+            "error": slot.error,
+            "elapsed_seconds": round(end - slot.started_at, 1) if slot.started_at else None,
+            "swapping_to": slot.swapping_to,
+            "in_flight": self._in_flight.get(id(slot.model), 0) if slot.model is not None else 0,
+            "size_bytes": slot.model.size_bytes if slot.model is not None else None,
+        }
+
+    def status(self) -> Dict[str, Any]:
+        """The default model's load status, plus every model in the pool."""
+        with self._lock:
+            models = {name: self._slot_status(slot) for name, slot in self._slots.items()}
+            return {
+                **models[DEFAULT_MODEL],
+                "models": models,
+                "used_bytes": self._used_bytes(),
+                "budget_bytes": settings.llm_pool_max_bytes or None,
+                "draining": len(self._retired),
+            }
+
+model_manager = ModelManager()
@@ -0,0 +1,151 @@
+import heapq
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Scores for each match kind; fuzzy matches scale their trigram similarity
+# into the range below SUBSTRING_SCORE so they always rank last
+EXACT_SCORE = 1.0
+CASEFOLD_SCORE = 0.95
+PREFIX_SCORE = 0.85
+SUBSTRING_SCORE = 0.75
+FUZZY_SCALE = 0.7
+FUZZY_THRESHOLD = 0.3
+# Only the candidates sharing the most trigrams with the query are scored
+FUZZY_CANDIDATES_PER_RESULT = 20
+
+@dataclass
+class NameEntry:
+    file_id: str
+    name: str
+    mime_type: str
+
+@dataclass
+class NameMatch:
+    entry: NameEntry
+    score: float
+    kind: str
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class NameIndex:
+    """
+    Resolves human file names to Drive files.
+
+    Lookups try, in order of preference: exact name, case-folded name, prefix,
+    substring and trigram similarity. Exact, case-folded and prefix lookups are
+    dictionary or binary-search operations; substring and fuzzy lookups only
+    score candidates that share a trigram with the query.
+    """
+
+    def __init__(self, entries: Iterable[NameEntry]):
+        self._entries: Dict[str, NameEntry] = {}
+        self._exact: Dict[str, List[str]] = defaultdict(list)
+        self._folded: Dict[str, List[str]] = defaultdict(list)
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+        self._trigram_counts: Dict[str, int] = {}
+        sorted_names: List[Tuple[str, str]] = []
+
+        for entry in entries:
+            folded = entry.name.casefold()
+            self._entries[entry.file_id] = entry
+            self._exact[entry.name].append(entry.file_id)
+            self._folded[folded].append(entry.file_id)
+            sorted_names.append((folded, entry.file_id))
+            trigrams = _trigrams(folded)
+            self._trigram_counts[entry.file_id] = len(trigrams)
+            for trigram in trigrams:
+                self._trigrams[trigram].add(entry.file_id)
+
+        sorted_names.sort()
+        self._sorted_names = sorted_names
+        self._sorted_keys = [name for name, _ in sorted_names]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _prefix_ids(self, folded: str, limit: int, allowed: Callable[[str], bool]) -> List[str]:
+        ids = []
+        start = bisect_left(self._sorted_keys, folded)
+        for key, file_id in self._sorted_names[start:]:
+            if not key.startswith(folded) or len(ids) >= limit:
+                break
+            if allowed(file_id):
+                ids.append(file_id)
+        return ids
+
+    def _folded_substring_ids(self, folded: str) -> List[str]:
+        """Names containing folded, found by intersecting its trigram postings."""
+        if len(folded) < 3:
+            return [file_id for file_id, entry in self._entries.items() if folded in entry.name.casefold()]
+        # Padded trigrams only match at name boundaries, so use the bare ones
+        postings = sorted(
+            (self._trigrams.get(folded[i:i + 3], set()) for i in range(len(folded) - 2)),
+            key=len
+        )
+        candidates = set.intersection(*postings)
+        return [file_id for file_id in candidates if folded in self._entries[file_id].name.casefold()]
+
+    def search(self, name: str, mime_prefix: Optional[str] = None, limit: int = 5) -> List[NameMatch]:
+        """Return up to limit matches for name, best first."""
+        folded = name.strip().casefold()
+        if not folded:
+            return []
+
+        matches: Dict[str, NameMatch] = {}
+
+        # The type filter applies before candidates are cut to a limit, so
+        # files of other types can't crowd out the ones asked for
+        def allowed(file_id: str) -> bool:
+            return not mime_prefix or self._entries[file_id].mime_type.startswith(mime_prefix)
+
+        def add(file_id: str, score: float, kind: str):
+            entry = self._entries[file_id]
+            if not allowed(file_id):
+                return
+            current = matches.get(file_id)
+            if current is None or score > current.score:
+                matches[file_id] = NameMatch(entry=entry, score=score, kind=kind)
+
+        for file_id in self._exact.get(name.strip(), []):
+            add(file_id, EXACT_SCORE, "exact")
+        for file_id in self._folded.get(folded, []):
+            add(file_id, CASEFOLD_SCORE, "casefold")
+
+        if len(matches) < limit:
+            for file_id in self._prefix_ids(folded, limit * 4, allowed):
+                # Prefer prefix matches that cover more of the name
+                coverage = len(folded) / len(self._entries[file_id].name)
+                add(file_id, PREFIX_SCORE + 0.05 * coverage, "prefix")
+
+        if len(matches) < limit:
+            for file_id in self._folded_substring_ids(folded):
+                coverage = len(folded) / len(self._entries[file_id].name)
+                add(file_id, SUBSTRING_SCORE + 0.05 * coverage, "substring")
+
+        if len(matches) < limit:
+            query_trigrams = _trigrams(folded)
+            overlap: Counter = Counter()
+            for trigram in query_trigrams:
+                # Counter.update over a set runs in C, which keeps this fast
+                # even for trigrams shared by thousands of names
+                overlap.update(self._trigrams.get(trigram, ()))
+            candidates = overlap.items() if not mime_prefix else (
+                (file_id, shared) for file_id, shared in overlap.items() if allowed(file_id)
+            )
+            for file_id, shared in heapq.nlargest(limit * FUZZY_CANDIDATES_PER_RESULT, candidates, key=lambda item: item[1]):
+                # Dice coefficient over trigram sets
+                similarity = 2 * shared / (len(query_trigrams) + self._trigram_counts[file_id])
+                if similarity >= FUZZY_THRESHOLD:
+                    add(file_id, FUZZY_SCALE * similarity, "fuzzy")
+
+        ranked = sorted(matches.values(), key=lambda m: (-m.score, len(m.entry.name), m.entry.name))
+        return ranked[:limit]
+
+    def resolve(self, name: str, mime_prefix: Optional[str] = None) -> Optional[NameMatch]:
+        """Return the best match for name, or None."""
+        matches = self.search(name, mime_prefix=mime_prefix, limit=1)
+        return matches[0] if matches else None
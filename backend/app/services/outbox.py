@@ -0,0 +1,249 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+from ..core.config import settings
+from .auth_service import get_service_registry
+from .gmail_service import BATCH_SIZE, backoff_delay, compose_message, get_sender_address, is_retryable, send_batch
+
+logger = logging.getLogger(__name__)
+
+QUEUED, SENDING, SENT, FAILED = "queued", "sending", "sent", "failed"
+DAY_SECONDS = 24 * 60 * 60
+IDLE_WAIT_SECONDS = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    recipients TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    mime_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    gmail_id TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_due ON messages(status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_messages_sent_at ON messages(sent_at);
+"""
+
+def _to_status(row: sqlite3.Row) -> Dict:
+    return {
+        "id": row["id"],
+        "to": json.loads(row["recipients"]),
+        "subject": row["subject"],
+        "status": row["status"],
+        "attempts": row["attempts"],
+        "gmail_id": row["gmail_id"],
+        "error": row["error"],
+        "created_at": row["created_at"],
+        "sent_at": row["sent_at"],
+    }
+
+class Outbox:
+    """
+    Persistent queue of outgoing email, delivered by a background worker.
+
+    enqueue() only writes a row, so callers get a message id back at once.
+    The worker sends due messages in Gmail batch requests, paced to
+    send_rate messages per second and at most daily_limit recipients per
+    rolling day. Transient failures are rescheduled with backoff rather than
+    retried in place; messages left mid-send by a crash are re-queued on
+    start.
+    """
+
+    def __init__(self, db_path: str, send_rate: float, daily_limit: int, max_attempts: int):
+        self.db_path = db_path
+        self.send_rate = send_rate
+        self.daily_limit = daily_limit
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE messages SET status = ? WHERE status = ?", (QUEUED, SENDING))
+
+    def enqueue(self, to: List[str], subject: str, body: str, mime_type: str = "text/plain") -> str:
+        """Persist a message for delivery and return its id."""
+        message_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO messages (id, recipients, subject, body, mime_type, status, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (message_id, json.dumps(to), subject, body, mime_type, QUEUED, now, now)
+            )
+        self._wake.set()
+        return message_id
+
+    def get(self, message_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM messages WHERE id = ?", (message_id,)).fetchone()
+        return _to_status(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        query = "SELECT * FROM messages"
+        params: tuple = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        with self._lock:
+            rows = self._conn.execute(f"{query} ORDER BY created_at DESC LIMIT ?", (*params, limit)).fetchall()
+        return [_to_status(row) for row in rows]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM messages GROUP BY status").fetchall())
+        return {status: counts.get(status, 0) for status in (QUEUED, SENDING, SENT, FAILED)}
+
+    def _recipients_sent_today(self) -> int:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT recipients FROM messages WHERE sent_at >= ?", (time.time() - DAY_SECONDS,)
+            ).fetchall()
+        return sum(len(json.loads(row["recipients"])) for row in rows)
+
+    def _claim_due(self, limit: int) -> List[sqlite3.Row]:
+        """Mark up to limit due messages as sending and return them."""
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT * FROM messages WHERE status = ? AND next_attempt_at <= ? ORDER BY created_at LIMIT ?",
+                (QUEUED, time.time(), limit)
+            ).fetchall()
+            self._conn.executemany("UPDATE messages SET status = ? WHERE id = ?", [(SENDING, row["id"]) for row in rows])
+        return rows
+
+    def _next_due_in(self) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM messages WHERE status = ?", (QUEUED,)
+            ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def _record(self, row: sqlite3.Row, response: Optional[Dict], error: Optional[Exception]):
+        attempts = row["attempts"] + 1
+        with self._lock, self._conn:
+            if error is None:
+                self._conn.execute(
+                    "UPDATE messages SET status = ?, attempts = ?, gmail_id = ?, error = NULL, sent_at = ? WHERE id = ?",
+                    (SENT, attempts, (response or {}).get("id"), time.time(), row["id"])
+                )
+            elif is_retryable(error) and attempts < self.max_attempts:
+                self._conn.execute(
+                    "UPDATE messages SET status = ?, attempts = ?, error = ?, next_attempt_at = ? WHERE id = ?",
+                    (QUEUED, attempts, str(error), time.time() + backoff_delay(attempts - 1), row["id"])
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE messages SET status = ?, attempts = ?, error = ? WHERE id = ?",
+                    (FAILED, attempts, str(error), row["id"])
+                )
+
+    def deliver_due(self) -> int:
+        """Send one batch of due messages within the rate and daily limits; returns how many were attempted."""
+        if not get_service_registry().auth_service.is_authenticated():
+            return 0
+        allowance = self.daily_limit - self._recipients_sent_today()
+        if allowance <= 0:
+            return 0
+        rows = self._claim_due(BATCH_SIZE)
+        # Keep within the daily recipient allowance; the rest go back in the
+        # queue, and messages that could never fit in a day fail
+        selected, held, too_large, recipients = [], [], [], 0
+        for row in rows:
+            count = len(json.loads(row["recipients"]))
+            if count > self.daily_limit:
+                too_large.append(row)
+            elif held or recipients + count > allowance:
+                held.append(row)
+            else:
+                selected.append(row)
+                recipients += count
+        if held or too_large:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "UPDATE messages SET status = ? WHERE id = ?", [(QUEUED, row["id"]) for row in held]
+                )
+                self._conn.executemany(
+                    "UPDATE messages SET status = ?, error = ? WHERE id = ?",
+                    [(FAILED, f"More recipients than the daily limit of {self.daily_limit}", row["id"])
+                     for row in too_large]
+                )
+        if not selected:
+            return 0
+
+        try:
+            sender = get_sender_address()
+            raw_messages = [
+                compose_message(json.loads(row["recipients"]), row["subject"], row["body"], row["mime_type"], sender)
+                for row in selected
+            ]
+            results = send_batch(raw_messages)
+        except Exception as e:
+            results = [(None, e)] * len(selected)
+        for row, (response, error) in zip(selected, results):
+            self._record(row, response, error)
+        sent = sum(error is None for _, error in results)
+        logger.info(f"Outbox delivered {sent} of {len(selected)} messages")
+        return len(selected)
+
+    def start(self):
+        """Start the delivery worker thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def run():
+            while not self._stop.is_set():
+                # Clear before looking at the queue, so an enqueue from here
+                # on cuts the wait below short instead of being lost
+                self._wake.clear()
+                attempted = 0
+                try:
+                    attempted = self.deliver_due()
+                except Exception as e:
+                    logger.error(f"Outbox delivery failed: {str(e)}")
+                if attempted:
+                    # Pace batches so the average stays at send_rate messages per second
+                    self._stop.wait(attempted / self.send_rate)
+                    continue
+                wait = self._next_due_in()
+                if wait is None or wait == 0:
+                    # Nothing queued, or due messages held back by the daily
+                    # limit or missing credentials
+                    wait = IDLE_WAIT_SECONDS
+                self._wake.wait(timeout=min(wait, IDLE_WAIT_SECONDS))
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+_outbox: Optional[Outbox] = None
+_outbox_lock = threading.Lock()
+
+def get_outbox() -> Outbox:
+    """Get the shared outbox."""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            db_path = settings.outbox_path or os.path.join(
+                os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "outbox.db"
+            )
+            _outbox = Outbox(db_path, settings.outbox_send_rate, settings.outbox_daily_limit, settings.gmail_max_retries + 1)
+        return _outbox
@@ -0,0 +1,142 @@
+import logging
+import math
+import multiprocessing
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+from PyPDF2 import PdfReader
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Each worker gets several page ranges so uneven pages balance out
+TASKS_PER_WORKER = 4
+
+class PageTimeout(Exception):
+    """Raised inside a worker when a single page takes too long to extract."""
+
+def _raise_page_timeout(signum, frame):
+    raise PageTimeout()
+
+def _extract_pages(path: str, start: int, end: int, page_timeout: float) -> Tuple[int, List[str]]:
+    """
+    Extract pages start..end-1 of the PDF at path. Runs in a worker process.
+
+    Where SIGALRM is available each page gets page_timeout seconds; a page
+    that runs over, or fails to parse, comes back as empty text rather than
+    failing the whole document.
+    """
+    reader = PdfReader(path)
+    use_alarm = page_timeout > 0 and hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_page_timeout)
+
+    texts = []
+    for page_number in range(start, end):
+        try:
+            # Look the page up before arming the timer so a timeout can't
+            # interrupt the reader's page tree loading
+            page = reader.pages[page_number]
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, page_timeout)
+            texts.append(page.extract_text() or "")
+        except PageTimeout:
+            logger.warning(f"Page {page_number + 1} of {path} timed out after {page_timeout}s, skipping")
+            texts.append("")
+        except Exception as e:
+            logger.warning(f"Could not extract page {page_number + 1} of {path}: {str(e)}")
+            texts.append("")
+        finally:
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    return start, texts
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Forking a process with running threads can deadlock, so workers
+            # start fresh and import only this module
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def terminate_pool(pool: ProcessPoolExecutor):
+    """Kill a pool's worker processes, e.g. after one hung, so the next extraction starts fresh ones."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    # shutdown() doesn't stop a worker that is still busy, so terminate them
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+def page_ranges(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    """Split pages into contiguous ranges, a few per worker."""
+    size = max(1, math.ceil(page_count / (workers * TASKS_PER_WORKER)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+def extract_text_parallel(path: str, page_count: int, workers: int, page_timeout: float,
+                          pool: Optional[ProcessPoolExecutor] = None) -> str:
+    """Extract a PDF's text with page ranges fanned out to a process pool, in page order."""
+    pool = pool or _get_pool(workers)
+    ranges = page_ranges(page_count, workers)
+    futures = [pool.submit(_extract_pages, path, start, end, page_timeout) for start, end in ranges]
+    pages: List[str] = [""] * page_count
+    timed_out = False
+    for future, (start, end) in zip(futures, ranges):
+        if timed_out:
+            # Keep ranges that finished before the pool was torn down
+            if not future.done() or future.cancelled() or future.exception() is not None:
+                continue
+        try:
+            # Backstop in case a page can't be interrupted inside the worker
+            _, texts = future.result(timeout=page_timeout * (end - start) + 5 if page_timeout > 0 else None)
+            pages[start:start + len(texts)] = texts
+        except FutureTimeoutError:
+            # The hung worker would otherwise hold a pool process for good,
+            # and keep reading a file the caller is about to delete
+            logger.warning(f"Pages {start + 1}-{end} of {path} timed out, skipping the rest of the unfinished pages")
+            timed_out = True
+            for pending in futures:
+                pending.cancel()
+            terminate_pool(pool)
+    return "\n".join(pages)
+
+def extract_text_sequential(reader: PdfReader) -> str:
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+def extract_pdf_file_text(path: str) -> str:
+    """
+    Extract all text from the PDF at path.
+
+    Documents with at least PDF_PARALLEL_MIN_PAGES pages are split across
+    PDF_EXTRACT_WORKERS processes; smaller ones, or any document when
+    workers is 1, are extracted in-process.
+    """
+    reader = PdfReader(path)
+    page_count = len(reader.pages)
+    workers = settings.pdf_extract_workers or multiprocessing.cpu_count()
+    if workers <= 1 or page_count < settings.pdf_parallel_min_pages:
+        return extract_text_sequential(reader)
+    logger.info(f"Extracting {page_count} pages with {workers} worker processes")
+    try:
+        return extract_text_parallel(path, page_count, workers, settings.pdf_page_timeout_seconds)
+    except BrokenProcessPool as e:
+        # A worker died (e.g. out of memory); start a fresh pool next time
+        logger.error(f"PDF extraction pool failed, extracting in-process: {str(e)}")
+        shutdown_pool()
+        return extract_text_sequential(reader)
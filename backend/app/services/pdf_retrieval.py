@@ -0,0 +1,362 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r'\S+')
+TERM_PATTERN = re.compile(r'\w+')
+UNSAFE_CHARS_PATTERN = re.compile(r'[^A-Za-z0-9_-]')
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were what "
+    "when where which who why with about does do did can me my tell pdf document".split()
+)
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Reciprocal rank fusion constant for combining BM25 and embedding rankings
+RRF_K = 60
+# How long a query waits for the embedding model before answering with BM25 alone
+EMBED_QUERY_WAIT_SECONDS = 0.5
+EMBEDDING_BLOCK_ROWS = 4096
+
+@dataclass
+class Passage:
+    index: int
+    text: str
+    score: float
+
+def tokenize_terms(text: str) -> List[str]:
+    return [term for term in TERM_PATTERN.findall(text.lower()) if term not in STOPWORDS]
+
+def chunk_text(text: str, chunk_words: int, overlap_words: int) -> List[Tuple[int, int]]:
+    """Split text into (start, end) character spans of chunk_words words overlapping by overlap_words."""
+    words = [match.span() for match in WORD_PATTERN.finditer(text)]
+    if not words:
+        return []
+    step = max(1, chunk_words - overlap_words)
+    spans = []
+    for first in range(0, len(words), step):
+        last = min(first + chunk_words, len(words)) - 1
+        spans.append((words[first][0], words[last][1]))
+        if last == len(words) - 1:
+            break
+    return spans
+
+class DocumentIndex:
+    """
+    Retrieval index for one version of one document, stored as flat files.
+
+    Chunk text is a single UTF-8 blob with an offsets array. BM25 postings are
+    kept in CSR form: term_ptr[t]..term_ptr[t + 1] slices post_chunk and
+    post_tf for term t. Optional embeddings are unit-normalized float16 rows.
+    All arrays are memory-mapped, so opening an index reads almost nothing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "vocab.json"), "r", encoding="utf-8") as f:
+            self.vocab: Dict[str, int] = json.load(f)
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.term_ptr = np.load(os.path.join(path, "term_ptr.npy"), mmap_mode="r")
+        self.post_chunk = np.load(os.path.join(path, "post_chunk.npy"), mmap_mode="r")
+        self.post_tf = np.load(os.path.join(path, "post_tf.npy"), mmap_mode="r")
+        self.chunk_len = np.load(os.path.join(path, "chunk_len.npy"), mmap_mode="r")
+        self.avg_len = float(self.chunk_len.mean()) if len(self.chunk_len) else 0.0
+        self.embeddings: Optional[np.ndarray] = None
+        self.load_embeddings()
+
+    def __len__(self) -> int:
+        return len(self.chunk_len)
+
+    def load_embeddings(self) -> bool:
+        embeddings_path = os.path.join(self.path, "embeddings.npy")
+        if self.embeddings is None and os.path.exists(embeddings_path):
+            self.embeddings = np.load(embeddings_path, mmap_mode="r")
+        return self.embeddings is not None
+
+    @classmethod
+    def build(cls, path: str, text: str, chunk_words: int, overlap_words: int) -> "DocumentIndex":
+        spans = chunk_text(text, chunk_words, overlap_words)
+        blob = bytearray()
+        offsets = [0]
+        vocab: Dict[str, int] = {}
+        postings: List[List[Tuple[int, int]]] = []
+        chunk_len = []
+        for chunk_id, (start, end) in enumerate(spans):
+            chunk = text[start:end]
+            blob.extend(chunk.encode("utf-8"))
+            offsets.append(len(blob))
+            counts = Counter(tokenize_terms(chunk))
+            chunk_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_id = vocab.setdefault(term, len(vocab))
+                if term_id == len(postings):
+                    postings.append([])
+                postings[term_id].append((chunk_id, tf))
+
+        term_ptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        term_ptr[1:] = np.cumsum([len(p) for p in postings])
+        post_chunk = np.fromiter((c for p in postings for c, _ in p), dtype=np.int32, count=int(term_ptr[-1]))
+        post_tf = np.fromiter((tf for p in postings for _, tf in p), dtype=np.float32, count=int(term_ptr[-1]))
+
+        # Write to a temp directory first so readers never see a partial index
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        with open(os.path.join(tmp_path, "chunks.bin"), "wb") as f:
+            f.write(blob)
+        with open(os.path.join(tmp_path, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(vocab, f)
+        np.save(os.path.join(tmp_path, "offsets.npy"), np.array(offsets, dtype=np.int64))
+        np.save(os.path.join(tmp_path, "term_ptr.npy"), term_ptr)
+        np.save(os.path.join(tmp_path, "post_chunk.npy"), post_chunk)
+        np.save(os.path.join(tmp_path, "post_tf.npy"), post_tf)
+        np.save(os.path.join(tmp_path, "chunk_len.npy"), np.array(chunk_len, dtype=np.float32))
+        os.replace(tmp_path, path)
+        return cls(path)
+
+    def chunk(self, chunk_id: int) -> str:
+        start, end = int(self.offsets[chunk_id]), int(self.offsets[chunk_id + 1])
+        with open(os.path.join(self.path, "chunks.bin"), "rb") as f:
+            f.seek(start)
+            return f.read(end - start).decode("utf-8")
+
+    def bm25_scores(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk; only the query terms' postings are touched."""
+        scores = np.zeros(len(self), dtype=np.float32)
+        n = len(self)
+        for term in set(tokenize_terms(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = int(self.term_ptr[term_id]), int(self.term_ptr[term_id + 1])
+            chunk_ids = self.post_chunk[start:end]
+            tf = self.post_tf[start:end]
+            idf = math.log(1 + (n - (end - start) + 0.5) / ((end - start) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.chunk_len[chunk_ids] / self.avg_len)
+            scores[chunk_ids] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def embedding_scores(self, query_vector: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every chunk, computed in blocks to bound memory."""
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), EMBEDDING_BLOCK_ROWS):
+            block = self.embeddings[start:start + EMBEDDING_BLOCK_ROWS].astype(np.float32)
+            scores[start:start + len(block)] = block @ query_vector
+        return scores
+
+    def save_embeddings(self, vectors: np.ndarray):
+        tmp_path = os.path.join(self.path, "embeddings.tmp.npy")
+        np.save(tmp_path, vectors.astype(np.float16))
+        os.replace(tmp_path, os.path.join(self.path, "embeddings.npy"))
+        self.load_embeddings()
+
+def _top_k(scores: np.ndarray, k: int) -> List[int]:
+    """Indices of the k highest positive scores, best first."""
+    k = min(k, int(np.count_nonzero(scores > 0)))
+    if k == 0:
+        return []
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return [int(i) for i in candidates[np.argsort(-scores[candidates])]]
+
+class Embedder:
+    """Sentence embeddings from a local llama.cpp model in embedding mode."""
+
+    def __init__(self, model_path: str):
+        from llama_cpp import Llama
+        self.model = Llama(model_path=model_path, embedding=True, n_ctx=512, verbose=False)
+        # llama.cpp contexts are not thread-safe
+        self.lock = threading.Lock()
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.array(self.model.create_embedding(text)["data"][0]["embedding"], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+class PdfRetriever:
+    """
+    Finds the passages of a PDF most relevant to a question.
+
+    Indexes are built on first use for each (file id, version) and kept on
+    disk, bounded by max_bytes with least recently used indexes removed
+    first. BM25 is always available; when an embedding model is configured,
+    chunk embeddings are computed in the background and, once ready, their
+    ranking is fused with BM25's. Query cost depends only on the postings of
+    the question's terms and the number of chunks, never on re-reading the
+    document.
+    """
+
+    def __init__(self, index_dir: str, max_bytes: int, chunk_words: int, overlap_words: int,
+                 embedding_model_path: str = ""):
+        self.index_dir = index_dir
+        self.max_bytes = max_bytes
+        self.chunk_words = chunk_words
+        self.overlap_words = overlap_words
+        self.embedding_model_path = embedding_model_path
+        os.makedirs(index_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._open: Dict[str, DocumentIndex] = {}
+        self._embedder: Optional[Embedder] = None
+        self._embed_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-embed")
+        self._embedding: set = set()
+
+    def _path(self, file_id: str, version: str) -> str:
+        # <file id>-<version hash>-<chunking>; the last two never contain '-'
+        version_hash = hashlib.sha1(version.encode("utf-8")).hexdigest()[:16]
+        chunking = f"{self.chunk_words}w{self.overlap_words}"
+        return os.path.join(self.index_dir, f"{UNSAFE_CHARS_PATTERN.sub('_', file_id)}-{version_hash}-{chunking}")
+
+    def _dir_size(self, path: str) -> int:
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+    def _evict(self, keep: str):
+        """Remove older versions of keep's file and the least recently used indexes over the cap."""
+        file_key = os.path.basename(keep).rsplit("-", 2)[0]
+        indexes = []
+        for entry in os.scandir(self.index_dir):
+            if not entry.is_dir() or entry.path == keep or entry.name.endswith(".tmp"):
+                continue
+            if entry.name.rsplit("-", 2)[0] == file_key:
+                self._remove(entry.path)
+            else:
+                indexes.append((entry.stat().st_mtime, entry.path, self._dir_size(entry.path)))
+        total = self._dir_size(keep) + sum(size for _, _, size in indexes)
+        for _, path, size in sorted(indexes):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path: str):
+        self._open.pop(path, None)
+        shutil.rmtree(path, ignore_errors=True)
+
+    def _open_existing(self, path: str) -> Optional[DocumentIndex]:
+        index = self._open.get(path)
+        if index is None and os.path.isdir(path):
+            index = self._open[path] = DocumentIndex(path)
+        return index
+
+    def get_index(self, file_id: str, version: str, load_text: Callable[[], str]) -> DocumentIndex:
+        """Open the index for this version of the file, building it from load_text() only if there is none."""
+        path = self._path(file_id, version)
+        with self._lock:
+            index = self._open_existing(path)
+        if index is None:
+            # Reading the document can mean a download, so not under the lock
+            text = load_text()
+            with self._lock:
+                index = self._open_existing(path)
+                if index is None:
+                    index = self._open[path] = DocumentIndex.build(path, text, self.chunk_words, self.overlap_words)
+                    logger.info(f"Indexed {len(index)} chunks of {file_id}")
+                    self._evict(path)
+        with self._lock:
+            # Mark as recently used
+            os.utime(path)
+        if self.embedding_model_path and not index.load_embeddings():
+            self._schedule_embeddings(index)
+        return index
+
+    def _get_embedder(self) -> Optional[Embedder]:
+        with self._lock:
+            if self._embedder is None and self.embedding_model_path:
+                try:
+                    self._embedder = Embedder(self.embedding_model_path)
+                except Exception as e:
+                    logger.error(f"Failed to load embedding model, using BM25 only: {str(e)}")
+                    self.embedding_model_path = ""
+            return self._embedder
+
+    def _schedule_embeddings(self, index: DocumentIndex):
+        with self._lock:
+            if index.path in self._embedding:
+                return
+            self._embedding.add(index.path)
+        self._embed_pool.submit(self._build_embeddings, index)
+
+    def _build_embeddings(self, index: DocumentIndex):
+        try:
+            embedder = self._get_embedder()
+            if embedder is None:
+                return
+            vectors = []
+            for chunk_id in range(len(index)):
+                # Take the lock per chunk so question embeddings can slip in
+                with embedder.lock:
+                    vectors.append(embedder.embed(index.chunk(chunk_id)))
+            if vectors:
+                index.save_embeddings(np.stack(vectors))
+                logger.info(f"Embedded {len(vectors)} chunks for {index.path}")
+        except Exception as e:
+            logger.error(f"Failed to embed chunks for {index.path}: {str(e)}")
+        finally:
+            with self._lock:
+                self._embedding.discard(index.path)
+
+    def _embed_query(self, query: str) -> Optional[np.ndarray]:
+        embedder = self._embedder
+        if embedder is None or not embedder.lock.acquire(timeout=EMBED_QUERY_WAIT_SECONDS):
+            return None
+        try:
+            return embedder.embed(query)
+        finally:
+            embedder.lock.release()
+
+    def search(self, file_id: str, version: str, load_text: Callable[[], str], query: str,
+               top_k: int) -> List[Passage]:
+        """
+        Return up to top_k passages for query, most relevant first.
+
+        load_text is only called when this version of the file has no index yet.
+        """
+        index = self.get_index(file_id, version, load_text)
+        if not len(index):
+            return []
+        bm25_ranking = _top_k(index.bm25_scores(query), top_k * 2)
+
+        query_vector = self._embed_query(query) if index.embeddings is not None else None
+        if query_vector is None:
+            scores = {chunk_id: 1.0 / (RRF_K + rank) for rank, chunk_id in enumerate(bm25_ranking)}
+        else:
+            embedding_ranking = _top_k(index.embedding_scores(query_vector), top_k * 2)
+            scores: Dict[int, float] = {}
+            for ranking in (bm25_ranking, embedding_ranking):
+                for rank, chunk_id in enumerate(ranking):
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank)
+
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:top_k]
+        return [Passage(index=chunk_id, text=index.chunk(chunk_id), score=score) for chunk_id, score in ranked]
+
+_retriever: Optional[PdfRetriever] = None
+_retriever_lock = threading.Lock()
+
+def get_pdf_retriever() -> PdfRetriever:
+    """Get the shared PDF retriever."""
+    global _retriever
+    with _retriever_lock:
+        if _retriever is None:
+            index_dir = settings.pdf_index_dir or os.path.join(
+                os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "pdf_index"
+            )
+            _retriever = PdfRetriever(
+                index_dir,
+                settings.pdf_index_max_bytes,
+                settings.pdf_chunk_words,
+                settings.pdf_chunk_overlap_words,
+                settings.pdf_embedding_model_path,
+            )
+        return _retriever
@@ -5,7 +5,11 @@ from dataclasses import dataclass
 from mcp.types import TextContent, CallToolResult
 import re
 from pydantic import BaseModel, Field
-from app.services.drive_service import list_resources, read_resource
+from app.services.drive_service import list_resources, read_resource, media_url
+from app.services.drive_index import DriveIndexNotReady, get_drive_index
+from app.services.pdf_retrieval import get_pdf_retriever
+from ..core.config import settings
+from ..core.phrase_matcher import PhraseMatcher
 from ..models.intent import Intent, IntentType
 
 logger = logging.getLogger(__name__)
@@ -28,6 +32,134 @@ class Intent:
     entities: Dict[str, Any]
     raw_text: str
 
+@dataclass(frozen=True)
+class IntentRule:
+    intent: IntentType
+    confidence: float
+    # Every group must have at least one of its phrases in the prompt
+    triggers: Tuple[Tuple[str, ...], ...]
+    # Name of the PromptHandler method that extracts entities, if any
+    extractor: Optional[str] = None
+
+# Checked in order; the first rule that matches decides the intent
+INTENT_RULES = (
+    IntentRule(IntentType.SEND_EMAIL, 0.9, (
+        ("send an email", "send email", "email to", "send a message", "send message"),
+    ), "_extract_email_entities"),
+    IntentRule(IntentType.GET_WEATHER, 0.9, (
+        ("weather", "temperature", "forecast", "how's the weather", "what's the weather",
+         "weather in", "temperature in", "forecast for"),
+    ), "_extract_weather_entities"),
+    IntentRule(IntentType.SHOW_IMAGE, 0.9, (
+        ("show me the image", "show me the picture", "display the image", "display the picture",
+         "show the image", "show the picture", "display the photo", "show the photo",
+         "show me the photo", "display image", "show image", "display picture", "show picture"),
+    ), "_extract_file_entities"),
+    IntentRule(IntentType.READ_FILE, 0.9, (("read",), ("pdf",)), "_extract_file_entities"),
+    IntentRule(IntentType.QUERY_PDF, 0.9, (("what's in",), ("pdf",)), "_extract_file_entities"),
+    IntentRule(IntentType.LIST_FOLDERS, 0.95, (("list all folders",),)),
+    IntentRule(IntentType.LIST_FILES, 0.9, (("list files",),), "_extract_folder_entities"),
+    IntentRule(IntentType.SEARCH_FILES, 0.9, (("search",), ("drive",)), "_extract_search_entities"),
+)
+
+# One scan of the prompt finds every trigger phrase of every rule
+TRIGGERS = PhraseMatcher(phrase for rule in INTENT_RULES for group in rule.triggers for phrase in group)
+
+def _rule_bits() -> Tuple[Dict[str, int], List[Tuple[IntentRule, int]]]:
+    """
+    Give each trigger group a bit. A phrase maps to the bits of the groups it
+    belongs to, and a rule matches when all of its groups' bits are set.
+    """
+    phrase_bits: Dict[str, int] = {}
+    rule_bits: List[Tuple[IntentRule, int]] = []
+    bit = 1
+    for rule in INTENT_RULES:
+        required = 0
+        for group in rule.triggers:
+            for phrase in group:
+                phrase_bits[phrase] = phrase_bits.get(phrase, 0) | bit
+            required |= bit
+            bit <<= 1
+        rule_bits.append((rule, required))
+    return phrase_bits, rule_bits
+
+TRIGGER_BITS, RULE_BITS = _rule_bits()
+
+INTENT_HANDLERS = {
+    IntentType.LIST_FOLDERS: "_handle_list_folders",
+    IntentType.LIST_FILES: "_handle_list_files",
+    IntentType.SEARCH_FILES: "_handle_search_files",
+    IntentType.SHOW_IMAGE: "_handle_show_image",
+    IntentType.READ_FILE: "_handle_read_file",
+    IntentType.QUERY_PDF: "_handle_query_pdf",
+    IntentType.SEND_EMAIL: "_handle_send_email",
+    IntentType.GET_WEATHER: "_handle_get_weather",
+}
+
+# Intents answered from the local Drive index, which is empty until the first crawl finishes
+DRIVE_INDEX_INTENTS = {
+    IntentType.LIST_FOLDERS, IntentType.LIST_FILES, IntentType.SHOW_IMAGE, IntentType.READ_FILE, IntentType.QUERY_PDF
+}
+
+# Entity extraction patterns, compiled once
+QUOTED = r'[\'"]([^\'"]+)[\'"]'
+FILE_NAME_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'(?:file|document|pdf|image|picture|photo)\s+(?:named|called|titled)?\s*' + QUOTED,
+    r'(?:file|document|pdf|image|picture|photo)\s+(?:named|called|titled)?\s+(\S+)',
+    r'(?:show me the|display the|show the)\s+(?:image|picture|photo)\s+' + QUOTED,
+    r'(?:show me the|display the|show the)\s+(?:image|picture|photo)\s+(\S+)',
+    r'(?:display|show)\s+(?:image|picture|photo)\s+' + QUOTED,
+    r'(?:display|show)\s+(?:image|picture|photo)\s+(\S+)',
+)]
+FILE_QUERY_PATTERN = re.compile(r'(?:about|containing|with)\s+' + QUOTED, re.IGNORECASE)
+FOLDER_PATTERN = re.compile(r'(?:in|from|under|inside)\s+' + QUOTED, re.IGNORECASE)
+SEARCH_QUERY_PATTERN = re.compile(r'(?:for|containing|with)\s+' + QUOTED, re.IGNORECASE)
+SEARCH_FOLDER_PATTERN = re.compile(r'(?:in|from|under)\s+' + QUOTED, re.IGNORECASE)
+# Where a location phrase may start, most specific first
+LOCATION_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'(?:weather|temperature|forecast)\s+(?:like\s+)?(?:in|at|for)\s+',
+    r'\b(?:in|at|for)\s+',
+)]
+# Time expressions and words that start another clause; a location phrase ends before them
+TIME_WORDS = (
+    r'today|tonight|tomorrow|now|right now|currently|later|soon|this|next|on|during|over|'
+    r'(?:the\s+)?(?:weekend|week|morning|afternoon|evening|night|day)|'
+    r'monday|tuesday|wednesday|thursday|friday|saturday|sunday'
+)
+CLAUSE_WORDS = (
+    r'what|what\'s|how|when|where|why|which|who|should|will|would|could|can|do|does|did|is|are|'
+    r'was|i|i\'m|we|you|it|it\'s|please|so|because|but|if|then|like|looking|going'
+)
+LOCATION_END_PATTERN = re.compile(
+    rf'[?!.:]|(?:^|\s)(?:{TIME_WORDS}|{CLAUSE_WORDS})(?=\s|$|[?!.,;:])', re.IGNORECASE
+)
+QUOTED_PATTERN = re.compile(QUOTED)
+LOCATION_SEPARATOR_PATTERN = re.compile(r'\s*(?:,|;|&)\s*')
+LOCATION_AND_PATTERN = re.compile(r'\s+and\s+')
+LOCATION_GAP = r'(?:[\s,;&]|\band\b|\bor\b)*'
+LOCATION_GAP_PATTERN = re.compile(LOCATION_GAP)
+LOCATION_TRAILING_PATTERN = re.compile(LOCATION_GAP + '$')
+# A location is up to four words, not starting with an article or pronoun
+PLACE_NAME_PATTERN = re.compile(
+    r"(?!(?:a|an|my|our|your|his|her|their|some|any|me|us|them)\b)[^\W\d_][\w'.-]*(?:\s+[\w'.-]+){0,3}",
+    re.IGNORECASE
+)
+EMAIL_FULL_PATTERN = re.compile(
+    r'send\s+(?:an\s+)?email\s+to\s+([^\s]+@[^\s]+)\s+about\s+' + QUOTED + r'\s+saying\s+' + QUOTED,
+    re.IGNORECASE
+)
+EMAIL_FIELD_PATTERNS = [
+    (name, [re.compile(pattern, re.IGNORECASE) for pattern in patterns]) for name, patterns in (
+        ("to", (
+            r'send\s+(?:an\s+)?email\s+to\s+([^\s]+@[^\s]+)',
+            r'email\s+to\s+([^\s]+@[^\s]+)',
+            r'to\s+([^\s]+@[^\s]+)',
+        )),
+        ("subject", (r'about\s+' + QUOTED, r'subject\s+' + QUOTED, r'titled\s+' + QUOTED)),
+        ("body", (r'saying\s+' + QUOTED, r'message\s+' + QUOTED, r'body\s+' + QUOTED, r'content\s+' + QUOTED)),
+    )
+]
+
 class PromptHandler:
     def __init__(self):
         # Initialize any required models or services
@@ -59,51 +191,15 @@ class PromptHandler:
     def _rule_based_classification(self, prompt: str) -> Tuple[IntentType, float, Dict[str, Any]]:
         """Rule-based intent classification using patterns and keywords."""
         prompt = prompt.lower()
-        entities = {}
-        
-        # Email operations
-        if any(phrase in prompt for phrase in [
-            "send an email", "send email", "email to", "send a message", "send message"
-        ]):
-            entities = self._extract_email_entities(prompt)
-            return IntentType.SEND_EMAIL, 0.9, entities
-        
-        # Weather operations
-        if any(phrase in prompt for phrase in [
-            "weather", "temperature", "forecast", "how's the weather", "what's the weather",
-            "weather in", "temperature in", "forecast for"
-        ]):
-            entities = self._extract_weather_entities(prompt)
-            return IntentType.GET_WEATHER, 0.9, entities
+        hits = 0
+        for phrase in TRIGGERS.find(prompt):
+            hits |= TRIGGER_BITS[phrase]
         
-        # File operations - more flexible image patterns
-        if any(phrase in prompt for phrase in [
-            "show me the image", "show me the picture", "display the image", "display the picture",
-            "show the image", "show the picture", "display the photo", "show the photo",
-            "show me the photo", "display image", "show image", "display picture", "show picture"
-        ]):
-            entities = self._extract_file_entities(prompt)
-            return IntentType.SHOW_IMAGE, 0.9, entities
-            
-        if "read" in prompt and "pdf" in prompt:
-            entities = self._extract_file_entities(prompt)
-            return IntentType.READ_FILE, 0.9, entities
-            
-        if "what's in" in prompt and "pdf" in prompt:
-            entities = self._extract_file_entities(prompt)
-            return IntentType.QUERY_PDF, 0.9, entities
-            
-        # Drive operations
-        if "list all folders" in prompt:
-            return IntentType.LIST_FOLDERS, 0.95, {}
-            
-        if "list files" in prompt:
-            entities = self._extract_folder_entities(prompt)
-            return IntentType.LIST_FILES, 0.9, entities
-            
-        if "search" in prompt and "drive" in prompt:
-            entities = self._extract_search_entities(prompt)
-            return IntentType.SEARCH_FILES, 0.9, entities
+        # First rule whose trigger groups all occur wins
+        for rule, required in RULE_BITS:
+            if hits & required == required:
+                entities = getattr(self, rule.extractor)(prompt) if rule.extractor else {}
+                return rule.intent, rule.confidence, entities
             
         # Default to chat
         return IntentType.CHAT, 0.5, {}
@@ -125,24 +221,14 @@ class PromptHandler:
         entities = {}
         
         # Extract file name - more flexible pattern for images
-        file_patterns = [
-            r'(?:file|document|pdf|image|picture|photo)\s+(?:named|called|titled)?\s*[\'"]([^\'"]+)[\'"]',
-            r'(?:file|document|pdf|image|picture|photo)\s+(?:named|called|titled)?\s+(\S+)',
-            r'(?:show me the|display the|show the)\s+(?:image|picture|photo)\s+[\'"]([^\'"]+)[\'"]',
-            r'(?:show me the|display the|show the)\s+(?:image|picture|photo)\s+(\S+)',
-            r'(?:display|show)\s+(?:image|picture|photo)\s+[\'"]([^\'"]+)[\'"]',
-            r'(?:display|show)\s+(?:image|picture|photo)\s+(\S+)'
-        ]
-        
-        for pattern in file_patterns:
-            file_match = re.search(pattern, prompt, re.IGNORECASE)
+        for pattern in FILE_NAME_PATTERNS:
+            file_match = pattern.search(prompt)
             if file_match:
                 entities["file_name"] = file_match.group(1)
                 break
         
         # Extract query for PDF content
-        query_pattern = r'(?:about|containing|with)\s+[\'"]([^\'"]+)[\'"]'
-        query_match = re.search(query_pattern, prompt, re.IGNORECASE)
+        query_match = FILE_QUERY_PATTERN.search(prompt)
         if query_match:
             entities["query"] = query_match.group(1)
         
@@ -153,8 +239,7 @@ class PromptHandler:
         entities = {}
         
         # Extract folder name
-        folder_pattern = r'(?:in|from|under|inside)\s+[\'"]([^\'"]+)[\'"]'
-        folder_match = re.search(folder_pattern, prompt, re.IGNORECASE)
+        folder_match = FOLDER_PATTERN.search(prompt)
         if folder_match:
             entities["folder_name"] = folder_match.group(1)
         
@@ -165,14 +250,12 @@ class PromptHandler:
         entities = {}
         
         # Extract search query
-        query_pattern = r'(?:for|containing|with)\s+[\'"]([^\'"]+)[\'"]'
-        query_match = re.search(query_pattern, prompt, re.IGNORECASE)
+        query_match = SEARCH_QUERY_PATTERN.search(prompt)
         if query_match:
             entities["query"] = query_match.group(1)
         
         # Extract folder name if specified
-        folder_pattern = r'(?:in|from|under)\s+[\'"]([^\'"]+)[\'"]'
-        folder_match = re.search(folder_pattern, prompt, re.IGNORECASE)
+        folder_match = SEARCH_FOLDER_PATTERN.search(prompt)
         if folder_match:
             entities["folder_name"] = folder_match.group(1)
         
@@ -182,77 +265,62 @@ class PromptHandler:
         """Extract weather-related entities from the prompt."""
         entities = {}
         
-        # Extract location - multiple patterns for flexibility
-        location_patterns = [
-            r'(?:weather|temperature|forecast)\s+(?:in|at|for)\s+[\'"]([^\'"]+)[\'"]',
-            r'(?:weather|temperature|forecast)\s+(?:in|at|for)\s+(\S+)',
-            r'(?:in|at|for)\s+[\'"]([^\'"]+)[\'"]',
-            r'(?:in|at|for)\s+(\S+)'
-        ]
-        
-        for pattern in location_patterns:
-            location_match = re.search(pattern, prompt, re.IGNORECASE)
-            if location_match:
-                entities["location"] = location_match.group(1)
-                break
+        # Try each place a location phrase may start until one yields a location
+        for pattern in LOCATION_PATTERNS:
+            for location_match in pattern.finditer(prompt):
+                locations = self._split_locations(prompt[location_match.end():])
+                if locations:
+                    entities["locations"] = locations
+                    return entities
         
         return entities
 
+    def _split_locations(self, text: str) -> List[str]:
+        """
+        Locations at the start of text: quoted names as-is, otherwise "a, b and c".
+
+        The phrase ends at punctuation, a time expression ("this weekend") or
+        the start of another clause ("and what should I wear"). "and" only
+        splits when both sides look like place names.
+        """
+        if text[:1] in "'\"":
+            locations, position = [], 0
+            for quoted in QUOTED_PATTERN.finditer(text):
+                if not LOCATION_GAP_PATTERN.fullmatch(text, position, quoted.start()):
+                    break
+                locations.append(quoted.group(1))
+                position = quoted.end()
+            return locations
+        end = LOCATION_END_PATTERN.search(text)
+        phrase = LOCATION_TRAILING_PATTERN.sub('', text[:end.start()] if end else text)
+        locations = []
+        for part in LOCATION_SEPARATOR_PATTERN.split(phrase):
+            # "and" joins places only while what follows it looks like one
+            for piece in LOCATION_AND_PATTERN.split(part):
+                if not PLACE_NAME_PATTERN.fullmatch(piece):
+                    break
+                locations.append(piece)
+        return locations
+
     def _extract_email_entities(self, prompt: str) -> Dict[str, Any]:
         """Extract email-related entities from the prompt."""
         entities = {}
         
-        # More comprehensive pattern to match the full email format
         # Matches: "send an email to [email] about [subject] saying [body]"
-        full_pattern = r'send\s+(?:an\s+)?email\s+to\s+([^\s]+@[^\s]+)\s+about\s+[\'"]([^\'"]+)[\'"]\s+saying\s+[\'"]([^\'"]+)[\'"]'
-        full_match = re.search(full_pattern, prompt, re.IGNORECASE)
-        
+        full_match = EMAIL_FULL_PATTERN.search(prompt)
         if full_match:
             entities["to"] = full_match.group(1)
             entities["subject"] = full_match.group(2)
             entities["body"] = full_match.group(3)
             return entities
         
-        # Fallback patterns for individual components
-        # Extract recipient email
-        email_patterns = [
-            r'send\s+(?:an\s+)?email\s+to\s+([^\s]+@[^\s]+)',
-            r'email\s+to\s+([^\s]+@[^\s]+)',
-            r'to\s+([^\s]+@[^\s]+)'
-        ]
-        
-        for pattern in email_patterns:
-            email_match = re.search(pattern, prompt, re.IGNORECASE)
-            if email_match:
-                entities["to"] = email_match.group(1)
-                break
-        
-        # Extract subject
-        subject_patterns = [
-            r'about\s+[\'"]([^\'"]+)[\'"]',
-            r'subject\s+[\'"]([^\'"]+)[\'"]',
-            r'titled\s+[\'"]([^\'"]+)[\'"]'
-        ]
-        
-        for pattern in subject_patterns:
-            subject_match = re.search(pattern, prompt, re.IGNORECASE)
-            if subject_match:
-                entities["subject"] = subject_match.group(1)
-                break
-        
-        # Extract message body
-        body_patterns = [
-            r'saying\s+[\'"]([^\'"]+)[\'"]',
-            r'message\s+[\'"]([^\'"]+)[\'"]',
-            r'body\s+[\'"]([^\'"]+)[\'"]',
-            r'content\s+[\'"]([^\'"]+)[\'"]'
-        ]
-        
-        for pattern in body_patterns:
-            body_match = re.search(pattern, prompt, re.IGNORECASE)
-            if body_match:
-                entities["body"] = body_match.group(1)
-                break
+        # Fallback patterns for individual components, first match wins
+        for name, patterns in EMAIL_FIELD_PATTERNS:
+            for pattern in patterns:
+                field_match = pattern.search(prompt)
+                if field_match:
+                    entities[name] = field_match.group(1)
+                    break
         
         return entities
 
@@ -268,28 +336,36 @@ class PromptHandler:
         try:
             # Classify the intent
             intent = self.classify_intent(prompt)
-            
-            # Handle based on intent type
-            if intent.type == IntentType.LIST_FOLDERS:
-                return self._handle_list_folders(intent)
-            elif intent.type == IntentType.LIST_FILES:
-                return self._handle_list_files(intent)
-            elif intent.type == IntentType.SEARCH_FILES:
-                return self._handle_search_files(intent)
-            elif intent.type == IntentType.SHOW_IMAGE:
-                return self._handle_show_image(intent)
-            elif intent.type == IntentType.READ_FILE:
-                return self._handle_read_file(intent)
-            elif intent.type == IntentType.QUERY_PDF:
-                return self._handle_query_pdf(intent)
-            elif intent.type == IntentType.SEND_EMAIL:
-                return self._handle_send_email(intent)
-            elif intent.type == IntentType.GET_WEATHER:
-                return self._handle_get_weather(intent)
-            
-            # Default to chat
-            return self._handle_chat(intent)
-            
+            return self.handle_intent(intent)
+        except Exception as e:
+            logger.error(f"Error handling prompt: {str(e)}", exc_info=True)
+            return CallToolResult(
+                content=[TextContent(
+                    type="text",
+                    text=f"Sorry, I encountered an error: {str(e)}",
+                    uri=None,
+                    mimeType=None
+                )],
+                isError=True
+            )
+
+    def handle_intent(self, intent: Intent) -> CallToolResult:
+        """Execute the action for an already classified intent."""
+        try:
+            if intent.type in DRIVE_INDEX_INTENTS:
+                get_drive_index().check_ready()
+            handler = getattr(self, INTENT_HANDLERS.get(intent.type, "_handle_chat"))
+            return handler(intent)
+        except DriveIndexNotReady as e:
+            return CallToolResult(
+                content=[TextContent(
+                    type="text",
+                    text=str(e),
+                    uri=None,
+                    mimeType=None
+                )],
+                isError=True
+            )
         except Exception as e:
             logger.error(f"Error handling prompt: {str(e)}", exc_info=True)
             return CallToolResult(
@@ -305,20 +381,7 @@ class PromptHandler:
     def _handle_list_folders(self, intent: Intent) -> CallToolResult:
         """Handle requests to list folders."""
         try:
-            from app.services.drive_service import list_resources
-            result = list_resources()
-            if not result:
-                return CallToolResult(
-                    content=[TextContent(
-                        type="text",
-                        text="No folders found in your Drive.",
-                        uri=None,
-                        mimeType=None
-                    )],
-                    isError=False
-                )
-            
-            folders = [f for f in result if f.mimeType == "application/vnd.google-apps.folder"]
+            folders = get_drive_index().list_folders()
             if not folders:
                 return CallToolResult(
                     content=[TextContent(
@@ -355,7 +418,6 @@ class PromptHandler:
     def _handle_list_files(self, intent: Intent) -> CallToolResult:
         """Handle requests to list files in a folder."""
         try:
-            from app.services.drive_service import list_resources
             folder_name = intent.entities.get("folder_name")
             if not folder_name:
                 return CallToolResult(
@@ -368,19 +430,18 @@ class PromptHandler:
                     isError=True
                 )
             
-            result = list_resources()
-            if not result:
+            files = get_drive_index().list_files_in_folder(folder_name)
+            if files is None:
                 return CallToolResult(
                     content=[TextContent(
                         type="text",
-                        text=f"No files found in folder '{folder_name}'.",
+                        text=f"Could not find folder '{folder_name}' in your Drive.",
                         uri=None,
                         mimeType=None
                     )],
                     isError=False
                 )
             
-            files = [f for f in result if f.mimeType != "application/vnd.google-apps.folder"]
             if not files:
                 return CallToolResult(
                     content=[TextContent(
@@ -474,47 +535,20 @@ class PromptHandler:
         logger.info(f"Looking for image: {filename}")
         
         try:
-            # Get all resources in Drive (multiple pages if needed)
-            all_resources = []
-            cursor = None
-            
-            # Get multiple pages of results
-            for _ in range(3):  # Get up to 3 pages (150 files total)
-                resources = list_resources(cursor)
-                if not resources:
-                    break
-                all_resources.extend(resources)
-                cursor = getattr(resources[-1], 'nextPageToken', None) if resources else None
-                if not cursor:
-                    break
-            
-            target_file = None
+            drive_index = get_drive_index()
             
-            # Search for the file case-insensitively with multiple strategies
-            filename_lower = filename.lower()
-            
-            # First try exact match
-            for resource in all_resources:
-                if resource.name.lower() == filename_lower:
-                    target_file = resource
-                    break
-            
-            # If no exact match, try partial match
-            if not target_file:
-                for resource in all_resources:
-                    if filename_lower in resource.name.lower() and resource.mimeType.startswith('image/'):
-                        target_file = resource
-                        break
+            # Best exact, case-insensitive, prefix, partial or fuzzy match among images
+            target_file = drive_index.resolve_name(filename, mime_prefix="image/")
             
             if not target_file:
                 # Return a helpful message with some available image files
-                image_files = [r.name for r in all_resources if r.mimeType.startswith('image/')]
+                image_files = [r.name for r in drive_index.list_by_mime_prefix("image/", limit=5)]
                 if image_files:
                     return CallToolResult(
                         content=[
                             TextContent(
                                 type="text",
-                                text=f"Could not find image '{filename}' in your Drive. Available images: {', '.join(image_files[:5])}",
+                                text=f"Could not find image '{filename}' in your Drive. Available images: {', '.join(image_files)}",
                                 mimeType="text/plain",
                                 uri=None
                             )
@@ -535,45 +569,17 @@ class PromptHandler:
             # Get the file ID from the URI
             file_id = str(target_file.uri).split("/")[-1]
             
-            # Read the resource using the file ID
-            result = read_resource(f"gdrive:///{file_id}")
-            
-            if not result:
-                return CallToolResult(
-                    content=[
-                        TextContent(
-                            type="text",
-                            text=f"Could not read image '{filename}' from Drive.",
-                            mimeType="text/plain",
-                            uri=None
-                        )
-                    ]
-                )
-            
-            # The result should be a list with one TextContent object containing the base64 image
-            if result and len(result) > 0 and result[0].mimeType and result[0].mimeType.startswith('image/'):
-                # Return the image data directly
-                return CallToolResult(
-                    content=[
-                        TextContent(
-                            type="text",
-                            text=result[0].text,  # This is the base64 image data
-                            mimeType=result[0].mimeType,
-                            uri=result[0].uri
-                        )
-                    ]
-                )
-            else:
-                return CallToolResult(
-                    content=[
-                        TextContent(
-                            type="text",
-                            text=f"Error: The file '{filename}' is not an image.",
-                            mimeType="text/plain",
-                            uri=None
-                        )
-                    ]
-                )
+            # Return a reference to the image; the bytes are served by /api/media
+            return CallToolResult(
+                content=[
+                    TextContent(
+                        type="text",
+                        text=media_url(file_id),
+                        mimeType=target_file.mimeType,
+                        uri=str(target_file.uri)
+                    )
+                ]
+            )
             
         except Exception as e:
             logger.error(f"Error handling show image: {str(e)}")
@@ -585,7 +591,8 @@ class PromptHandler:
                         mimeType="text/plain",
                         uri=None
                     )
-                ]
+                ],
+                isError=True
             )
 
     def _handle_read_file(self, intent: Intent) -> CallToolResult:
@@ -604,19 +611,33 @@ class PromptHandler:
                     isError=True
                 )
             
-            result = read_resource(f"gdrive:///{file_name}")
-            if not result or result.isError:
+            # The intent needs "pdf" in the prompt; without the type filter a
+            # folder or document with the same name could win
+            target_file = get_drive_index().resolve_name(file_name, mime_prefix="application/pdf")
+            if not target_file:
                 return CallToolResult(
                     content=[TextContent(
                         type="text",
-                        text=f"Could not find or read file '{file_name}'.",
+                        text=f"Could not find file '{file_name}' in your Drive.",
                         uri=None,
                         mimeType=None
                     )],
                     isError=True
                 )
             
-            return result
+            result = read_resource(str(target_file.uri))
+            if not result:
+                return CallToolResult(
+                    content=[TextContent(
+                        type="text",
+                        text=f"Could not read file '{target_file.name}'.",
+                        uri=None,
+                        mimeType=None
+                    )],
+                    isError=True
+                )
+            
+            return CallToolResult(content=result, isError=False)
         except Exception as e:
             logger.error(f"Error reading file: {str(e)}")
             return CallToolResult(
@@ -647,20 +668,53 @@ class PromptHandler:
                     isError=True
                 )
             
-            result = read_resource(f"gdrive:///{file_name}")
-            if not result or result.isError:
+            target_file = get_drive_index().resolve_name(file_name, mime_prefix="application/pdf")
+            if not target_file:
                 return CallToolResult(
                     content=[TextContent(
                         type="text",
-                        text=f"Could not find or read PDF '{file_name}'.",
+                        text=f"Could not find PDF '{file_name}' in your Drive.",
                         uri=None,
                         mimeType=None
                     )],
                     isError=True
                 )
             
-            # TODO: Implement PDF content querying logic
-            return result
+            def load_text() -> str:
+                result = read_resource(str(target_file.uri))
+                if not result:
+                    raise ValueError(f"Could not read PDF '{target_file.name}'.")
+                return result[0].text
+            
+            # Answer from the most relevant passages rather than the whole
+            # text; the PDF is only read if this version isn't indexed yet
+            file_id = str(target_file.uri).replace("gdrive:///", "")
+            indexed = get_drive_index().get_file(file_id)
+            version = indexed["modified_time"] if indexed and indexed["modified_time"] else "unversioned"
+            question = query or intent.raw_text
+            passages = get_pdf_retriever().search(
+                file_id, version, load_text, question, settings.pdf_retrieval_top_k
+            )
+            if not passages:
+                return CallToolResult(
+                    content=[TextContent(
+                        type="text",
+                        text=f"Could not find anything about '{question}' in '{target_file.name}'.",
+                        uri=None,
+                        mimeType=None
+                    )],
+                    isError=True
+                )
+            
+            return CallToolResult(
+                content=[TextContent(
+                    type="text",
+                    text=passage.text,
+                    uri=f"{target_file.uri}#chunk={passage.index}",
+                    mimeType="text/plain"
+                ) for passage in passages],
+                isError=False
+            )
         except Exception as e:
             logger.error(f"Error querying PDF: {str(e)}")
             return CallToolResult(
@@ -677,6 +731,7 @@ class PromptHandler:
         """Handle email sending requests."""
         try:
             from app.services.gmail_service import send_email
+            from app.services.outbox import get_outbox
             to = intent.entities.get("to")
             subject = intent.entities.get("subject")
             body = intent.entities.get("body")
@@ -692,6 +747,19 @@ class PromptHandler:
                     isError=True
                 )
             
+            # Queue for background delivery so the chat doesn't wait on Gmail
+            if settings.outbox_enabled:
+                message_id = get_outbox().enqueue(to=[to], subject=subject, body=body)
+                return CallToolResult(
+                    content=[TextContent(
+                        type="text",
+                        text=f"Email to {to} queued for delivery (id {message_id}).",
+                        uri=None,
+                        mimeType=None
+                    )],
+                    isError=False
+                )
+            
             result = send_email(to=[to], subject=subject, body=body)
             if isinstance(result, dict) and result.get("success"):
                 return CallToolResult(
@@ -729,8 +797,8 @@ class PromptHandler:
         """Handle weather information requests."""
         try:
             from app.services.weather_service import get_weather_info
-            location = intent.entities.get("location")
-            if not location:
+            locations = intent.entities.get("locations")
+            if not locations:
                 return CallToolResult(
                     content=[TextContent(
                         type="text",
@@ -741,7 +809,8 @@ class PromptHandler:
                     isError=True
                 )
             
-            return get_weather_info(location)
+            # Several cities are answered together with one forecast request
+            return get_weather_info(locations if len(locations) > 1 else locations[0])
         except Exception as e:
             logger.error(f"Error getting weather: {str(e)}")
             return CallToolResult(
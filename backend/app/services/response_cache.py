@@ -0,0 +1,147 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+TRAILING_PUNCTUATION_PATTERN = re.compile(r'[\s?!.]+$')
+
+# Intents whose results are read-only Drive data; kept until invalidated
+DRIVE_INTENTS = ("list_folders", "list_files", "search_files", "read_file", "show_image", "query_pdf")
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    normalized = WHITESPACE_PATTERN.sub(' ', prompt.strip().lower())
+    return TRAILING_PUNCTUATION_PATTERN.sub('', normalized)
+
+@dataclass
+class CacheEntry:
+    value: str
+    size: int
+    expires_at: Optional[float]
+
+class ResponseCache:
+    """
+    LRU cache of final response text keyed on (intent type, scope, normalized
+    prompt). The scope separates responses that depend on more than the
+    prompt, such as which model file generated them.
+
+    Each intent type has its own TTL: None keeps entries until they are
+    invalidated or evicted, 0 disables caching for that intent. The total
+    size of cached values is bounded by max_bytes.
+    """
+
+    def __init__(self, max_bytes: int, ttls: Dict[str, Optional[float]]):
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        self._entries: "OrderedDict[Tuple[str, str, str], CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+        self._evictions = 0
+        self._expirations = 0
+
+    def _ttl(self, intent_type: str) -> Optional[float]:
+        return self.ttls.get(intent_type, 0)
+
+    def enabled_for(self, intent_type: str) -> bool:
+        ttl = self._ttl(intent_type)
+        return ttl is None or ttl > 0
+
+    def _remove(self, key: Tuple[str, str, str]):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def get(self, prompt: str, intent_type: str, scope: str = "") -> Optional[str]:
+        """Return the cached response, or None on a miss."""
+        if not self.enabled_for(intent_type):
+            return None
+        key = (intent_type, scope, normalize_prompt(prompt))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                self._misses[intent_type] = self._misses.get(intent_type, 0) + 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits[intent_type] = self._hits.get(intent_type, 0) + 1
+            return entry.value
+
+    def put(self, prompt: str, intent_type: str, value: str, scope: str = ""):
+        """Cache a response, evicting least recently used entries to fit."""
+        if not self.enabled_for(intent_type):
+            return
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        ttl = self._ttl(intent_type)
+        key = (intent_type, scope, normalize_prompt(prompt))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and self._bytes + size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+            self._entries[key] = CacheEntry(
+                value=value,
+                size=size,
+                expires_at=time.monotonic() + ttl if ttl is not None else None,
+            )
+            self._bytes += size
+
+    def invalidate(self, intent_types: Optional[Iterable[str]] = None) -> int:
+        """Drop entries for the given intent types (all entries if None)."""
+        with self._lock:
+            if intent_types is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                wanted = set(intent_types)
+                keys = [key for key in self._entries if key[0] in wanted]
+                for key in keys:
+                    self._remove(key)
+                removed = len(keys)
+        if removed:
+            logger.info(f"Invalidated {removed} cached responses")
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = sum(self._hits.values())
+            misses = sum(self._misses.values())
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "by_intent": {
+                    intent: {"hits": self._hits.get(intent, 0), "misses": self._misses.get(intent, 0)}
+                    for intent in sorted(set(self._hits) | set(self._misses))
+                },
+            }
+
+response_cache = ResponseCache(
+    max_bytes=settings.response_cache_max_bytes,
+    ttls={
+        "get_weather": settings.response_cache_weather_ttl,
+        **{intent: settings.response_cache_drive_ttl for intent in DRIVE_INTENTS},
+        "chat": settings.response_cache_chat_ttl,
+        # Sending email has side effects and is never cached
+        "send_email": 0,
+    },
+)
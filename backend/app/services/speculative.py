@@ -0,0 +1,78 @@
+import logging
+import os
+from typing import Any, Optional
+import numpy as np
+import numpy.typing as npt
+from llama_cpp import Llama
+from llama_cpp.llama_speculative import LlamaDraftModel, LlamaPromptLookupDecoding
+from ..core.config import settings
+from ..core.runtime_profile import RuntimeProfile
+
+logger = logging.getLogger(__name__)
+
+SPECULATIVE_MODES = ("off", "prompt_lookup", "draft")
+
+class LlamaDraft(LlamaDraftModel):
+    """
+    Drafts tokens greedily with a small GGUF model.
+
+    The draft model must share the main model's vocabulary (for Llama 2 chat,
+    e.g. a TinyLlama or a 1B Llama 2 derivative). Its KV cache follows the
+    main model's token sequence, so each call only evaluates the tokens
+    accepted since the last one plus the tokens it drafts.
+    """
+
+    def __init__(self, model_path: str, num_pred_tokens: int, **llama_kwargs: Any):
+        self.model = Llama(model_path=model_path, **llama_kwargs)
+        self.num_pred_tokens = num_pred_tokens
+
+    def __call__(self, input_ids: npt.NDArray[np.intc], /, **kwargs: Any) -> npt.NDArray[np.intc]:
+        limit = min(self.num_pred_tokens, self.model.n_ctx() - len(input_ids))
+        draft = []
+        if limit > 0:
+            eos = self.model.token_eos()
+            # generate() reuses the cached prefix shared with input_ids
+            for token in self.model.generate(input_ids.tolist(), top_k=1, temp=0.0, repeat_penalty=1.0):
+                if token == eos:
+                    break
+                draft.append(token)
+                if len(draft) == limit:
+                    break
+        return np.array(draft, dtype=np.intc)
+
+def draft_model_bytes() -> int:
+    """Size of the draft model file counted against the model pool budget."""
+    if settings.llm_speculative == "draft" and os.path.exists(settings.llm_draft_model_path):
+        return os.path.getsize(settings.llm_draft_model_path)
+    return 0
+
+def make_draft_model(profile: RuntimeProfile) -> Optional[LlamaDraftModel]:
+    """
+    The drafter for speculative decoding, or None when it is off.
+
+    The main model checks all drafted tokens in one batched forward pass and
+    keeps those matching what it would have sampled itself, so the output is
+    unchanged and every accepted token saves a sequential decode step.
+    """
+    mode = settings.llm_speculative
+    if mode not in SPECULATIVE_MODES:
+        raise ValueError(f"Unknown speculative decoding mode {settings.llm_speculative}; use one of {', '.join(SPECULATIVE_MODES)}")
+    if mode == "prompt_lookup":
+        logger.info(f"Speculative decoding with prompt lookup, {settings.llm_draft_tokens} tokens ahead")
+        return LlamaPromptLookupDecoding(
+            max_ngram_size=settings.llm_draft_ngram_size,
+            num_pred_tokens=settings.llm_draft_tokens
+        )
+    if mode == "draft":
+        if not os.path.exists(settings.llm_draft_model_path):
+            raise FileNotFoundError(f"Draft model not found at {settings.llm_draft_model_path}")
+        logger.info(
+            f"Speculative decoding with draft model {settings.llm_draft_model_path}, "
+            f"{settings.llm_draft_tokens} tokens ahead"
+        )
+        # Drafting runs between the main model's steps, so it can use the same threads
+        kwargs = profile.llama_kwargs()
+        kwargs.pop("type_k", None)
+        kwargs.pop("type_v", None)
+        return LlamaDraft(settings.llm_draft_model_path, settings.llm_draft_tokens, **kwargs, verbose=False)
+    return None
@@ -0,0 +1,111 @@
+import hashlib
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class TextCache:
+    """
+    On-disk cache of text extracted from Drive files.
+
+    Entries are keyed by file id and version (the file's modifiedTime), so a
+    new revision is a cache miss and replaces the old entry. Total size is
+    bounded by max_bytes; the least recently read entries are evicted first,
+    using file modification times as the recency record.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        # path -> (size, last access) for everything on disk
+        self._entries: Dict[str, Tuple[int, float]] = {}
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if name.endswith(".txt") and os.path.isfile(path):
+                stat = os.stat(path)
+                self._entries[path] = (stat.st_size, stat.st_mtime)
+        self._bytes = sum(size for size, _ in self._entries.values())
+
+    def _file_prefix(self, file_id: str) -> str:
+        # Hashed so ids containing "-" or characters unsafe in file names
+        # can't share a prefix with another file's entries
+        return hashlib.sha1(file_id.encode("utf-8")).hexdigest()[:16] + "-"
+
+    def _path(self, file_id: str, version: str) -> str:
+        version_hash = hashlib.sha1(version.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{self._file_prefix(file_id)}{version_hash}.txt")
+
+    def _remove(self, path: str):
+        size, _ = self._entries.pop(path)
+        self._bytes -= size
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def get(self, file_id: str, version: Optional[str]) -> Optional[str]:
+        """Return cached text for this version of the file, or None."""
+        if not version:
+            return None
+        path = self._path(file_id, version)
+        with self._lock:
+            if path not in self._entries:
+                return None
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    text = f.read()
+            except OSError:
+                self._remove(path)
+                return None
+            # Mark as recently used
+            os.utime(path)
+            self._entries[path] = (self._entries[path][0], os.path.getmtime(path))
+        return text
+
+    def put(self, file_id: str, version: Optional[str], text: str):
+        """Store text for this version, replacing older versions of the file."""
+        if not version:
+            return
+        data = text.encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(file_id, version)
+        prefix = os.path.join(self.cache_dir, self._file_prefix(file_id))
+        with self._lock:
+            for stale in [p for p in self._entries if p.startswith(prefix)]:
+                self._remove(stale)
+            # Evict least recently used entries until the new one fits
+            for old_path, _ in sorted(self._entries.items(), key=lambda item: item[1][1]):
+                if self._bytes + len(data) <= self.max_bytes:
+                    break
+                self._remove(old_path)
+            # Write to a temp file first so readers never see a partial entry
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._entries[path] = (len(data), os.path.getmtime(path))
+            self._bytes += len(data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+_cache: Optional[TextCache] = None
+_cache_lock = threading.Lock()
+
+def get_text_cache() -> TextCache:
+    """Get the shared extracted-text cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            cache_dir = settings.pdf_text_cache_dir or os.path.join(
+                os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "pdf_text"
+            )
+            _cache = TextCache(cache_dir, settings.pdf_text_cache_max_bytes)
+        return _cache
@@ -1,8 +1,19 @@
+import asyncio
+import csv
 import logging
-import requests
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from mcp.server.fastmcp import FastMCP
 from mcp.types import TextContent, CallToolResult
-from typing import Union, Dict, Any
+from typing import Union, Dict, Any, List, Optional, Tuple
+from ..core.config import settings
+from ..core.http_client import http_client
+from ..core.singleflight import AsyncSingleFlight
 
 logger = logging.getLogger(__name__)
 mcp = FastMCP("Weather Service")
@@ -41,45 +52,220 @@ WEATHER_CODES = {
 
 GEOCODE_URL = "https://nominatim.openstreetmap.org/search"
 WEATHER_URL = "https://api.open-meteo.com/v1/forecast"
+GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), "gazetteer.csv")
+NOMINATIM_MIN_INTERVAL = 1.0
+NOT_FOUND_TTL_SECONDS = 3600.0
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
 
 
-def geocode_city(city: str) -> Union[Dict[str, float], None]:
-    try:
-        params = {
-            "q": city,
-            "format": "json",
-            "limit": 1
+def normalize_place(name: str) -> str:
+    """Case-fold, drop punctuation and collapse whitespace so spellings share a cache key."""
+    return " ".join(PUNCTUATION_PATTERN.sub(" ", name.casefold()).split())
+
+
+def _load_gazetteer() -> Dict[str, Dict[str, float]]:
+    with open(GAZETTEER_PATH, "r", encoding="utf-8", newline="") as f:
+        return {
+            normalize_place(row["name"]): {"lat": float(row["lat"]), "lon": float(row["lon"])}
+            for row in csv.DictReader(f)
         }
-        resp = requests.get(GEOCODE_URL, params=params, headers={"User-Agent": "MCP-Weather-Agent"}, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        if data and len(data) > 0:
-            return {
-                "lat": float(data[0]["lat"]),
-                "lon": float(data[0]["lon"])
-            }
-        return None
+
+
+class GeocodeCache:
+    """
+    Persistent city name -> coordinates cache.
+
+    Major cities are answered from the bundled gazetteer. Anything else is
+    looked up once through Nominatim and stored in SQLite, since coordinates
+    never change. Places Nominatim doesn't know are remembered in memory for
+    a while so typos don't keep hitting it.
+    """
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode (place TEXT PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self._gazetteer = _load_gazetteer()
+        self._not_found: Dict[str, float] = {}
+
+    def get(self, place: str) -> Tuple[bool, Optional[Dict[str, float]]]:
+        """Return (known, coordinates); known with None coordinates means recently not found."""
+        if place in self._gazetteer:
+            return True, self._gazetteer[place]
+        with self._lock:
+            row = self._conn.execute("SELECT lat, lon FROM geocode WHERE place = ?", (place,)).fetchone()
+            if row:
+                return True, {"lat": row[0], "lon": row[1]}
+            if self._not_found.get(place, 0) > time.monotonic():
+                return True, None
+        return False, None
+
+    def put(self, place: str, coords: Optional[Dict[str, float]]):
+        with self._lock:
+            if coords is None:
+                self._not_found[place] = time.monotonic() + NOT_FOUND_TTL_SECONDS
+                return
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO geocode (place, lat, lon) VALUES (?, ?, ?)",
+                    (place, coords["lat"], coords["lon"])
+                )
+
+
+class ForecastCache:
+    """Short-lived current-weather cache keyed on rounded coordinates."""
+
+    def __init__(self, ttl: float, precision: int, max_entries: int = 1024):
+        self.ttl = ttl
+        self.precision = precision
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[float, float], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, lat: float, lon: float) -> Tuple[float, float]:
+        return round(lat, self.precision), round(lon, self.precision)
+
+    def get(self, key: Tuple[float, float]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Tuple[float, float], weather: Dict[str, Any]):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, weather)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_geocode_cache: Optional[GeocodeCache] = None
+_geocode_cache_lock = threading.Lock()
+
+
+def get_geocode_cache() -> GeocodeCache:
+    """Get the shared geocode cache."""
+    global _geocode_cache
+    with _geocode_cache_lock:
+        if _geocode_cache is None:
+            db_path = settings.weather_geocode_cache_path or os.path.join(
+                os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "geocode.db"
+            )
+            _geocode_cache = GeocodeCache(db_path)
+        return _geocode_cache
+
+
+forecast_cache = ForecastCache(settings.weather_forecast_ttl, settings.weather_coordinate_precision)
+# All weather coroutines run on the shared HTTP client's loop, so one
+# coalescing table and one Nominatim lock serve every request
+_inflight = AsyncSingleFlight()
+_nominatim_lock: Optional[asyncio.Lock] = None
+_nominatim_last_call = 0.0
+
+
+async def _fetch_geocode(city: str) -> Optional[Dict[str, float]]:
+    global _nominatim_lock, _nominatim_last_call
+    params = {
+        "q": city,
+        "format": "json",
+        "limit": 1
+    }
+    # Nominatim's usage policy allows about one request per second
+    if _nominatim_lock is None:
+        _nominatim_lock = asyncio.Lock()
+    async with _nominatim_lock:
+        wait = NOMINATIM_MIN_INTERVAL - (time.monotonic() - _nominatim_last_call)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            resp = await http_client.get(
+                GEOCODE_URL, params=params, headers={"User-Agent": "MCP-Weather-Agent"},
+                timeout=settings.weather_timeout_seconds
+            )
+        finally:
+            _nominatim_last_call = time.monotonic()
+    resp.raise_for_status()
+    data = resp.json()
+    if data and len(data) > 0:
+        return {
+            "lat": float(data[0]["lat"]),
+            "lon": float(data[0]["lon"])
+        }
+    return None
+
+
+async def geocode_city_async(city: str) -> Union[Dict[str, float], None]:
+    try:
+        place = normalize_place(city)
+        cache = get_geocode_cache()
+        known, coords = cache.get(place)
+        if known:
+            return coords
+
+        async def lookup():
+            coords = await _fetch_geocode(city)
+            cache.put(place, coords)
+            return coords
+
+        return await _inflight.do(("geocode", place), lookup)
     except Exception as e:
         logger.error(f"Geocoding error: {e}")
         return None
 
 
-def get_weather(lat: float, lon: float) -> Union[Dict[str, Any], None]:
+async def _fetch_current_weather(coords: List[Tuple[float, float]]) -> List[Optional[Dict[str, Any]]]:
+    """Current weather for several coordinates in one request; Open-Meteo takes comma-separated lists."""
+    params = {
+        "latitude": ",".join(str(lat) for lat, _ in coords),
+        "longitude": ",".join(str(lon) for _, lon in coords),
+        "current_weather": "true"
+    }
+    resp = await http_client.get(WEATHER_URL, params=params, timeout=settings.weather_timeout_seconds)
+    resp.raise_for_status()
+    data = resp.json()
+    # One location comes back as an object, several as a list in request order
+    results = data if isinstance(data, list) else [data]
+    return [result.get("current_weather") for result in results]
+
+
+async def get_weather_many_async(coords: List[Tuple[float, float]]) -> List[Optional[Dict[str, Any]]]:
+    """Current weather for each coordinate, with a single upstream request for all cache misses."""
     try:
-        params = {
-            "latitude": lat,
-            "longitude": lon,
-            "current_weather": True
-        }
-        resp = requests.get(WEATHER_URL, params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        if "current_weather" in data:
-            return data["current_weather"]
-        return None
+        keys = [forecast_cache.key(lat, lon) for lat, lon in coords]
+        found = {key: forecast_cache.get(key) for key in keys}
+        missing = tuple(sorted(key for key, weather in found.items() if weather is None))
+        if missing:
+            async def fetch():
+                weathers = await _fetch_current_weather(list(missing))
+                for key, weather in zip(missing, weathers):
+                    if weather:
+                        forecast_cache.put(key, weather)
+                return dict(zip(missing, weathers))
+
+            found.update(await _inflight.do(("forecast", missing), fetch))
+        return [found.get(key) for key in keys]
     except Exception as e:
         logger.error(f"Weather API error: {e}")
-        return None
+        return [None] * len(coords)
+
+
+async def get_weather_async(lat: float, lon: float) -> Union[Dict[str, Any], None]:
+    return (await get_weather_many_async([(lat, lon)]))[0]
+
+
+def geocode_city(city: str) -> Union[Dict[str, float], None]:
+    return http_client.run(geocode_city_async(city), settings.weather_timeout_seconds)
+
+
+def get_weather(lat: float, lon: float) -> Union[Dict[str, Any], None]:
+    return http_client.run(get_weather_async(lat, lon), settings.weather_timeout_seconds)
 
 
 def format_weather_response(weather: Dict[str, Any], location: str = "") -> str:
@@ -91,21 +277,55 @@ def format_weather_response(weather: Dict[str, Any], location: str = "") -> str:
     return f"Current weather{loc_str}: {desc}, {temp}°C, wind {wind} km/h."
 
 
-@mcp.tool()
-def get_weather_info(location: Union[str, tuple]) -> CallToolResult:
+async def get_weather_for_locations_async(locations: List[str]) -> CallToolResult:
+    """
+    Get weather for several city names at once.
+
+    Cities are geocoded concurrently (cache misses still queue for
+    Nominatim's rate limit) and all forecasts come from one Open-Meteo
+    request. The answer has one line per city.
+    """
+    unique: Dict[str, str] = {}
+    for location in locations:
+        unique.setdefault(normalize_place(location), location)
+    locations = list(unique.values())[:settings.weather_max_locations]
+
+    geos = await asyncio.gather(*(geocode_city_async(location) for location in locations))
+    found = [(location, geo) for location, geo in zip(locations, geos) if geo]
+    weathers = await get_weather_many_async([(geo["lat"], geo["lon"]) for _, geo in found]) if found else []
+    weather_by_location = {location: weather for (location, _), weather in zip(found, weathers)}
+
+    lines = []
+    for location in locations:
+        if location not in weather_by_location:
+            lines.append(f"Could not find location '{location}'.")
+        elif weather_by_location[location] is None:
+            lines.append(f"Could not fetch weather for '{location}'.")
+        else:
+            lines.append(format_weather_response(weather_by_location[location], location.title()))
+    return CallToolResult(
+        content=[TextContent(type="text", text="\n".join(lines), uri=None, mimeType=None)],
+        isError=not any(weather_by_location.values())
+    )
+
+
+async def get_weather_info_async(location: Union[str, tuple, List[str]]) -> CallToolResult:
     """
     Get weather information for a location.
     
     Args:
-        location: Either a city name (str) or a tuple of (latitude, longitude)
+        location: A city name (str), a tuple of (latitude, longitude) or a
+            list of city names
         
     Returns:
         CallToolResult containing the weather information
     """
     try:
-        if isinstance(location, tuple) and len(location) == 2:
+        if isinstance(location, list):
+            return await get_weather_for_locations_async(location)
+        elif isinstance(location, tuple) and len(location) == 2:
             lat, lon = location
-            weather = get_weather(lat, lon)
+            weather = await get_weather_async(lat, lon)
             if weather:
                 message = format_weather_response(weather, f"{lat},{lon}")
                 return CallToolResult(
@@ -118,13 +338,13 @@ def get_weather_info(location: Union[str, tuple]) -> CallToolResult:
                     isError=True
                 )
         elif isinstance(location, str):
-            geo = geocode_city(location)
+            geo = await geocode_city_async(location)
             if not geo:
                 return CallToolResult(
                     content=[TextContent(type="text", text=f"Could not find location '{location}'.", uri=None, mimeType=None)],
                     isError=True
                 )
-            weather = get_weather(geo["lat"], geo["lon"])
+            weather = await get_weather_async(geo["lat"], geo["lon"])
             if weather:
                 message = format_weather_response(weather, location.title())
                 return CallToolResult(
@@ -148,5 +368,24 @@ def get_weather_info(location: Union[str, tuple]) -> CallToolResult:
             isError=True
         )
 
+@mcp.tool()
+def get_weather_info(location: Union[str, tuple, List[str]]) -> CallToolResult:
+    """
+    Get weather information for a location.
+    
+    Blocking wrapper around get_weather_info_async for the I/O pool; the
+    whole lookup must finish within WEATHER_TIMEOUT_SECONDS.
+    """
+    try:
+        return http_client.run(
+            asyncio.wait_for(get_weather_info_async(location), settings.weather_timeout_seconds)
+        )
+    except (asyncio.TimeoutError, FutureTimeoutError):
+        logger.error(f"Weather lookup for {location} timed out")
+        return CallToolResult(
+            content=[TextContent(type="text", text="The weather service took too long to respond.", uri=None, mimeType=None)],
+            isError=True
+        )
+
 if __name__ == "__main__":
     mcp.run()
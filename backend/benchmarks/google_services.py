@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark the per-call overhead of getting an authenticated Google API client.
+
+Compares building a fresh client on every call (read token.json, parse the
+credentials, build from the discovery document) with the shared
+ServiceRegistry. No API requests are made. Needs a valid token.json.
+
+Run from the backend directory:
+    python -m benchmarks.google_services
+"""
+
+import argparse
+import os
+import statistics
+import time
+from app.services.auth_service import AuthService, ServiceRegistry
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def time_calls(get_client, iterations: int) -> list:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        get_client()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def report(label: str, timings: list):
+    print(f"{label:<22} mean {statistics.mean(timings) * 1000:8.3f} ms   "
+          f"median {statistics.median(timings) * 1000:8.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    auth_service = AuthService(
+        credentials_path=os.path.join(BASE_DIR, "credentials.json"),
+        token_path=os.path.join(BASE_DIR, "token.json")
+    )
+    registry = ServiceRegistry(auth_service)
+
+    for api, version, build_fresh in [
+        ("drive", "v3", auth_service.get_drive_service),
+        ("gmail", "v1", auth_service.get_gmail_service),
+    ]:
+        print(f"\n{api} {version}, {args.iterations} calls")
+        report("fresh client per call", time_calls(build_fresh, args.iterations))
+        registry.get_service(api, version)  # First build is not part of the steady state
+        report("service registry", time_calls(lambda: registry.get_service(api, version), args.iterations))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark PDF text extraction speed-up with the number of worker processes.
+
+Writes a corpus of synthetic text-heavy PDFs to a temp directory, then times
+in-process extraction against the process pool at 2..N workers. The output
+of every run is checked against the sequential text.
+
+Run from the backend directory:
+    python -m benchmarks.pdf_extraction --documents 4 --pages 200
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from PyPDF2 import PdfReader
+from app.services.pdf_extraction import extract_text_parallel, extract_text_sequential
+
+WORDS = "drive index inference cache token stream weather email folder document page".split()
+
+def _page_stream(page_number: int, lines: int) -> bytes:
+    commands = ["BT", "/F1 9 Tf", "40 800 Td", "11 TL"]
+    for line in range(lines):
+        words = " ".join(WORDS[(page_number + line + i) % len(WORDS)] for i in range(12))
+        commands.append(f"(Page {page_number + 1} line {line + 1}: {words}) '")
+    commands.append("ET")
+    return "\n".join(commands).encode("latin-1")
+
+def write_pdf(path: str, pages: int, lines_per_page: int):
+    """Write a minimal uncompressed PDF with one font and pages of plain text."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Page tree, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page_number in range(pages):
+        content = _page_stream(page_number, lines_per_page)
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects))
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref_offset = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset))
+
+def time_corpus(extract, paths: list, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for path in paths:
+            extract(path)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=60, help="Text lines per page")
+    parser.add_argument("--max-workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--page-timeout", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        paths = []
+        for document in range(args.documents):
+            path = os.path.join(corpus_dir, f"synthetic-{document}.pdf")
+            write_pdf(path, args.pages, args.lines)
+            paths.append(path)
+        size_mb = sum(os.path.getsize(path) for path in paths) / (1024 * 1024)
+        print(f"{args.documents} PDFs x {args.pages} pages ({size_mb:.1f} MB), "
+              f"{multiprocessing.cpu_count()} CPU cores")
+
+        expected = {path: extract_text_sequential(PdfReader(path)) for path in paths}
+        baseline = time_corpus(lambda path: extract_text_sequential(PdfReader(path)), paths, args.repeats)
+        print(f"{'sequential':<12} {baseline:8.2f} s   speed-up  1.00x")
+
+        for workers in range(2, args.max_workers + 1):
+            # A pool per worker count, started before timing so spawn cost isn't counted
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                list(pool.map(abs, range(workers)))
+
+                def extract(path):
+                    text = extract_text_parallel(path, args.pages, workers, args.page_timeout, pool=pool)
+                    assert text == expected[path], f"Parallel text differs for {path}"
+
+                elapsed = time_corpus(extract, paths, args.repeats)
+            print(f"{f'{workers} workers':<12} {elapsed:8.2f} s   speed-up {baseline / elapsed:5.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark prompt-evaluation time with and without the system prompt prefix cache.
+
+Run from the backend directory:
+    MODEL_PATH=models/llama-2-7b-chat.gguf python -m benchmarks.prefix_cache
+"""
+
+import argparse
+import statistics
+import time
+from app.core.config import settings
+from app.services.llm_service import LLMService, LoadedModel
+
+PROMPTS = [
+    "Hi there!",
+    "Can you explain what a context window is?",
+    "Give me three tips for writing clearer emails.",
+    "What is the capital of Australia?",
+    "Summarise the plot of Hamlet in two sentences.",
+]
+
+def time_prompt_eval(service: LLMService, model: LoadedModel, prompt: str, use_cache: bool) -> float:
+    """Time until the first generated token, which is dominated by prompt evaluation."""
+    if use_cache:
+        service._restore_prefix(model)
+    else:
+        model.llama.reset()
+    start = time.perf_counter()
+    for _ in model.llama(service._format_prompt(prompt), max_tokens=1, stream=True):
+        break
+    return time.perf_counter() - start
+
+def run(service: LLMService, model: LoadedModel, use_cache: bool, rounds: int) -> list:
+    timings = []
+    for _ in range(rounds):
+        for prompt in PROMPTS:
+            timings.append(time_prompt_eval(service, model, prompt, use_cache))
+    return timings
+
+def report(label: str, timings: list):
+    print(f"{label:<16} mean {statistics.mean(timings) * 1000:8.1f} ms   "
+          f"median {statistics.median(timings) * 1000:8.1f} ms   "
+          f"max {max(timings) * 1000:8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=3, help="Times to run each prompt")
+    args = parser.parse_args()
+
+    service = LLMService()
+    model = service.load_model("default", settings.model_path)
+    if model.prefix_state is None:
+        service.warm_prefix_cache(model)
+    print(f"Prefix: {len(model.prefix_tokens)} tokens, {len(PROMPTS) * args.rounds} prompts per mode\n")
+
+    without = run(service, model, use_cache=False, rounds=args.rounds)
+    with_cache = run(service, model, use_cache=True, rounds=args.rounds)
+
+    report("no prefix cache", without)
+    report("prefix cache", with_cache)
+    print(f"\nSpeed-up (median): {statistics.median(without) / statistics.median(with_cache):.1f}x")
+
+if __name__ == "__main__":
+    main()
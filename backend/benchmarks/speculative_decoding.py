@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Compare chat decoding with and without speculative decoding.
+
+The default model is loaded once as the chat fallback does now and once
+with the drafter from --mode, then both generate --tokens tokens for each
+prompt. The report shows end-to-end tokens/s (prompt evaluation included)
+and the share of drafted tokens the main model accepted. At the default
+temperature of 0 both paths must produce the same tokens, which is checked
+too.
+
+Run from the backend directory:
+    MODEL_PATH=models/llama-2-7b-chat.gguf python -m benchmarks.speculative_decoding --mode prompt_lookup
+    MODEL_PATH=models/llama-2-7b-chat.gguf python -m benchmarks.speculative_decoding \\
+        --mode draft --draft-model models/tinyllama-1.1b-chat.Q4_K_M.gguf --draft-tokens 6
+"""
+
+import argparse
+import time
+from typing import Any, List, Tuple
+import numpy as np
+import numpy.typing as npt
+from llama_cpp.llama_speculative import LlamaDraftModel
+from app.core.config import settings
+from app.services.llm_service import GroundedPrompt, LLMService, LoadedModel
+
+CHAT_PROMPTS = [
+    "Can you explain what a context window is?",
+    "Give me three tips for writing clearer emails.",
+    "Summarise the plot of Hamlet in two sentences.",
+]
+
+# Document answers tend to copy the excerpts, which is where prompt lookup helps
+PDF_PROMPT = GroundedPrompt(
+    question="What does the warranty cover and for how long?",
+    passages=[
+        "The limited warranty covers defects in materials and workmanship for a period of "
+        "two years from the original date of purchase. The warranty does not cover damage "
+        "caused by accidents, misuse, or unauthorised repairs.",
+        "To make a warranty claim, contact customer support with your proof of purchase. "
+        "Repaired or replacement products are covered for the remainder of the original "
+        "warranty period or ninety days, whichever is longer.",
+    ],
+)
+
+class CountingDraft(LlamaDraftModel):
+    """Passes drafts through, remembering where each one was proposed."""
+
+    def __init__(self, inner: LlamaDraftModel):
+        self.inner = inner
+        self.proposals: List[Tuple[int, List[int]]] = []
+
+    def __call__(self, input_ids: npt.NDArray[np.intc], /, **kwargs: Any) -> npt.NDArray[np.intc]:
+        draft = self.inner(input_ids, **kwargs)
+        self.proposals.append((len(input_ids), draft.tolist()))
+        return draft
+
+    def acceptance(self, sequence: List[int]) -> Tuple[int, int]:
+        """Drafted and accepted token counts, judged against the final token sequence."""
+        drafted = accepted = 0
+        for position, draft in self.proposals:
+            draft = draft[:max(0, len(sequence) - position)]
+            drafted += len(draft)
+            for offset, token in enumerate(draft):
+                if sequence[position + offset] != token:
+                    break
+                accepted += 1
+        self.proposals.clear()
+        return drafted, accepted
+
+def generate(model: LoadedModel, text: str, tokens: int, temperature: float) -> Tuple[List[int], List[int], float]:
+    """Prompt tokens, generated tokens and seconds taken, from a fresh KV cache."""
+    llama = model.llama
+    prompt = llama.tokenize(text.encode("utf-8"))
+    llama.reset()
+    generated = []
+    start = time.perf_counter()
+    for token in llama.generate(
+        prompt, temp=temperature, top_p=LLMService.GENERATION_PARAMS["top_p"],
+        repeat_penalty=LLMService.GENERATION_PARAMS["repeat_penalty"]
+    ):
+        if token == llama.token_eos():
+            break
+        generated.append(token)
+        if len(generated) == tokens:
+            break
+    return prompt, generated, time.perf_counter() - start
+
+def run(service: LLMService, model: LoadedModel, prompts: list, tokens: int, temperature: float) -> dict:
+    draft = model.llama.draft_model
+    results = {"tokens": 0, "seconds": 0.0, "drafted": 0, "accepted": 0, "outputs": []}
+    for prompt in prompts:
+        text = service.build_grounded_prompt(prompt.question, prompt.passages, model) \
+            if isinstance(prompt, GroundedPrompt) else prompt
+        prompt_tokens, generated, seconds = generate(model, service._format_prompt(text), tokens, temperature)
+        results["tokens"] += len(generated)
+        results["seconds"] += seconds
+        results["outputs"].append(generated)
+        if isinstance(draft, CountingDraft):
+            drafted, accepted = draft.acceptance(prompt_tokens + generated)
+            results["drafted"] += drafted
+            results["accepted"] += accepted
+    return results
+
+def report(label: str, results: dict):
+    line = f"{label:<14} {results['tokens']:5d} tokens in {results['seconds']:7.2f}s   " \
+           f"{results['tokens'] / results['seconds']:6.2f} tok/s"
+    if results["drafted"]:
+        line += f"   accepted {results['accepted']}/{results['drafted']} drafted " \
+                f"({results['accepted'] / results['drafted']:.0%})"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["prompt_lookup", "draft"], default="prompt_lookup",
+                        help="Drafter to compare against plain decoding")
+    parser.add_argument("--draft-model", default=settings.llm_draft_model_path,
+                        help="GGUF draft model for --mode draft")
+    parser.add_argument("--draft-tokens", type=int, default=settings.llm_draft_tokens,
+                        help="Tokens drafted ahead per step")
+    parser.add_argument("--tokens", type=int, default=128, help="Tokens to generate per prompt")
+    parser.add_argument("--temperature", type=float, default=0.0, help="Sampling temperature; 0 is greedy")
+    args = parser.parse_args()
+
+    settings.llm_speculative = args.mode
+    settings.llm_draft_model_path = args.draft_model
+    settings.llm_draft_tokens = args.draft_tokens
+    # Every prompt starts from an empty KV cache on both paths
+    settings.prefix_cache_enabled = False
+    service = LLMService()
+    prompts = CHAT_PROMPTS + [PDF_PROMPT]
+    print(f"{len(prompts)} prompts, {args.tokens} tokens each, {args.mode} drafting "
+          f"{args.draft_tokens} tokens ahead\n")
+
+    model = service.load_model("default", settings.model_path)
+    baseline = run(service, model, prompts, args.tokens, args.temperature)
+    del model
+
+    model = service.load_model("default", settings.model_path, speculative=True)
+    model.llama.draft_model = CountingDraft(model.llama.draft_model)
+    speculative = run(service, model, prompts, args.tokens, args.temperature)
+
+    report("plain", baseline)
+    report(args.mode, speculative)
+    speedup = (speculative["tokens"] / speculative["seconds"]) / (baseline["tokens"] / baseline["seconds"])
+    print(f"\nSpeedup: {speedup:.2f}x")
+    if args.temperature == 0:
+        same = baseline["outputs"] == speculative["outputs"]
+        print(f"Greedy outputs identical: {'yes' if same else 'no'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Find the fastest llama.cpp thread counts on this host and save them as the runtime profile.
+
+For each candidate thread count the model is loaded with the rest of the
+current runtime profile, then a fixed prompt is evaluated (prompt tokens/s,
+which picks n_threads_batch) and --tokens tokens are generated greedily
+(decode tokens/s, which picks n_threads). Candidates run from 1 up to the
+logical CPUs within the affinity mask and cgroup quota. The winners are
+written to the profile file that LLMService reads at load time; explicit
+LLM_THREADS / LLM_BATCH_THREADS settings still take precedence over it.
+
+Run from the backend directory:
+    MODEL_PATH=models/llama-2-7b-chat.gguf python -m benchmarks.tune_runtime --tokens 64
+"""
+
+import argparse
+import os
+import platform
+import time
+from datetime import datetime, timezone
+from llama_cpp import Llama
+from app.core.runtime_profile import cpu_budget, get_runtime_profile, profile_path, save_tuned_profile
+
+PROMPT = (
+    "[INST] You are a helpful assistant. Summarise the main trade-offs between "
+    "memory bandwidth and compute when running quantised language models on a CPU, "
+    "and explain why more threads do not always make generation faster. [/INST]"
+)
+
+def candidate_threads(logical: int, physical: int) -> list:
+    steps = {n for n in (1, 2, 4, 6, 8, 12, 16, 24, 32, 48, 64) if n <= logical}
+    return sorted(steps | {physical, logical})
+
+def measure(model_path: str, threads: int, tokens: int, rounds: int) -> dict:
+    """Best prompt and decode tokens/s over rounds with threads for both phases."""
+    kwargs = get_runtime_profile().llama_kwargs()
+    kwargs.pop("type_k", None)
+    kwargs.pop("type_v", None)
+    kwargs.update(n_threads=threads, n_threads_batch=threads, verbose=False)
+    model = Llama(model_path=model_path, **kwargs)
+    prompt_tokens = len(model.tokenize(PROMPT.encode("utf-8")))
+    best_prompt = best_decode = 0.0
+    for _ in range(rounds):
+        model.reset()
+        start = time.perf_counter()
+        first = None
+        generated = 0
+        for _ in model(PROMPT, max_tokens=tokens, temperature=0.0, stream=True):
+            if first is None:
+                first = time.perf_counter()
+            generated += 1
+        end = time.perf_counter()
+        best_prompt = max(best_prompt, prompt_tokens / (first - start))
+        if generated > 1:
+            best_decode = max(best_decode, (generated - 1) / (end - first))
+    del model
+    return {"prompt": best_prompt, "decode": best_decode}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=64, help="Tokens to generate per round")
+    parser.add_argument("--rounds", type=int, default=2, help="Rounds per thread count; the best is kept")
+    parser.add_argument("--dry-run", action="store_true", help="Report without writing the profile")
+    args = parser.parse_args()
+
+    model_path = os.getenv("MODEL_PATH", "models/llama-2-7b-chat.gguf")
+    budget = cpu_budget()
+    candidates = candidate_threads(budget["logical"], budget["physical"])
+    print(f"{budget['logical']} logical / {budget['physical']} physical CPUs available; "
+          f"trying {candidates}\n")
+
+    results = {}
+    for threads in candidates:
+        results[threads] = measure(model_path, threads, args.tokens, args.rounds)
+        print(f"{threads:>3} threads   prompt {results[threads]['prompt']:8.1f} tok/s   "
+              f"decode {results[threads]['decode']:6.2f} tok/s")
+
+    n_threads = max(results, key=lambda n: results[n]["decode"])
+    n_threads_batch = max(results, key=lambda n: results[n]["prompt"])
+    profile = {
+        "n_threads": n_threads,
+        "n_threads_batch": n_threads_batch,
+        "decode_tokens_per_second": round(results[n_threads]["decode"], 2),
+        "prompt_tokens_per_second": round(results[n_threads_batch]["prompt"], 1),
+        "model_path": model_path,
+        "host": platform.node(),
+        "cpus": budget,
+        "tuned_at": datetime.now(timezone.utc).isoformat(),
+    }
+    print(f"\nBest: n_threads={n_threads}, n_threads_batch={n_threads_batch}")
+    if not args.dry_run:
+        save_tuned_profile(profile)
+        print(f"Wrote {profile_path()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark weather lookups over fresh connections against the pooled async client.
+
+Starts a local stub of the Nominatim and Open-Meteo endpoints that charges
+--connect-delay on every new connection, standing in for the TCP and TLS
+handshakes of the real APIs. Each weather answer is a geocode request plus
+a forecast request, made either with a bare requests.get per call (a new
+connection each time) or through the shared keep-alive client. Caches are
+bypassed, so only the transport is measured.
+
+Run from the backend directory:
+    python -m benchmarks.weather_http --answers 50 --connect-delay 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+import requests
+from app.core.http_client import http_client
+
+GEOCODE_BODY = json.dumps([{"lat": "51.5074", "lon": "-0.1278"}]).encode()
+FORECAST_BODY = json.dumps({"current_weather": {"temperature": 12.3, "windspeed": 8.1, "weathercode": 2}}).encode()
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, connect_delay: float, request_delay: float):
+    await asyncio.sleep(connect_delay)
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            path = head.split(b" ", 2)[1]
+            body = GEOCODE_BODY if path.startswith(b"/search") else FORECAST_BODY
+            await asyncio.sleep(request_delay)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                b"Content-Length: %d\r\nConnection: keep-alive\r\n\r\n%s" % (len(body), body)
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+def start_stub_server(connect_delay: float, request_delay: float) -> int:
+    """Run the stub server on a background loop and return its port."""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    port = []
+
+    async def serve():
+        server = await asyncio.start_server(
+            lambda r, w: _handle(r, w, connect_delay, request_delay), "127.0.0.1", 0
+        )
+        port.append(server.sockets[0].getsockname()[1])
+        ready.set()
+        await server.serve_forever()
+
+    threading.Thread(target=loop.run_until_complete, args=(serve(),), daemon=True).start()
+    ready.wait()
+    return port[0]
+
+def fresh_connection_answer(base: str):
+    requests.get(f"{base}/search", params={"q": "London", "format": "json", "limit": 1}, timeout=10).json()
+    requests.get(f"{base}/v1/forecast", params={"latitude": 51.51, "longitude": -0.13, "current_weather": "true"}, timeout=10).json()
+
+async def pooled_answer(base: str):
+    (await http_client.get(f"{base}/search", params={"q": "London", "format": "json", "limit": 1})).json()
+    (await http_client.get(f"{base}/v1/forecast", params={"latitude": 51.51, "longitude": -0.13, "current_weather": "true"})).json()
+
+def time_answers(answer, count: int) -> list:
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        answer()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def report(label: str, timings: list):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<26} mean {statistics.mean(timings) * 1000:7.1f} ms   "
+          f"median {statistics.median(timings) * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--answers", type=int, default=50)
+    parser.add_argument("--connect-delay", type=float, default=0.05, help="Seconds charged per new connection")
+    parser.add_argument("--request-delay", type=float, default=0.005, help="Seconds of server time per request")
+    parser.add_argument("--concurrency", type=int, default=20, help="Parallel answers in the burst test")
+    args = parser.parse_args()
+
+    base = f"http://127.0.0.1:{start_stub_server(args.connect_delay, args.request_delay)}"
+    print(f"{args.answers} answers (geocode + forecast), {args.connect_delay * 1000:.0f} ms per new connection\n")
+
+    report("requests.get per call", time_answers(lambda: fresh_connection_answer(base), args.answers))
+    http_client.run(pooled_answer(base))  # Open the pooled connection outside the timing
+    report("pooled async client", time_answers(lambda: http_client.run(pooled_answer(base)), args.answers))
+
+    async def burst():
+        await asyncio.gather(*(pooled_answer(base) for _ in range(args.concurrency)))
+
+    start = time.perf_counter()
+    http_client.run(burst())
+    print(f"\n{args.concurrency} concurrent pooled answers in {(time.perf_counter() - start) * 1000:.1f} ms")
+    http_client.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import time
+import pytest
+from app.services.chat_sessions import SessionStore, UnknownSession
+
+MODEL = "models/a.gguf"
+
+def make_store(tmp_path, max_bytes=1000, disk_max_bytes=10_000, ttl=3600.0):
+    return SessionStore(str(tmp_path), max_bytes=max_bytes, disk_max_bytes=disk_max_bytes, ttl=ttl)
+
+def new_session(store, age):
+    """A session last used age seconds ago, with one turn."""
+    session = store.create()
+    store.add_turn(session, "hi", "hello", "default")
+    session.last_used = store._last_used[session.id] = time.time() - age
+    return session
+
+def put(store, session, size):
+    store.put_state(session, b"s" * size, MODEL, size)
+
+def test_spills_least_recently_used_states_to_disk(tmp_path):
+    store = make_store(tmp_path, max_bytes=100)
+    old, recent, current = (new_session(store, age) for age in (30, 20, 10))
+    put(store, old, 40)
+    put(store, recent, 40)
+    put(store, current, 40)
+
+    assert old.state is None and recent.state is not None and current.state is not None
+    assert store.describe(old)["state"] == "disk"
+    assert store.stats()["memory_bytes"] == 80
+
+    # Reading the spilled state back moves the least recently used one out instead
+    store.get(old.id)
+    assert store.get_state(old, MODEL) == b"s" * 40
+    assert store.describe(recent)["state"] == "disk"
+    assert not os.path.exists(os.path.join(tmp_path, f"{old.id}.state"))
+
+def test_deletes_disk_states_over_the_disk_budget(tmp_path):
+    store = make_store(tmp_path, max_bytes=0, disk_max_bytes=150)
+    oldest, newer = new_session(store, 20), new_session(store, 10)
+    put(store, oldest, 100)
+    put(store, newer, 100)
+    put(store, new_session(store, 0), 100)
+
+    assert store.stats()["states_on_disk"] == 1
+    assert store.get_state(oldest, MODEL) is None
+    assert store.get_state(newer, MODEL) == b"s" * 100
+
+def test_state_is_only_returned_for_its_model(tmp_path):
+    store = make_store(tmp_path)
+    session = new_session(store, 0)
+    put(store, session, 10)
+    assert store.get_state(session, "models/b.gguf") is None
+    assert store.get_state(session, MODEL) == b"s" * 10
+
+def test_expires_idle_sessions(tmp_path):
+    store = make_store(tmp_path, ttl=60.0)
+    active, idle = new_session(store, 0), new_session(store, 0)
+    put(store, idle, 10)
+    idle.last_used = store._last_used[idle.id] = time.time() - 120
+
+    store.create()
+    with pytest.raises(UnknownSession):
+        store.get(idle.id)
+    assert store.get(active.id).turns[0].user == "hi"
+    assert not any(name.startswith(idle.id) for name in os.listdir(tmp_path))
+
+def test_transcripts_survive_a_restart(tmp_path):
+    store = make_store(tmp_path)
+    session = new_session(store, 0)
+    # A state file without a transcript is left over from a crash
+    open(os.path.join(tmp_path, f"{'0' * 32}.state"), "wb").close()
+
+    restarted = make_store(tmp_path)
+    assert [turn.assistant for turn in restarted.get(session.id).turns] == ["hello"]
+    assert not os.path.exists(os.path.join(tmp_path, f"{'0' * 32}.state"))
+
+def test_deleted_session_is_not_written_back(tmp_path):
+    store = make_store(tmp_path)
+    session = new_session(store, 0)
+    store.delete(session.id)
+
+    # A reply that was being generated when the session was deleted
+    store.add_turn(session, "again", "reply", "default")
+    put(store, session, 10)
+
+    assert os.listdir(tmp_path) == []
+    with pytest.raises(UnknownSession):
+        make_store(tmp_path).get(session.id)
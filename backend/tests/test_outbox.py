@@ -0,0 +1,95 @@
+import time
+import pytest
+
+pytest.importorskip("mcp")
+from app.services import outbox as outbox_module
+from app.services.outbox import FAILED, QUEUED, SENDING, SENT, Outbox
+
+class Authenticated:
+    def is_authenticated(self):
+        return True
+
+class Registry:
+    auth_service = Authenticated()
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Recipients of every message handed to Gmail, batch by batch."""
+    batches = []
+
+    def send_batch(raw_messages):
+        batches.append(list(raw_messages))
+        return [({"id": f"gmail-{index}"}, None) for index in range(len(raw_messages))]
+
+    monkeypatch.setattr(outbox_module, "get_service_registry", lambda: Registry())
+    monkeypatch.setattr(outbox_module, "get_sender_address", lambda: "me@example.com")
+    monkeypatch.setattr(outbox_module, "compose_message", lambda to, *args: ",".join(to))
+    monkeypatch.setattr(outbox_module, "send_batch", send_batch)
+    return batches
+
+def make_outbox(tmp_path, daily_limit=100, max_attempts=3):
+    return Outbox(str(tmp_path / "outbox.db"), send_rate=1000.0, daily_limit=daily_limit, max_attempts=max_attempts)
+
+def enqueue(outbox, recipients):
+    message_id = outbox.enqueue(to=recipients, subject="s", body="b")
+    # Messages go out in creation order
+    time.sleep(0.001)
+    return message_id
+
+def test_holds_messages_over_the_daily_allowance(tmp_path, sent):
+    outbox = make_outbox(tmp_path, daily_limit=3)
+    first = enqueue(outbox, ["a@x", "b@x"])
+    second = enqueue(outbox, ["c@x", "d@x"])
+
+    assert outbox.deliver_due() == 1
+    assert outbox.get(first)["status"] == SENT
+    assert outbox.get(second)["status"] == QUEUED
+    # One recipient left today isn't enough for the next message
+    assert outbox.deliver_due() == 0
+    assert outbox.get(second)["status"] == QUEUED
+    assert sent == [["a@x,b@x"]]
+
+def test_fails_messages_over_the_whole_daily_limit(tmp_path, sent):
+    outbox = make_outbox(tmp_path, daily_limit=3)
+    too_large = enqueue(outbox, ["a@x", "b@x", "c@x", "d@x"])
+    fits = enqueue(outbox, ["e@x"])
+
+    assert outbox.deliver_due() == 1
+    assert outbox.get(too_large)["status"] == FAILED
+    assert "daily limit" in outbox.get(too_large)["error"]
+    assert outbox.get(fits)["status"] == SENT
+
+def test_reschedules_retryable_errors_with_backoff(tmp_path, sent, monkeypatch):
+    monkeypatch.setattr(outbox_module, "send_batch", lambda raw: [(None, ConnectionError("reset"))] * len(raw))
+    monkeypatch.setattr(outbox_module, "backoff_delay", lambda attempt: 30.0)
+    outbox = make_outbox(tmp_path, max_attempts=2)
+    message_id = enqueue(outbox, ["a@x"])
+
+    assert outbox.deliver_due() == 1
+    status = outbox.get(message_id)
+    assert (status["status"], status["attempts"], status["error"]) == (QUEUED, 1, "reset")
+    # Not due again until the backoff has passed
+    assert outbox.deliver_due() == 0
+    assert 25 < outbox._next_due_in() <= 30
+
+    with outbox._conn:
+        outbox._conn.execute("UPDATE messages SET next_attempt_at = 0")
+    assert outbox.deliver_due() == 1
+    assert outbox.get(message_id)["status"] == FAILED
+
+def test_fails_permanent_errors_at_once(tmp_path, sent, monkeypatch):
+    monkeypatch.setattr(outbox_module, "send_batch", lambda raw: [(None, ValueError("bad address"))] * len(raw))
+    outbox = make_outbox(tmp_path)
+    message_id = enqueue(outbox, ["a@x"])
+
+    assert outbox.deliver_due() == 1
+    assert outbox.get(message_id)["status"] == FAILED
+
+def test_requeues_messages_left_sending(tmp_path, sent):
+    outbox = make_outbox(tmp_path)
+    message_id = enqueue(outbox, ["a@x"])
+    # As if the process died mid-send
+    outbox._claim_due(10)
+    assert outbox.get(message_id)["status"] == SENDING
+
+    assert make_outbox(tmp_path).get(message_id)["status"] == QUEUED
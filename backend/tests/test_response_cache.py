@@ -0,0 +1,16 @@
+from app.services.response_cache import ResponseCache
+
+def test_scopes_are_separate():
+    cache = ResponseCache(max_bytes=1024, ttls={"chat": None})
+    cache.put("Hello?", "chat", "from a", scope="models/a.gguf")
+    assert cache.get("hello", "chat", scope="models/a.gguf") == "from a"
+    assert cache.get("hello", "chat", scope="models/b.gguf") is None
+    assert cache.get("hello", "chat") is None
+
+def test_invalidate_by_intent_covers_every_scope():
+    cache = ResponseCache(max_bytes=1024, ttls={"chat": None, "get_weather": None})
+    cache.put("hi", "chat", "a", scope="models/a.gguf")
+    cache.put("hi", "chat", "b", scope="models/b.gguf")
+    cache.put("weather in paris", "get_weather", "sunny")
+    assert cache.invalidate(["chat"]) == 2
+    assert cache.get("weather in paris", "get_weather") == "sunny"
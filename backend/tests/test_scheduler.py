@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import pytest
+from app.core.executors import ExecutorOverloaded
+from app.core.scheduler import DeadlineExceeded, InferenceScheduler
+
+@pytest.fixture
+def scheduler():
+    scheduler = InferenceScheduler(max_queue=2, timeout=30.0)
+    yield scheduler
+    scheduler.shutdown()
+
+class Blocker:
+    """A blocking call that holds the scheduler's worker until released."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.started.set()
+        self.release.wait(timeout=5)
+        return "blocker"
+
+async def occupy(scheduler: InferenceScheduler) -> "tuple[Blocker, asyncio.Task]":
+    blocker = Blocker()
+    task = asyncio.ensure_future(scheduler.run(blocker))
+    while not blocker.started.is_set():
+        await asyncio.sleep(0.01)
+    return blocker, task
+
+def test_rejects_when_the_queue_is_full(scheduler):
+    async def main():
+        blocker, running = await occupy(scheduler)
+        queued = [asyncio.ensure_future(scheduler.run(lambda: "queued")) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        assert scheduler.saturated
+        with pytest.raises(ExecutorOverloaded):
+            await scheduler.run(lambda: "rejected")
+        blocker.release.set()
+        assert await running == "blocker"
+        assert await asyncio.gather(*queued) == ["queued", "queued"]
+
+    asyncio.run(main())
+    assert scheduler.stats()["rejected"] == 1
+    assert scheduler.stats()["completed"] == 3
+
+def test_expires_jobs_that_wait_past_their_deadline(scheduler):
+    calls = []
+
+    async def main():
+        blocker, running = await occupy(scheduler)
+        late = asyncio.ensure_future(scheduler.run(calls.append, "late", timeout=0.01))
+        await asyncio.sleep(0.05)
+        blocker.release.set()
+        await running
+        with pytest.raises(DeadlineExceeded):
+            await late
+
+    asyncio.run(main())
+    assert calls == []
+    assert scheduler.stats()["expired"] == 1
+
+def test_drops_cancelled_jobs_before_they_run(scheduler):
+    calls = []
+
+    async def main():
+        blocker, running = await occupy(scheduler)
+        cancelled = asyncio.ensure_future(scheduler.run(calls.append, "cancelled"))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        blocker.release.set()
+        await running
+        # A job queued after it still runs, so the worker has passed the cancelled one
+        await scheduler.run(calls.append, "next")
+
+    asyncio.run(main())
+    assert calls == ["next"]
+    assert scheduler.stats()["cancelled"] == 1
+
+def test_drops_streams_whose_consumer_left_before_they_ran(scheduler):
+    produced = []
+
+    def generate():
+        for item in range(3):
+            produced.append(item)
+            yield item
+
+    async def main():
+        blocker, running = await occupy(scheduler)
+        stream = scheduler.stream(generate)
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.01)
+        # The client disconnects while the stream is still queued
+        pending.cancel()
+        await asyncio.gather(pending, return_exceptions=True)
+        blocker.release.set()
+        await running
+        await scheduler.run(lambda: None)
+
+    asyncio.run(main())
+    assert produced == []
+    assert scheduler.stats()["cancelled"] == 1
@@ -0,0 +1,34 @@
+import random
+import pytest
+
+pytest.importorskip("llama_cpp")
+from app.services.llm_service import StreamingOutputCleaner, clean_model_output
+
+def stream(chunks):
+    cleaner = StreamingOutputCleaner()
+    streamed = "".join(cleaner.feed(chunk) for chunk in chunks) + cleaner.finish()
+    return streamed, cleaner.text
+
+@pytest.mark.parametrize("chunks", [
+    ["H", "e", "llo [a", " [b", "] world"],
+    ["Hello [a [b] c] d"],
+    ["Hello [a", "\n", "world]"],
+    ["Open [ bracket", " never closed"],
+    ["[x] [y", "] [", "z [/IN", "ST] done"],
+    ["Sure! [/INST", "] User", ": hi [a", " User: b] end"],
+    ["]] stray [[ ", "closers ]"],
+])
+def test_streamed_matches_batch(chunks):
+    streamed, text = stream(chunks)
+    expected = clean_model_output("".join(chunks))
+    assert streamed == expected
+    assert text == expected
+
+def test_random_splits_match_batch():
+    pieces = ["a", " ", "[", "]", "\n", "User:", "Us", "Assistant:", "[/INST]", "[x]", "word"]
+    rng = random.Random(0)
+    for _ in range(5000):
+        raw = "".join(rng.choice(pieces) for _ in range(rng.randint(1, 16)))
+        cuts = sorted(rng.sample(range(1, len(raw)), min(len(raw) - 1, rng.randint(0, 6))))
+        chunks = [raw[a:b] for a, b in zip([0] + cuts, cuts + [len(raw)])]
+        assert stream(chunks) == (clean_model_output(raw), clean_model_output(raw)), chunks
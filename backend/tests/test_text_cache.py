@@ -0,0 +1,17 @@
+from app.services.text_cache import TextCache
+
+def test_put_replaces_only_that_files_versions(tmp_path):
+    cache = TextCache(str(tmp_path), max_bytes=1024)
+    cache.put("abc-def", "v1", "other file")
+    cache.put("abc", "v1", "old")
+    cache.put("abc", "v2", "new")
+    assert cache.get("abc", "v1") is None
+    assert cache.get("abc", "v2") == "new"
+    assert cache.get("abc-def", "v1") == "other file"
+
+def test_ids_differing_in_unsafe_characters_stay_apart(tmp_path):
+    cache = TextCache(str(tmp_path), max_bytes=1024)
+    cache.put("a.b", "v1", "dot")
+    cache.put("a_b", "v1", "underscore")
+    assert cache.get("a.b", "v1") == "dot"
+    assert cache.get("a_b", "v1") == "underscore"
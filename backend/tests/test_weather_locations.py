@@ -0,0 +1,29 @@
+import pytest
+
+pytest.importorskip("mcp")
+from app.services.prompt_handler import PromptHandler
+
+@pytest.fixture(scope="module")
+def handler():
+    return PromptHandler()
+
+@pytest.mark.parametrize("prompt, locations", [
+    ("how is the weather in san francisco and what should I wear", ["san francisco"]),
+    ("weather for paris this weekend", ["paris"]),
+    ("forecast for tomorrow in Paris", ["paris"]),
+    ("what's the weather like in London?", ["london"]),
+    ("weather in London, Paris and Berlin", ["london", "paris", "berlin"]),
+    ("weather in new york and los angeles today", ["new york", "los angeles"]),
+    ("what's the weather in tokyo right now", ["tokyo"]),
+    ("weather at the weekend in madrid", ["madrid"]),
+    ("forecast for rio de janeiro on saturday", ["rio de janeiro"]),
+    ("weather in paris and my kids are bored", ["paris"]),
+    ("temperature in 'Stratford on Avon' and 'St. Louis' please", ["stratford on avon", "st. louis"]),
+])
+def test_locations(handler, prompt, locations):
+    intent = handler.classify_intent(prompt)
+    assert intent.type.value == "get_weather"
+    assert intent.entities.get("locations") == locations
+
+def test_no_location(handler):
+    assert "locations" not in handler.classify_intent("what's the weather").entities
@@ -116,12 +116,11 @@ const Chat: React.FC = () => {
     console.log("Message content length:", message.content.length);
 
     if (message.isImage) {
-      // Check if the content is base64 data
-      const isBase64 =
-        message.content.startsWith("data:image") ||
-        (message.content.length > 100 && !message.content.includes("http"));
+      // URLs and data URLs can be used directly; anything else is raw base64
+      const isUrl =
+        message.content.startsWith("data:image") || message.content.startsWith("http");
 
-      const imageSrc = isBase64 ? message.content : `data:image/jpeg;base64,${message.content}`;
+      const imageSrc = isUrl ? message.content : `data:image/jpeg;base64,${message.content}`;
 
       return (
         <div className="image-container">
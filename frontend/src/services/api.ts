@@ -1,6 +1,7 @@
 import axios from "axios";
 
-const API_URL = "http://localhost:8000/api";
+export const SERVER_URL = "http://localhost:8000";
+const API_URL = `${SERVER_URL}/api`;
 
 interface ChatResponse {
   type: "chat" | "image";
@@ -1,4 +1,4 @@
-import { sendMessage } from "./api";
+import { sendMessage, SERVER_URL } from "./api";
 
 interface ChatResponse {
   type: "chat" | "image";
@@ -23,11 +23,20 @@ export const processMessage = async (message: string): Promise<ChatResponse> =>
     // Handle image response
     if (type === "image" && responseMessage) {
       console.log("Processing image response");
-      // Ensure the message is a base64 string
+      // Ensure the message is a string
       if (typeof responseMessage !== "string") {
         throw new Error("Invalid image data format");
       }
 
+      // Drive images are referenced by URL and streamed from the media endpoint
+      if (responseMessage.startsWith("/api/media/")) {
+        console.log("Message is a media URL");
+        return {
+          type: "image",
+          message: `${SERVER_URL}${responseMessage}`,
+        };
+      }
+
       // Check if it's already a data URL
       if (responseMessage.startsWith("data:image")) {
         console.log("Message is already a data URL");